@@ -21,6 +21,10 @@ DRIFT_PRODUCTION_PATH = Variable.get(
 DRIFT_REPORT_PATH = Variable.get(
     "drift_report_path", f"{PROJECT_ROOT}/reports/drift_report.json"
 )
+DRIFT_HISTORY_PATH = Variable.get(
+    "drift_history_path", f"{PROJECT_ROOT}/reports/drift_history.sqlite"
+)
+DRIFT_SEGMENT = Variable.get("drift_segment", "all")
 EVAL_REPORT_PATH = Variable.get(
     "eval_report_path", f"{PROJECT_ROOT}/reports/eval.json"
 )
@@ -57,6 +61,8 @@ def drift_branch() -> str:
         ks_threshold=KS_THRESHOLD,
         metric_drop_threshold=METRIC_DROP_THRESHOLD,
         psi_bins=PSI_BINS,
+        history_path=Path(DRIFT_HISTORY_PATH),
+        segment=DRIFT_SEGMENT,
     )
     return "trigger_retrain" if result.get("drift_detected") else "no_drift"
 
@@ -96,13 +102,16 @@ dag.doc_md = __doc__ = """
 ### Drift monitoring (Lab 12)
 
 Периодически сравнивает распределения фичей (PSI/KS) и ROC-AUC модели на продакшен батче.
-Результат сохраняется в `reports/drift_report.json`. При флаге дрейфа триггерится DAG
+Результат сохраняется в `reports/drift_report.json` и дописывается в историю
+`reports/drift_history.sqlite` (`python -m src.drift_history query --feature num_urls --since 90d`). При флаге дрейфа триггерится DAG
 `flight_pipeline` для переобучения/регистрации модели.
 
 Настраиваемые Airflow Variables:
 - `drift_reference_path` — эталонный (train) датасет, default: `/opt/airflow/project/data/processed/processed.csv`
 - `drift_production_path` — свежий продакшен батч, default: `/opt/airflow/project/data/production/recent.csv`
 - `drift_report_path` — куда писать JSON-отчёт о дрейфе, default: `/opt/airflow/project/reports/drift_report.json`
+- `drift_history_path` — append-only история прогонов (SQLite), default: `/opt/airflow/project/reports/drift_history.sqlite`
+- `drift_segment` — метка сегмента для записи в историю, default: `all`
 - `drift_psi_threshold` / `drift_ks_threshold` — пороги по PSI/KS
 - `drift_metric_drop_threshold` — допустимое падение ROC-AUC от baseline (`reports/eval.json`)
 - `drift_psi_bins` — число квантильных бинов для PSI
@@ -20,7 +20,18 @@ REGISTERED_MODEL_PATH = Variable.get(
     "registered_model_path",
     f"{PROJECT_ROOT}/model_store/production/random_forest.joblib",
 )
+# full — train.py (Feast + RandomForest в памяти), incremental — src/train_incremental.py по Parquet
+TRAIN_MODE = Variable.get("train_mode", "full")
+INCREMENTAL_SOURCE = Variable.get(
+    "incremental_source", f"{PROJECT_ROOT}/data/processed/processed.parquet"
+)
+COMPACT_MODEL_PATH = Variable.get(
+    "compact_model_path", f"{PROJECT_ROOT}/model_store/random_forest.compact.joblib"
+)
+COMPACT_ARGS = Variable.get("compact_args", "")
 ROC_AUC_THRESHOLD = float(Variable.get("roc_auc_threshold", 0.9))
+# шаги из dvc.yaml через src/stage_cache.py: неизменённые входы — шаг пропускается
+STAGE_CACHE = Variable.get("stage_cache", "true").lower() in ("1", "true", "yes")
 
 
 def bash_python(command: str) -> str:
@@ -29,6 +40,14 @@ def bash_python(command: str) -> str:
     return f"cd {project_dir} && {python_bin} {command}"
 
 
+def stage_command(stage: str, fallback: str, overrides: tuple[str, ...] = ()) -> str:
+    """Cached dvc.yaml stage (paths from dvc.yaml), or the plain script with Variable paths."""
+    if not STAGE_CACHE:
+        return bash_python(fallback)
+    sets = "".join(f" --set {shlex.quote(item)}" for item in overrides)
+    return bash_python(f"-m src.stage_cache run {stage}{sets}")
+
+
 default_args = {
     "owner": "team1",
     "retries": 1,
@@ -46,26 +65,49 @@ with DAG(
 ) as dag:
     download_data = BashOperator(
         task_id="download_data",
-        bash_command=bash_python("src/download_data.py"),
+        bash_command=stage_command("download_data", "src/download_data.py"),
     )
 
     preprocess = BashOperator(
         task_id="preprocess",
-        bash_command=bash_python("src/preprocess.py"),
+        bash_command=stage_command("preprocess", "-m src.preprocess"),
+    )
+
+    # контракт данных: падает до дорогого обучения, если батч сломан
+    validate = BashOperator(
+        task_id="validate",
+        bash_command=stage_command("validate", "-m src.validate"),
     )
 
+    # online store догоняет offline-данные: пишется только интервал после прошлой метки event_timestamp
+    materialize = BashOperator(
+        task_id="materialize",
+        bash_command=stage_command("materialize", "-m src.materialize"),
+    )
+
+    if TRAIN_MODE == "incremental":
+        # чекпоинт в model_store/incremental: retry задачи продолжает с последнего батча
+        train_cmd = (
+            "-m src.train_incremental "
+            f"--source {shlex.quote(INCREMENTAL_SOURCE)} "
+            f"--model-path {shlex.quote(TRAINED_MODEL_PATH)}"
+        )
+    else:
+        train_cmd = "-m src.train"
+
     train = BashOperator(
         task_id="train",
-        bash_command=bash_python("src/train.py"),
+        # инкрементальный режим кэшируется своим чекпоинтом, а не stage_cache
+        bash_command=bash_python(train_cmd) if TRAIN_MODE == "incremental" else stage_command("train", train_cmd),
     )
 
     evaluate = BashOperator(
         task_id="evaluate",
-        bash_command=bash_python("src/evaluate.py"),
+        bash_command=stage_command("evaluate", "-m src.evaluate"),
     )
 
     register_cmd = (
-        "src/register.py "
+        "-m src.register "
         f"--model-path {shlex.quote(TRAINED_MODEL_PATH)} "
         f"--registry-path {shlex.quote(REGISTERED_MODEL_PATH)} "
         f"--report-path {shlex.quote(EVAL_REPORT_PATH)} "
@@ -74,16 +116,40 @@ with DAG(
 
     register = BashOperator(
         task_id="register",
-        bash_command=bash_python(register_cmd),
+        bash_command=stage_command(
+            "register", register_cmd, (f"register.threshold={ROC_AUC_THRESHOLD}",)
+        ),
     )
 
-    download_data >> preprocess >> train >> evaluate >> register
+    download_data >> preprocess >> validate >> train >> evaluate >> register
+    validate >> materialize
+
+    # инкрементальный режим обучает SGD-пайплайн, а src.compact сжимает только леса
+    if TRAIN_MODE != "incremental":
+        compact_cmd = (
+            "-m src.compact "
+            f"--model-path {shlex.quote(TRAINED_MODEL_PATH)} "
+            f"--output {shlex.quote(COMPACT_MODEL_PATH)} "
+            f"{COMPACT_ARGS}"
+        )
+
+        compact = BashOperator(
+            task_id="compact",
+            bash_command=bash_python(compact_cmd),
+        )
+
+        train >> compact
 
 
 dag.doc_md = __doc__ = """
 ### Flight pipeline (Lab 8)
 
-Учебный DAG orchestrates ETL → обучение → оценку → регистрацию модели.
+Учебный DAG orchestrates ETL → проверку контракта данных → обучение → оценку → регистрацию модели;
+после проверки контракта параллельно с обучением `materialize` дописывает новые строки в online store Feast.
 Пути и пороги кастомизируются через Airflow Variables: `project_root`, `python_bin`,
-`eval_report_path`, `trained_model_path`, `registered_model_path`, `roc_auc_threshold`.
+`eval_report_path`, `trained_model_path`, `registered_model_path`, `roc_auc_threshold`,
+`train_mode` (`full` | `incremental`; в инкрементальном режиме задачи `compact` нет), `incremental_source`, `compact_model_path`, `compact_args` (например `--drop-trees --auc-tolerance 0.001`),
+`stage_cache` (по умолчанию `true`: шаги `download_data` … `register` запускаются через
+`src/stage_cache.py` с путями из `dvc.yaml` и пропускаются, если входы не менялись;
+переопределённые `*_path` Variables действуют только при `stage_cache=false`).
 """
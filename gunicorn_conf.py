@@ -0,0 +1,29 @@
+# Многопроцессный запуск: gunicorn -c gunicorn_conf.py src.api:app
+# Метрики воркеров пишутся в mmap-файлы PROMETHEUS_MULTIPROC_DIR, /metrics их агрегирует.
+import os
+import shutil
+from pathlib import Path
+
+# prometheus_client выбирает хранилище при импорте — переменная нужна до старта воркеров
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+# воркеры делят CPU-лимит пода: src/saturation.py делит квоту на их число
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+loglevel = os.environ.get("LOG_LEVEL", "info").lower()
+timeout = 60
+
+
+def on_starting(server):
+    # файлы прошлого запуска дали бы «вечные» счётчики мёртвых pid
+    path = Path(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from src.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import math
+import time
+from typing import Optional
+
+from prometheus_client import Counter, Gauge
+
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight",
+    "Scoring requests currently admitted, by limiter pool (predict, batch)",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_LIMIT = Gauge(
+    "admission_limit",
+    "Current adaptive concurrency limit, by limiter pool (predict, batch)",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total",
+    "Scoring requests shed by admission control",
+    ["reason"],
+)
+ADMISSION_DEGRADED = Counter(
+    "admission_degraded_total",
+    "Shed requests answered with the heuristic score instead of 503",
+)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limiter.
+
+    Every completion feeds its service time into an EWMA. Completions under
+    `target_latency` grow the limit by ~1 per `limit` completions (additive increase);
+    a completion over target shrinks it by `backoff`, at most once per smoothed
+    service time so one burst does not collapse the limit (multiplicative decrease).
+    Requests whose deadline is shorter than the EWMA are rejected; an idle pool lets
+    one probe through per smoothed service time so the EWMA can recover.
+    Used from the event loop only, so no locking. `pool` labels the gauges: requests
+    with very different service times (single texts, batches) need separate limiters.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 32,
+        min_limit: float = 1,
+        max_limit: float = 256,
+        target_latency: float = 0.25,
+        backoff: float = 0.9,
+        smoothing: float = 0.2,
+        pool: str = "predict",
+    ) -> None:
+        self.limit = float(initial_limit)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.ewma_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._last_completion = 0.0
+        self._limit_gauge = ADMISSION_LIMIT.labels(pool)
+        self._in_flight_gauge = ADMISSION_IN_FLIGHT.labels(pool)
+        self._limit_gauge.set(self.limit)
+
+    def try_acquire(self, deadline: Optional[float] = None) -> Optional[str]:
+        """Admit a request or return the rejection reason."""
+        if self.in_flight >= int(self.limit):
+            return "concurrency"
+        if deadline is not None and self.ewma_latency is not None and self.ewma_latency > deadline:
+            # даже при свободном слоте типичное время обслуживания не укладывается в дедлайн.
+            # EWMA обновляется только на завершениях, поэтому без пробного запроса в пустой
+            # пул отказ после одного всплеска латентности стал бы вечным
+            if self.in_flight or time.monotonic() - self._last_completion < self.ewma_latency:
+                return "deadline"
+        self.in_flight += 1
+        self._in_flight_gauge.inc()
+        return None
+
+    def release(self, latency: float) -> None:
+        self.in_flight -= 1
+        self._in_flight_gauge.dec()
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency += self.smoothing * (latency - self.ewma_latency)
+
+        now = time.monotonic()
+        self._last_completion = now
+        if latency > self.target_latency:
+            if now - self._last_decrease >= self.ewma_latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        elif self.in_flight + 1 >= self.limit / 2:
+            # растём только когда лимит реально используется
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        self._limit_gauge.set(self.limit)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: one service time per wave of `limit` requests."""
+        latency = self.ewma_latency or self.target_latency
+        waves = max(self.in_flight, 1) / max(self.limit, 1.0)
+        return max(1, math.ceil(latency * waves))
@@ -1,30 +1,64 @@
 from __future__ import annotations
 
+import asyncio
+import math
 import os
+import secrets
+import threading
 import time
+import warnings
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Optional
 
-import joblib
-import pandas as pd
-from fastapi import FastAPI, Request, Response
+import numpy as np
+import orjson
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from prometheus_client import (
-    CONTENT_TYPE_LATEST,
-    Counter,
-    Histogram,
-    generate_latest,
-)
+from prometheus_client import Counter, Gauge, Histogram
+
+from src import instrumentation, wire
+from src.admission import ADMISSION_DEGRADED, ADMISSION_REJECTED, AdaptiveLimiter
+from src.cascade import CHEAP_COLUMNS, Cascade, cascade_path
+from src.instrumentation import NULL_TIMER, StageTimer
+from src.metrics import OTHER, LabelGuard, render_latest
+from src.model_cache import InvalidModel, ModelCache, ModelNotFound
+from src.near_dup import NearDupIndex, signature
+from src.profiler import SamplingProfiler
+from src.saturation import ARRIVALS, IN_FLIGHT, SaturationTracker
+from src.scoring import Scorer
+from src.singleflight import COALESCED, SingleFlight
 
 # ==== те же фичи, что в src/preprocess.py ====
 import re
-import regex as re2
-from bs4 import BeautifulSoup
-import tldextract
 
 URL_RE = re.compile(r"(https?://\S+|www\.\S+)", flags=re.IGNORECASE)
 DIGITS_RE = re.compile(r"\d")
-UPPER_RE = re2.compile(r"\p{Lu}")
+
+# bs4, regex и tldextract импортируются лениво: модуль (и src.score) грузится быстрее,
+# а прогрев (warmup) делается в фоне после старта, пока /health отвечает 503
+@lru_cache(maxsize=None)
+def _soup_class():
+    from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning
+
+    # SMS вида "www.site.com" bs4 принимает за путь к файлу и шумит предупреждением на каждый вызов
+    warnings.filterwarnings("ignore", category=MarkupResemblesLocatorWarning)
+    return BeautifulSoup
+
+@lru_cache(maxsize=None)
+def _upper_re():
+    import regex
+
+    return regex.compile(r"\p{Lu}")
+
+@lru_cache(maxsize=None)
+def _tld_extractor():
+    import tldextract
+
+    # офлайн: встроенный снапшот PSL, без попытки скачать список на первом запросе
+    return tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
 
 FEATURE_COLUMNS = [
     "char_len",
@@ -38,7 +72,7 @@ FEATURE_COLUMNS = [
 def clean_text(s: str) -> str:
     if not isinstance(s, str):
         return ""
-    s = BeautifulSoup(s, "html.parser").get_text(separator=" ")
+    s = _soup_class()(s, "html.parser").get_text(separator=" ")
     s = s.lower()
     s = URL_RE.sub(" <url> ", s)
     s = re.sub(r"\s+", " ", s).strip()
@@ -53,7 +87,7 @@ def count_digits(s: str) -> int:
 def upper_ratio(s: str) -> float:
     if not isinstance(s, str) or not s:
         return 0.0
-    upp = len(UPPER_RE.findall(s))
+    upp = len(_upper_re().findall(s))
     return float(upp) / max(len(s), 1)
 
 def num_domains(s: str) -> int:
@@ -61,24 +95,72 @@ def num_domains(s: str) -> int:
         return 0
     urls = URL_RE.findall(s)
     domains = set()
+    extract = _tld_extractor()
     for u in urls:
-        ts = tldextract.extract(u)
+        ts = extract(u)
         dom = ".".join([p for p in [ts.domain, ts.suffix] if p])
         if dom:
             domains.add(dom)
     return len(domains)
 
-def build_features(text: str) -> dict[str, float | int]:
-    text_clean = clean_text(text)
+def cheap_features(text: str) -> dict[str, float | int]:
+    """The CHEAP_COLUMNS of the cascade's first stage: regexes over the raw text only."""
     return {
-        "char_len": len(text_clean),
-        "word_len": len(text_clean.split()),
         "num_digits": count_digits(text),
         "num_urls": count_urls(text),
-        "num_domains": num_domains(text),
         "upper_ratio": upper_ratio(text),
     }
 
+def build_features(
+    text: str,
+    timer: StageTimer = NULL_TIMER,
+    text_clean: Optional[str] = None,
+    cheap: Optional[dict[str, float | int]] = None,
+) -> dict[str, float | int]:
+    if text_clean is None:
+        with timer.stage("clean_text"):
+            text_clean = clean_text(text)
+    with timer.stage("text_lengths"):
+        char_len = len(text_clean)
+        word_len = len(text_clean.split())
+    with timer.stage("num_domains"):
+        domains = num_domains(text)
+    if cheap is None:
+        # после первой ступени каскада эти три фичи уже посчитаны
+        with timer.stage("num_digits"):
+            digits = count_digits(text)
+        with timer.stage("num_urls"):
+            urls = count_urls(text)
+        with timer.stage("upper_ratio"):
+            ratio = upper_ratio(text)
+        cheap = {"num_digits": digits, "num_urls": urls, "upper_ratio": ratio}
+    return {
+        "char_len": char_len,
+        "word_len": word_len,
+        "num_digits": cheap["num_digits"],
+        "num_urls": cheap["num_urls"],
+        "num_domains": domains,
+        "upper_ratio": cheap["upper_ratio"],
+    }
+
+def cheap_matrix(texts: list[str]) -> np.ndarray:
+    X = np.empty((len(texts), len(CHEAP_COLUMNS)), dtype=np.float32)
+    for i, text in enumerate(texts):
+        feats = cheap_features(text)
+        for j, col in enumerate(CHEAP_COLUMNS):
+            X[i, j] = feats[col]
+    return X
+
+def features_matrix(texts: list[str], cheap: Optional[np.ndarray] = None) -> np.ndarray:
+    """Full feature rows; `cheap` — CHEAP_COLUMNS rows already computed for the same texts."""
+    X = np.empty((len(texts), len(FEATURE_COLUMNS)), dtype=np.float32)
+    for i, text in enumerate(texts):
+        known = None if cheap is None else dict(zip(CHEAP_COLUMNS, cheap[i].tolist()))
+        feats = build_features(text, cheap=known)
+        for j, col in enumerate(FEATURE_COLUMNS):
+            X[i, j] = feats[col]
+    return X
+
 # ==== модель и приложение ====
 MODEL_DIR = Path(os.environ.get("MODEL_DIR", "model_store"))
 MODEL_FILENAME = os.environ.get("MODEL_FILENAME", "random_forest.joblib")
@@ -86,11 +168,74 @@ try:
     SIMULATED_LATENCY_SEC = float(os.environ.get("SIMULATED_LATENCY_SEC", "0"))
 except ValueError:
     SIMULATED_LATENCY_SEC = 0.0
+# Пустой токен отключает /admin/* целиком
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+ENABLE_PROFILER = os.environ.get("ENABLE_PROFILER", "0").lower() in ("1", "true", "yes")
+MAX_PROFILE_SECONDS = 60.0
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "1000"))
+STREAM_BATCH_SIZE = int(os.environ.get("STREAM_BATCH_SIZE", "64"))
+STREAM_MAX_LINE_BYTES = int(os.environ.get("STREAM_MAX_LINE_BYTES", str(64 * 1024)))
+# Admission control: адаптивный лимит одновременных запросов на /predict и /predict/batch
+ADMISSION_CONTROL = os.environ.get("ADMISSION_CONTROL", "1").lower() in ("1", "true", "yes")
+ADMISSION_INITIAL_LIMIT = int(os.environ.get("ADMISSION_INITIAL_LIMIT", "32"))
+ADMISSION_MAX_LIMIT = int(os.environ.get("ADMISSION_MAX_LIMIT", "256"))
+ADMISSION_TARGET_LATENCY_SEC = float(os.environ.get("ADMISSION_TARGET_LATENCY_MS", "250")) / 1000.0
+# батч до MAX_BATCH_SIZE текстов обслуживается на порядки дольше одного текста: у батчей свой лимитер
+ADMISSION_BATCH_TARGET_LATENCY_SEC = float(os.environ.get("ADMISSION_BATCH_TARGET_LATENCY_MS", "1000")) / 1000.0
+ADMISSION_DEFAULT_DEADLINE_SEC = float(os.environ.get("ADMISSION_DEFAULT_DEADLINE_MS", "1000")) / 1000.0
+# Вместо 503 отдавать эвристический скор (без модели и BeautifulSoup/tldextract)
+ADMISSION_DEGRADED_MODE = os.environ.get("ADMISSION_DEGRADED", "0").lower() in ("1", "true", "yes")
+# Одинаковые тексты, пришедшие одновременно, считаются один раз
+SINGLE_FLIGHT = os.environ.get("SINGLE_FLIGHT", "1").lower() in ("1", "true", "yes")
+# Потолок числа различных значений label endpoint (шаблонов маршрутов)
+METRICS_MAX_ENDPOINTS = int(os.environ.get("METRICS_MAX_ENDPOINTS", "50"))
+# поиск почти-дубликата среди недавно оценённых сообщений; попадание отдаёт его скор без модели
+NEAR_DUP_LOOKUP = os.environ.get("NEAR_DUP_LOOKUP", "0").lower() in ("1", "true", "yes")
+NEAR_DUP_THRESHOLD = float(os.environ.get("NEAR_DUP_THRESHOLD", "0.9"))
+NEAR_DUP_CAPACITY = int(os.environ.get("NEAR_DUP_CAPACITY", "10000"))
+# каскад: первая ступень из <модель>.cascade.joblib (src/cascade.py) перед лесом основной модели;
+# без артефакта или при несовпадении хэша леса запросы идут прямо в лес
+CASCADE = os.environ.get("CASCADE", "1").lower() in ("1", "true", "yes")
+# Именованные модели (/models/{name}/predict, заголовок X-Model): <MODEL_CACHE_DIR>/<name>.joblib,
+# грузятся по первому запросу в LRU с бюджетом памяти и выгружаются после простоя
+MODEL_CACHE_DIR = Path(os.environ.get("MODEL_CACHE_DIR", str(MODEL_DIR)))
+MODEL_CACHE_MAX_BYTES = int(float(os.environ.get("MODEL_CACHE_MAX_MB", "512")) * 1024 * 1024)
+MODEL_CACHE_IDLE_SEC = float(os.environ.get("MODEL_CACHE_IDLE_SEC", "900"))
+MODEL_HEADER = "x-model"
+# Прогрев в фоне после старта; WARMUP=0 — сразу ready (локальная отладка)
+WARMUP = os.environ.get("WARMUP", "1").lower() in ("1", "true", "yes")
+WARMUP_TEXTS = [
+    "Hi, are we still on for lunch tomorrow?",
+    "WINNER!! You have been selected for a £1000 prize. Call 09061701461 now",
+    "Claim at http://www.prize-claim.co.uk/win?id=123 or www.example.com today",
+    "<html><body><b>FREE</b> ringtones at <a href='http://tones.biz'>tones</a></body></html>",
+    "ПРИВЕТ, ЭТО ТЕСТ ÜBER ÇA 123",
+    "",
+]
 
 app = FastAPI(title="SMS Spam API (Lab6)")
 
 _model = None
 _model_path: Optional[Path] = None
+_scorer: Optional[Scorer] = None
+_cascade: Optional[Cascade] = None
+_profiler = SamplingProfiler()
+_ready = threading.Event()
+_limiter = AdaptiveLimiter(
+    initial_limit=ADMISSION_INITIAL_LIMIT,
+    max_limit=ADMISSION_MAX_LIMIT,
+    target_latency=ADMISSION_TARGET_LATENCY_SEC,
+)
+_batch_limiter = AdaptiveLimiter(
+    initial_limit=ADMISSION_INITIAL_LIMIT,
+    max_limit=ADMISSION_MAX_LIMIT,
+    target_latency=ADMISSION_BATCH_TARGET_LATENCY_SEC,
+    pool="batch",
+)
+_flight = SingleFlight()
+_saturation = SaturationTracker()
+_near_dup = NearDupIndex(capacity=NEAR_DUP_CAPACITY, threshold=NEAR_DUP_THRESHOLD)
+_models = ModelCache(MODEL_CACHE_DIR, FEATURE_COLUMNS, MODEL_CACHE_MAX_BYTES, MODEL_CACHE_IDLE_SEC)
 
 REQUEST_COUNT = Counter(
     "request_count",
@@ -108,18 +253,62 @@ PREDICTION_DISTRIBUTION = Histogram(
     "Distribution of spam probability scores",
     buckets=(0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0),
 )
+STREAM_MESSAGES = Counter(
+    "stream_messages_total",
+    "NDJSON lines processed by /predict/stream",
+    ["status"],
+)
+STREAM_THROUGHPUT = Histogram(
+    "stream_throughput_messages_per_second",
+    "Per-stream scoring throughput of /predict/stream",
+    buckets=(10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000),
+)
+STREAM_ACTIVE = Gauge(
+    "stream_active",
+    "Currently open /predict/stream connections",
+    multiprocess_mode="livesum",
+)
+WARMUP_SECONDS = Gauge(
+    "api_warmup_seconds",
+    "Time spent warming caches and the scoring path after startup",
+    multiprocess_mode="livemax",
+)
+NEAR_DUP_LOOKUPS = Counter(
+    "predict_near_dup_total",
+    "Near-duplicate lookups on /predict by result",
+    ["result"],
+)
 
 def load_model() -> bool:
-    global _model, _model_path
+    global _model, _model_path, _scorer, _cascade
     path = MODEL_DIR / MODEL_FILENAME
     if path.exists():
-        _model = joblib.load(path)
+        import joblib
+
+        model = joblib.load(path)
+        # порядок фич проверяется один раз здесь, а не на каждом запросе
+        _scorer = Scorer(model, FEATURE_COLUMNS)
+        _cascade = Cascade.load(cascade_path(path), model, path) if CASCADE else None
+        _model = model
         _model_path = path
         return True
     _model = None
     _model_path = None
+    _scorer = None
+    _cascade = None
     return False
 
+def get_scorer() -> Scorer:
+    global _scorer
+    if _scorer is None or _scorer.model is not _model:
+        _scorer = Scorer(_model, FEATURE_COLUMNS)
+    return _scorer
+
+def active_cascade() -> Optional[Cascade]:
+    # каскад откалиброван под конкретный лес: подменённая модель идёт без него
+    cascade = _cascade
+    return cascade if cascade is not None and cascade.forest is _model else None
+
 class PredictIn(BaseModel):
     text: str
 
@@ -128,53 +317,580 @@ class PredictOut(BaseModel):
     proba_spam: float
     model_path: Optional[str] = None
 
+class PredictBatchIn(BaseModel):
+    texts: list[str]
+
+class BatchItemOut(BaseModel):
+    label: str
+    proba_spam: float
+
+class PredictBatchOut(BaseModel):
+    predictions: list[BatchItemOut]
+    model_path: Optional[str] = None
+
+class StageTimingIn(BaseModel):
+    enabled: bool
+
+def require_admin(request: Request) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = request.headers.get("x-admin-token", "")
+    if not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+def warmup() -> None:
+    """Load the model, build lazy caches and push synthetic messages through features + model, then mark ready."""
+    started = time.perf_counter()
+    try:
+        load_model()
+        _soup_class()
+        _upper_re()
+        _tld_extractor()("http://warmup.example.co.uk")
+        if _model is not None:
+            scorer = get_scorer()
+            for text in WARMUP_TEXTS:
+                scorer.score_one(build_features(text))
+            # синтетика прогрева и холодные тайминги не должны попадать в метрики каскада
+            score_texts(WARMUP_TEXTS, record=False)
+    finally:
+        WARMUP_SECONDS.set(time.perf_counter() - started)
+        # даже неудачный прогрев не должен навсегда держать под вне балансировки
+        _ready.set()
+
+def wait_ready(timeout: Optional[float] = None) -> bool:
+    return _ready.wait(timeout)
+
 @app.on_event("startup")
 def startup_event() -> None:
     # Для локального запуска MODEL_DIR может быть относительным и должен существовать
     MODEL_DIR.mkdir(parents=True, exist_ok=True)
-    load_model()
+    _ready.clear()
+    if WARMUP:
+        # порт открывается сразу (liveness проходит), трафик пойдёт после прогрева
+        threading.Thread(target=warmup, name="warmup", daemon=True).start()
+    else:
+        load_model()
+        _ready.set()
 
-@app.middleware("http")
-async def metrics_middleware(request: Request, call_next):
-    start_time = time.perf_counter()
-    status_code = "500"
-    try:
-        response = await call_next(request)
-        status_code = str(response.status_code)
-    except Exception:
-        latency = time.perf_counter() - start_time
-        REQUEST_COUNT.labels(request.method, request.url.path, status_code).inc()
-        REQUEST_LATENCY.labels(request.method, request.url.path, status_code).observe(latency)
-        raise
-
-    latency = time.perf_counter() - start_time
-    REQUEST_COUNT.labels(request.method, request.url.path, status_code).inc()
-    REQUEST_LATENCY.labels(request.method, request.url.path, status_code).observe(latency)
-    return response
+@app.on_event("shutdown")
+def shutdown_event() -> None:
+    if instrumentation.span_exporter is not None:
+        instrumentation.span_exporter.flush()
 
+class MetricsMiddleware:
+    """
+    Чистый ASGI-middleware вместо @app.middleware("http"): BaseHTTPMiddleware не отдаёт
+    тело запроса в StreamingResponse и добавляет лишний таск на каждый запрос.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        scoring = scope["path"].startswith("/predict")
+        if scoring:
+            ARRIVALS.inc()
+            IN_FLIGHT.inc()
+        state = scope.setdefault("state", {})
+        state["received_at"] = start_time
+        status_code = "500"
+
+        async def send_with_metrics(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = str(message["status"])
+                timer = state.get("stage_timer")
+                handler_done_at = state.get("handler_done_at")
+                if timer is not None and handler_done_at is not None:
+                    timer.record("serialization", time.perf_counter() - handler_done_at)
+                    timer.finish()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            if scoring:
+                IN_FLIGHT.dec()
+            latency = time.perf_counter() - start_time
+            method, endpoint = _method_label(scope["method"]), route_template(scope)
+            REQUEST_COUNT.labels(method, endpoint, status_code).inc()
+            REQUEST_LATENCY.labels(method, endpoint, status_code).observe(latency)
+
+app.add_middleware(MetricsMiddleware)
+
+HTTP_METHODS = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+_method_label = LabelGuard(0, allowed=HTTP_METHODS)
+_endpoint_label = LabelGuard(METRICS_MAX_ENDPOINTS)
+_route_templates: dict = {}
+
+def route_template(scope) -> str:
+    """
+    Label for the endpoint: the matched route's template ("/models/{name}/predict"),
+    never the raw path, so scanners hitting random URLs cannot mint new series.
+    """
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return OTHER
+    template = _route_templates.get(endpoint)
+    if template is None:
+        _route_templates.update({r.endpoint: r.path for r in app.routes if hasattr(r, "endpoint")})
+        template = _route_templates.get(endpoint, OTHER)
+    return _endpoint_label(template)
+
+# /health и /metrics — async: пул потоков может быть занят скорингом, а проба и скрейп не должны ждать в его очереди
 @app.get("/health")
-def health() -> dict:
+async def health(response: Response) -> dict:
+    # readiness: 503, пока не закончился прогрев
+    ready = _ready.is_set()
+    if not ready:
+        response.status_code = 503
     return {
-        "status": "ok",
+        "status": "ok" if ready else "warming",
+        "ready": ready,
         "model_loaded": _model is not None,
         "model_path": str(_model_path) if _model_path else None,
+        "cascade": active_cascade() is not None,
     }
 
-@app.post("/predict", response_model=PredictOut)
-def predict(inp: PredictIn) -> PredictOut:
-    if _model is None:
-        return PredictOut(label="unknown", proba_spam=0.0, model_path=None)
+@app.get("/livez")
+async def livez() -> dict:
+    return {"status": "ok"}
+
+def body_schema(model: type[BaseModel]) -> dict:
+    schema = model.model_json_schema()
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {wire.JSON: {"schema": schema}, wire.MSGPACK: {"schema": schema}},
+        }
+    }
+
+async def read_payload(request: Request):
+    try:
+        return wire.decode(await request.body(), request.headers.get("content-type"))
+    except wire.WireError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail) from exc
+
+def wire_response(request: Request, payload: dict, headers: Optional[dict] = None) -> Response:
+    media_type = wire.negotiate(request.headers.get("accept"), request.headers.get("content-type"))
+    return Response(wire.encode(payload, media_type), media_type=media_type, headers=headers)
+
+def label_for(proba: float) -> str:
+    return "spam" if proba >= 0.5 else "ham"
+
+def heuristic_proba(text: str) -> float:
+    """Cheap score for degraded mode: logistic over URL/digit/uppercase counts (ROC AUC ~0.97 on the SMS corpus)."""
+    z = -3.0 + 1.5 * min(count_urls(text), 3) + 0.12 * min(count_digits(text), 25) + 2.5 * upper_ratio(text)
+    return 1.0 / (1.0 + math.exp(-z))
 
+def heuristic_item(text: str) -> dict:
+    proba = heuristic_proba(text)
+    return {"label": label_for(proba), "proba_spam": proba}
+
+def request_deadline(request: Request) -> float:
+    """Seconds left for this request: X-Request-Timeout-Ms (or the default) minus time already spent."""
+    budget = ADMISSION_DEFAULT_DEADLINE_SEC
+    header = request.headers.get("x-request-timeout-ms")
+    if header:
+        try:
+            budget = float(header) / 1000.0
+        except ValueError:
+            pass
+    return budget - (time.perf_counter() - request.state.received_at)
+
+def shed(request: Request, reason: str, degraded_payload, limiter: AdaptiveLimiter) -> Response:
+    """Answer a request that admission control rejected: heuristic score in degraded mode, else fast 503."""
+    ADMISSION_REJECTED.labels(reason).inc()
+    if ADMISSION_DEGRADED_MODE:
+        ADMISSION_DEGRADED.inc()
+        return wire_response(request, degraded_payload(), headers={"X-Degraded": "heuristic"})
+    raise HTTPException(
+        status_code=503,
+        detail=f"Overloaded ({reason}), retry later",
+        headers={"Retry-After": str(limiter.retry_after())},
+    )
+
+def predict_one(text: str, timer: StageTimer, scorer: Optional[Scorer] = None) -> tuple[float, str]:
     if SIMULATED_LATENCY_SEC > 0:
         time.sleep(SIMULATED_LATENCY_SEC)
 
-    feats = build_features(inp.text)
-    X = pd.DataFrame([[feats[c] for c in FEATURE_COLUMNS]], columns=FEATURE_COLUMNS)
-    proba = float(_model.predict_proba(X)[0, 1])
+    # индекс почти-дубликатов и каскад привязаны к основной модели, именованные модели их не трогают
+    near_dup = NEAR_DUP_LOOKUP and scorer is None
+    cascade = active_cascade() if scorer is None else None
+    scorer = scorer or get_scorer()
+    t0 = time.perf_counter()
+    text_clean = sig = cheap = None
+    first_stage = 0.0
+    if cascade is not None:
+        with timer.stage("cascade"):
+            cheap = cheap_features(text)
+            proba, confident = cascade.screen(cheap)
+        first_stage = time.perf_counter() - t0
+        if confident:
+            cascade.record(1, 0, first_stage)
+            return proba, f"cascade;dur={first_stage * 1000:.3f}"
+    if near_dup:
+        with timer.stage("clean_text"):
+            text_clean = clean_text(text)
+        with timer.stage("near_dup"):
+            # скоры старой модели не должны пережить перезагрузку
+            _near_dup.bind(scorer.model)
+            sig = signature(text_clean)
+            hit = _near_dup.query(sig)
+        NEAR_DUP_LOOKUPS.labels("hit" if hit else "miss").inc()
+        if hit is not None:
+            if cascade is not None:
+                cascade.record(0, 1, first_stage, time.perf_counter() - t0 - first_stage)
+            return hit[0], f"near_dup;dur={(time.perf_counter() - t0) * 1000:.3f}"
+    feats = build_features(text, timer, text_clean, cheap)
+    t1 = time.perf_counter()
+    with timer.stage("predict_proba"):
+        proba = scorer.score_one(feats)
+    t2 = time.perf_counter()
+    if sig is not None:
+        _near_dup.add(sig, proba)
+    if cascade is not None:
+        cascade.record(0, 1, first_stage, t2 - t0 - first_stage)
+    # Server-Timing позволяет бенчмарку отделить время фич/модели от накладных расходов фреймворка
+    server_timing = f"features;dur={(t1 - t0 - first_stage) * 1000:.3f}, model;dur={(t2 - t1) * 1000:.3f}"
+    if first_stage:
+        server_timing = f"cascade;dur={first_stage * 1000:.3f}, {server_timing}"
+    return proba, server_timing
+
+async def named_scorer(name: str) -> tuple[Scorer, str]:
+    """Scorer and artifact path of a named model; a cache miss loads it in a worker thread."""
+    entry = _models.lookup(name)
+    if entry is None:
+        try:
+            entry = await run_in_threadpool(_models.get, name)
+        except ModelNotFound as exc:
+            raise HTTPException(status_code=404, detail=str(exc)) from exc
+        except InvalidModel as exc:
+            raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return entry.scorer, str(entry.path)
+
+async def read_text(request: Request) -> str:
+    # Тело разбирается вручную (orjson/msgpack), ответ собирается без pydantic
+    payload = await read_payload(request)
+    text = payload.get("text") if isinstance(payload, dict) else None
+    if not isinstance(text, str):
+        raise HTTPException(status_code=422, detail="Body must be an object with a string 'text' field")
+    return text
+
+async def read_texts(request: Request) -> list[str]:
+    payload = await read_payload(request)
+    texts = payload.get("texts") if isinstance(payload, dict) else None
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        raise HTTPException(status_code=422, detail="Body must be an object with a 'texts' list of strings")
+    if len(texts) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} texts per batch")
+    return texts
+
+@app.post("/predict", response_model=PredictOut, openapi_extra=body_schema(PredictIn))
+async def predict(request: Request) -> Response:
+    text = await read_text(request)
+    name = request.headers.get(MODEL_HEADER)
+    if name:
+        scorer, model_path = await named_scorer(name)
+        return await predict_response(request, text, scorer, model_path)
+
+    model_path = str(_model_path) if _model_path else None
+    if _model is None:
+        return wire_response(request, {"label": "unknown", "proba_spam": 0.0, "model_path": None})
+    return await predict_response(request, text, None, model_path)
+
+@app.post("/models/{name}/predict", response_model=PredictOut, openapi_extra=body_schema(PredictIn))
+async def predict_named(name: str, request: Request) -> Response:
+    text = await read_text(request)
+    scorer, model_path = await named_scorer(name)
+    return await predict_response(request, text, scorer, model_path)
+
+async def predict_response(request: Request, text: str, scorer: Optional[Scorer], model_path: Optional[str]) -> Response:
+    """Admission, single-flight and scoring of one text; `scorer=None` is the default model."""
+    admitted = ADMISSION_CONTROL
+    if admitted:
+        reason = _limiter.try_acquire(request_deadline(request))
+        if reason is not None:
+            return shed(request, reason, lambda: {**heuristic_item(text), "model_path": None}, _limiter)
+
+    timer = StageTimer()
+    if timer.enabled:
+        timer.record("validation", time.perf_counter() - request.state.received_at)
+        request.state.stage_timer = timer
+
+    started = time.perf_counter()
+    try:
+        if SINGLE_FLIGHT:
+            # фичи зависят от регистра и пробелов, поэтому ключ — точный текст; объект
+            # скорера в ключе разводит запросы к старой и новой модели при перезагрузке
+            proba, server_timing = await _flight.do_async(
+                (scorer or get_scorer(), text), lambda: _saturation.run(predict_one, text, timer, scorer)
+            )
+        else:
+            proba, server_timing = await _saturation.run(predict_one, text, timer, scorer)
+    finally:
+        if admitted:
+            _limiter.release(time.perf_counter() - started)
     PREDICTION_DISTRIBUTION.observe(proba)
-    label = "spam" if proba >= 0.5 else "ham"
-    return PredictOut(label=label, proba_spam=proba, model_path=str(_model_path) if _model_path else None)
+    request.state.handler_done_at = time.perf_counter()
+    return wire_response(
+        request,
+        {"label": label_for(proba), "proba_spam": proba, "model_path": model_path},
+        headers={"Server-Timing": server_timing},
+    )
+
+def score_batch(texts: list[str], scorer: Scorer, cascade: Optional[Cascade], record: bool = True) -> np.ndarray:
+    if cascade is None:
+        return scorer.score_rows(features_matrix(texts))
+    started = time.perf_counter()
+    cheap = cheap_matrix(texts)
+    probas, confident = cascade.screen_rows(cheap)
+    first_stage = time.perf_counter() - started
+    rest = np.flatnonzero(~confident)
+    if rest.size:
+        # полные фичи и лес — только для сообщений, в которых первая ступень не уверена
+        probas[rest] = scorer.score_rows(features_matrix([texts[i] for i in rest], cheap[rest]))
+    if record:
+        cascade.record(len(texts) - rest.size, rest.size, first_stage, time.perf_counter() - started - first_stage)
+    return probas
+
+def score_texts(texts: list[str], scorer: Optional[Scorer] = None, record: bool = True) -> list[float]:
+    cascade = None
+    if scorer is None:
+        if _model is None:
+            return [0.0] * len(texts)
+        scorer = get_scorer()
+        cascade = active_cascade()
+    if not SINGLE_FLIGHT:
+        return score_batch(texts, scorer, cascade, record).tolist()
+    # повторы внутри батча/микро-батча стрима считаем один раз
+    index: dict[str, int] = {}
+    positions = [index.setdefault(t, len(index)) for t in texts]
+    if len(index) < len(texts):
+        COALESCED.labels("batch").inc(len(texts) - len(index))
+    probas = score_batch(list(index), scorer, cascade, record)
+    return probas[positions].tolist()
+
+@app.post("/predict/batch", response_model=PredictBatchOut, openapi_extra=body_schema(PredictBatchIn))
+async def predict_batch(request: Request) -> Response:
+    texts = await read_texts(request)
+    name = request.headers.get(MODEL_HEADER)
+    if name:
+        scorer, model_path = await named_scorer(name)
+        return await predict_batch_response(request, texts, scorer, model_path)
+
+    model_path = str(_model_path) if _model_path else None
+    if _model is None:
+        predictions = [{"label": "unknown", "proba_spam": 0.0} for _ in texts]
+        return wire_response(request, {"predictions": predictions, "model_path": None})
+    return await predict_batch_response(request, texts, None, model_path)
+
+@app.post("/models/{name}/predict/batch", response_model=PredictBatchOut, openapi_extra=body_schema(PredictBatchIn))
+async def predict_batch_named(name: str, request: Request) -> Response:
+    texts = await read_texts(request)
+    scorer, model_path = await named_scorer(name)
+    return await predict_batch_response(request, texts, scorer, model_path)
+
+async def predict_batch_response(
+    request: Request, texts: list[str], scorer: Optional[Scorer], model_path: Optional[str]
+) -> Response:
+    admitted = ADMISSION_CONTROL
+    if admitted:
+        reason = _batch_limiter.try_acquire(request_deadline(request))
+        if reason is not None:
+            return shed(
+                request,
+                reason,
+                lambda: {"predictions": [heuristic_item(t) for t in texts], "model_path": None},
+                _batch_limiter,
+            )
+
+    started = time.perf_counter()
+    try:
+        probas = await _saturation.run(score_texts, texts, scorer)
+    finally:
+        if admitted:
+            _batch_limiter.release(time.perf_counter() - started)
+    for proba in probas:
+        PREDICTION_DISTRIBUTION.observe(proba)
+    predictions = [{"label": label_for(p), "proba_spam": p} for p in probas]
+    return wire_response(request, {"predictions": predictions, "model_path": model_path})
+
+LINE_TOO_LONG = object()
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse без фонового listen_for_disconnect: тот конкурирует с генератором
+    за receive() и съедает куски тела запроса. Отключение клиента генератор увидит сам —
+    request.stream() бросит ClientDisconnect.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[object]:
+    """
+    Split a chunked body into lines. Yields None after each received chunk so the
+    caller can flush a partial micro-batch instead of waiting for more input.
+    Oversized lines are yielded as LINE_TOO_LONG and the rest of the line is dropped.
+    """
+    buf = bytearray()
+    skipping = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            nl = chunk.find(b"\n", start)
+            if nl < 0:
+                if not skipping:
+                    buf += chunk[start:]
+                    if len(buf) > max_line_bytes:
+                        buf.clear()
+                        skipping = True
+                        yield LINE_TOO_LONG
+                break
+            if skipping:
+                skipping = False
+            else:
+                buf += chunk[start:nl]
+                yield bytes(buf) if len(buf) <= max_line_bytes else LINE_TOO_LONG
+            buf.clear()
+            start = nl + 1
+        yield None
+    if buf and not skipping:
+        yield bytes(buf)
+
+def parse_stream_line(raw: object, max_line_bytes: int) -> tuple[Optional[dict], Optional[str]]:
+    if raw is LINE_TOO_LONG:
+        return None, f"line exceeds {max_line_bytes} bytes"
+    try:
+        payload = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return None, "invalid JSON"
+    if not isinstance(payload, dict) or not isinstance(payload.get("text"), str):
+        return None, "expected an object with a string 'text' field"
+    return payload, None
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request) -> DuplexStreamingResponse:
+    """
+    NDJSON in, NDJSON out. Lines are scored in micro-batches as they arrive; the body
+    is only read as fast as the client consumes results, so memory per connection
+    stays bounded by the batch size.
+    """
+    batch_size = max(STREAM_BATCH_SIZE, 1)
+    max_line = STREAM_MAX_LINE_BYTES
+    model_path = str(_model_path) if _model_path else None
+
+    async def results() -> AsyncIterator[bytes]:
+        started = time.perf_counter()
+        processed = 0
+        line_no = 0
+        pending: list[tuple[int, dict]] = []
+
+        async def flush() -> bytes:
+            nonlocal processed
+            batch = list(pending)
+            pending.clear()
+            probas = await _saturation.run(score_texts, [item["text"] for _, item in batch])
+            out = []
+            for (n, item), proba in zip(batch, probas):
+                label = "unknown" if _model is None else label_for(proba)
+                row = {"line": n, "label": label, "proba_spam": proba, "model_path": model_path}
+                if "id" in item:
+                    row["id"] = item["id"]
+                if _model is not None:
+                    PREDICTION_DISTRIBUTION.observe(proba)
+                out.append(orjson.dumps(row))
+            processed += len(batch)
+            STREAM_MESSAGES.labels("ok").inc(len(batch))
+            return b"\n".join(out) + b"\n"
+
+        STREAM_ACTIVE.inc()
+        try:
+            async for raw in iter_ndjson_lines(request.stream(), max_line):
+                if raw is None:
+                    if pending:
+                        yield await flush()
+                    continue
+                line_no += 1
+                if raw is not LINE_TOO_LONG and not raw.strip():
+                    continue
+                item, error = parse_stream_line(raw, max_line)
+                if error is not None:
+                    if pending:
+                        yield await flush()
+                    STREAM_MESSAGES.labels("error").inc()
+                    yield orjson.dumps({"line": line_no, "error": error}) + b"\n"
+                    continue
+                pending.append((line_no, item))
+                if len(pending) >= batch_size:
+                    yield await flush()
+            if pending:
+                yield await flush()
+        finally:
+            STREAM_ACTIVE.dec()
+            elapsed = time.perf_counter() - started
+            if processed and elapsed > 0:
+                STREAM_THROUGHPUT.observe(processed / elapsed)
+
+    return DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.get("/models")
+async def list_models() -> dict:
+    """Named models currently in memory, most recently used first."""
+    return {
+        "models": _models.describe(),
+        "total_bytes": _models.total_bytes,
+        "max_bytes": _models.max_bytes,
+    }
+
+@app.get("/admin/stage-timing")
+def get_stage_timing(request: Request) -> dict:
+    require_admin(request)
+    return {"enabled": instrumentation.is_enabled()}
+
+@app.post("/admin/stage-timing")
+def set_stage_timing(inp: StageTimingIn, request: Request) -> dict:
+    require_admin(request)
+    instrumentation.set_enabled(inp.enabled)
+    return {"enabled": instrumentation.is_enabled()}
+
+@app.post("/admin/profile")
+async def profile(
+    request: Request,
+    seconds: float = 10.0,
+    interval_ms: float = 5.0,
+    heap: bool = True,
+    fmt: str = Query("json", alias="format"),
+):
+    require_admin(request)
+    if not ENABLE_PROFILER:
+        raise HTTPException(status_code=404, detail="Profiler is disabled")
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=422, detail=f"seconds must be in (0, {MAX_PROFILE_SECONDS}]")
+    if interval_ms < 1:
+        raise HTTPException(status_code=422, detail="interval_ms must be >= 1")
+    if fmt not in ("json", "collapsed"):
+        raise HTTPException(status_code=422, detail="format must be 'json' or 'collapsed'")
+
+    try:
+        # сессия до минуты: отдельный поток, а не слот пула, в котором скорятся запросы
+        result = await asyncio.to_thread(_profiler.run, seconds, interval_ms / 1000.0, heap)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    if fmt == "collapsed":
+        return Response(result.collapsed(), media_type="text/plain; charset=utf-8")
+    return result.to_dict()
 
 @app.get("/metrics")
-def metrics() -> Response:
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+async def metrics() -> Response:
+    # в multiprocess-режиме сборка читает mmap-файлы всех воркеров — сотни мс, не на event loop
+    body, content_type = await run_in_threadpool(render_latest)
+    return Response(body, media_type=content_type)
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import json
+import platform
+import random
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+
+SMS_CORPUS_PATH = Path("data/raw/SMSSpamCollection")
+REQUESTS_JSONL_PATH = Path("requests.jsonl")
+BENCH_REPORTS_DIR = Path("reports/bench")
+
+
+def load_sms_corpus(path: Path = SMS_CORPUS_PATH) -> list[str]:
+    """Read message texts from the tab-separated `label<TAB>text` corpus."""
+    if not path.exists():
+        raise FileNotFoundError(f"SMS corpus not found at {path}")
+    texts = []
+    with path.open("r", encoding="utf-8", errors="replace") as fh:
+        for line in fh:
+            _, _, text = line.rstrip("\n").partition("\t")
+            if text:
+                texts.append(text)
+    return texts
+
+
+def load_jsonl_messages(path: Path = REQUESTS_JSONL_PATH) -> list[str]:
+    """Read `text` fields from a JSONL request log; lines without one are ignored."""
+    if not path.exists():
+        return []
+    texts = []
+    with path.open("r", encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                payload = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            text = payload.get("text") if isinstance(payload, dict) else None
+            if isinstance(text, str) and text:
+                texts.append(text)
+    return texts
+
+
+def message_mix(
+    sms_path: Path = SMS_CORPUS_PATH,
+    jsonl_path: Path | None = REQUESTS_JSONL_PATH,
+    n: int | None = None,
+    seed: int = 42,
+) -> list[str]:
+    """Deterministic shuffled mix of corpus and request-log messages, cycled up to `n`."""
+    texts = load_sms_corpus(sms_path)
+    if jsonl_path is not None:
+        texts += load_jsonl_messages(jsonl_path)
+    if not texts:
+        raise ValueError("No messages available for benchmarking")
+    rng = random.Random(seed)
+    rng.shuffle(texts)
+    if n is None:
+        return texts
+    return [texts[i % len(texts)] for i in range(n)]
+
+
+def percentiles(samples: Iterable[float]) -> dict[str, float | None]:
+    arr = np.asarray(list(samples), dtype=float)
+    if arr.size == 0:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "mean": float(arr.mean()),
+        "max": float(arr.max()),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_metadata() -> dict:
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def default_report_path(kind: str) -> Path:
+    return BENCH_REPORTS_DIR / f"{kind}-{git_commit() or 'nogit'}.json"
+
+
+def save_report(report: dict, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+
+
+def flatten_numbers(payload: dict, prefix: str = "") -> dict[str, float]:
+    flat: dict[str, float] = {}
+    for key, value in payload.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten_numbers(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def compare_reports(current: dict, baseline: dict, section: str = "results") -> dict[str, dict]:
+    """Relative change of every numeric leaf under `section` present in both reports."""
+    cur = flatten_numbers(current.get(section, {}))
+    base = flatten_numbers(baseline.get(section, {}))
+    deltas = {}
+    for name in sorted(cur.keys() & base.keys()):
+        before, after = base[name], cur[name]
+        change = (after - before) / before if before else None
+        deltas[name] = {"baseline": before, "current": after, "change": change}
+    return deltas
+
+
+def print_comparison(deltas: dict[str, dict]) -> None:
+    for name, row in deltas.items():
+        change = row["change"]
+        change_str = f"{change * 100:+.1f}%" if change is not None else "n/a"
+        print(f"  {name}: {row['baseline']:.4f} -> {row['current']:.4f} ({change_str})")
@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
+
+import httpx
+
+from src import wire
+from src.bench_common import (
+    REQUESTS_JSONL_PATH,
+    SMS_CORPUS_PATH,
+    compare_reports,
+    default_report_path,
+    message_mix,
+    percentiles,
+    print_comparison,
+    run_metadata,
+    save_report,
+)
+
+
+def parse_server_timing(header: str | None) -> dict[str, float]:
+    """Parse `name;dur=ms, name;dur=ms` into {name: seconds}."""
+    timings: dict[str, float] = {}
+    if not header:
+        return timings
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                try:
+                    timings[name.strip()] = float(value) / 1000.0
+                except ValueError:
+                    pass
+    return timings
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def inprocess_client(startup_timeout: float = 60.0) -> AsyncIterator[httpx.AsyncClient]:
+    from src import api
+
+    # ASGITransport не прогоняет lifespan: startup вызываем сами и ждём фонового прогрева,
+    # иначе первые запросы получат "unknown" без модели и Server-Timing
+    api.startup_event()
+    if not await asyncio.to_thread(api.wait_ready, startup_timeout):
+        raise TimeoutError(f"API warmup did not finish within {startup_timeout}s")
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        yield client
+
+
+@asynccontextmanager
+async def uvicorn_process() -> AsyncIterator[tuple[subprocess.Popen, str]]:
+    port = free_port()
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "src.api:app",
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+        ],
+        env=os.environ.copy(),
+    )
+    try:
+        yield proc, f"http://127.0.0.1:{port}"
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+@asynccontextmanager
+async def uvicorn_client(
+    startup_timeout: float = 30.0, max_connections: int = 100
+) -> AsyncIterator[httpx.AsyncClient]:
+    limits = httpx.Limits(max_connections=max_connections)
+    async with uvicorn_process() as (proc, base_url):
+        async with httpx.AsyncClient(base_url=base_url, timeout=30.0, limits=limits) as client:
+            deadline = time.monotonic() + startup_timeout
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+                try:
+                    resp = await client.get("/health")
+                    if resp.status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"API did not become healthy within {startup_timeout}s")
+                await asyncio.sleep(0.1)
+            yield client
+
+
+async def measure_cold_start(text: str, startup_timeout: float = 60.0, poll_interval: float = 0.02) -> dict:
+    """
+    Seconds from spawning uvicorn until it accepts connections, until /health reports
+    ready, and until the first request sent after readiness (what a load balancer
+    would route) gets a model answer, plus that request's latency.
+    """
+    marks: dict[str, float | None] = {"listening_s": None, "ready_s": None, "first_good_request_s": None}
+    first_latency = None
+    start = time.perf_counter()
+    async with uvicorn_process() as (proc, base_url):
+        async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+            while marks["first_good_request_s"] is None:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+                if time.perf_counter() - start > startup_timeout:
+                    raise TimeoutError(f"API did not serve a good request within {startup_timeout}s")
+                try:
+                    if marks["ready_s"] is None:
+                        health = await client.get("/health")
+                        marks["listening_s"] = marks["listening_s"] or time.perf_counter() - start
+                        if health.status_code == 200:
+                            marks["ready_s"] = time.perf_counter() - start
+                    if marks["ready_s"] is not None:
+                        sent = time.perf_counter()
+                        resp = await client.post("/predict", json={"text": text})
+                        if resp.status_code == 200 and resp.json().get("label") in ("spam", "ham"):
+                            first_latency = time.perf_counter() - sent
+                            marks["first_good_request_s"] = time.perf_counter() - start
+                            break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(poll_interval)
+    return {**marks, "first_good_request_latency_ms": first_latency * 1000 if first_latency is not None else None}
+
+
+async def replay(
+    client: httpx.AsyncClient,
+    texts: list[str],
+    concurrency: int,
+    rate: float,
+    wire_format: str = wire.JSON,
+) -> dict:
+    """
+    Replay `texts` against /predict.
+    With rate > 0 requests are scheduled open-loop, and latency is measured from the
+    scheduled send time so that queueing behind slow requests is not hidden.
+    Every Server-Timing entry is reported as its own stage (0 for responses without
+    it); framework is what the stages do not cover.
+    """
+    sem = asyncio.Semaphore(concurrency)
+    total: list[float] = []
+    stages: list[dict[str, float]] = []
+    framework: list[float] = []
+    errors = 0
+    headers = {"Content-Type": wire_format, "Accept": wire_format}
+    bodies = [wire.encode({"text": t}, wire_format) for t in texts]
+    start = time.perf_counter()
+
+    async def one(i: int, body: bytes) -> None:
+        nonlocal errors
+        scheduled = start + i / rate if rate > 0 else None
+        if scheduled is not None:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        async with sem:
+            sent = scheduled if scheduled is not None else time.perf_counter()
+            try:
+                resp = await client.post("/predict", content=body, headers=headers)
+            except httpx.HTTPError:
+                errors += 1
+                return
+            elapsed = time.perf_counter() - sent
+        if resp.status_code != 200:
+            errors += 1
+            return
+        timings = parse_server_timing(resp.headers.get("server-timing"))
+        total.append(elapsed)
+        stages.append(timings)
+        framework.append(max(elapsed - sum(timings.values()), 0.0))
+
+    await asyncio.gather(*(one(i, body) for i, body in enumerate(bodies)))
+    wall = time.perf_counter() - start
+
+    def ms(samples: list[float]) -> dict:
+        return {k: (v * 1000 if v is not None else None) for k, v in percentiles(samples).items()}
+
+    # cascade и near_dup есть не в каждом ответе, model — не в каждом с каскадом
+    names = list(dict.fromkeys(name for timings in stages for name in timings))
+    latency = {"total": ms(total)}
+    latency.update({name: ms([timings.get(name, 0.0) for timings in stages]) for name in names})
+    latency["framework"] = ms(framework)
+    return {
+        "requests": len(texts),
+        "errors": errors,
+        "wall_seconds": wall,
+        "throughput_rps": len(total) / wall if wall > 0 else 0.0,
+        "latency_ms": latency,
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    texts = message_mix(
+        sms_path=args.sms_path,
+        jsonl_path=args.requests_path,
+        n=args.requests + args.warmup,
+        seed=args.seed,
+    )
+    wire_format = wire.MSGPACK if args.wire == "msgpack" else wire.JSON
+    factory = inprocess_client if args.mode == "inprocess" else uvicorn_client
+    async with factory() as client:
+        if args.warmup:
+            await replay(client, texts[: args.warmup], args.concurrency, 0.0, wire_format)
+        results = await replay(client, texts[args.warmup:], args.concurrency, args.rate, wire_format)
+    if args.mode == "uvicorn" and args.cold_starts > 0:
+        runs = [await measure_cold_start(texts[0]) for _ in range(args.cold_starts)]
+        results["cold_start"] = {
+            key: statistics.median(r[key] for r in runs) for key in runs[0] if all(r[key] is not None for r in runs)
+        }
+    return {
+        "meta": run_metadata(),
+        "config": {
+            "mode": args.mode,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "seed": args.seed,
+            "wire": args.wire,
+            "cold_starts": args.cold_starts,
+            "simulated_latency_sec": os.environ.get("SIMULATED_LATENCY_SEC", "0"),
+        },
+        "results": results,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay SMS traffic against the spam API and report latency")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--requests", type=int, default=2000, help="Measured requests")
+    parser.add_argument("--warmup", type=int, default=100, help="Unmeasured requests sent first")
+    parser.add_argument("--concurrency", type=int, default=8, help="Max in-flight requests")
+    parser.add_argument("--rate", type=float, default=0.0, help="Target req/s (0 = as fast as possible)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--wire", choices=["json", "msgpack"], default="json", help="Request/response encoding")
+    parser.add_argument(
+        "--cold-starts",
+        type=int,
+        default=3,
+        help="uvicorn mode: fresh processes spawned to time readiness and the first good request (median)",
+    )
+    parser.add_argument("--sms-path", type=Path, default=SMS_CORPUS_PATH)
+    parser.add_argument(
+        "--requests-path",
+        type=Path,
+        default=REQUESTS_JSONL_PATH,
+        help="Optional JSONL request log with a `text` field per line",
+    )
+    parser.add_argument("--output", type=Path, default=None, help="Where to write the JSON report")
+    parser.add_argument("--baseline", type=Path, default=None, help="Previous report to compare against")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    report = asyncio.run(run_benchmark(args))
+    output = args.output or default_report_path(f"load-{args.mode}")
+    save_report(report, output)
+
+    res = report["results"]
+    print(f"Throughput: {res['throughput_rps']:.1f} req/s, errors: {res['errors']}")
+    for stage, stats in res["latency_ms"].items():
+        if stats["p50"] is None:
+            continue
+        print(f"  {stage:<10} p50={stats['p50']:.2f}ms p95={stats['p95']:.2f}ms p99={stats['p99']:.2f}ms")
+    if "cold_start" in res:
+        print("Cold start (median): " + ", ".join(f"{k}={v:.3f}" for k, v in res["cold_start"].items()))
+    print(f"Report saved to {output}")
+
+    if args.baseline is not None:
+        with args.baseline.open("r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        print(f"Compared to {args.baseline}:")
+        print_comparison(compare_reports(report, baseline))
+
+
+if __name__ == "__main__":
+    main()
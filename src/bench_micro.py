@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+from src.bench_common import (
+    SMS_CORPUS_PATH,
+    compare_reports,
+    default_report_path,
+    load_sms_corpus,
+    print_comparison,
+    run_metadata,
+    save_report,
+)
+
+
+@dataclass
+class Case:
+    name: str
+    func: Callable[[Any], Any]
+    inputs: list[Any]
+    # сколько логических элементов обрабатывает один вызов (для batch-кейсов)
+    items_per_call: int = 1
+
+
+def pathological_messages() -> dict[str, str]:
+    base = "Congratulations! You have WON a guaranteed cash prize. Call 09061701461 now. "
+    urls = " ".join(f"https://promo{i}.example{i % 7}.co.uk/claim?id={i}" for i in range(50))
+    html = "".join(
+        f"<div class='c{i}'><p><b>FREE</b> <a href='http://win{i}.com'>ringtone {i}</a></p></div>"
+        for i in range(40)
+    )
+    return {
+        "long": base * 60,
+        "many_urls": f"Visit {urls} to claim",
+        "html_heavy": f"<html><body>{html}</body></html>",
+    }
+
+
+def reset_caches() -> None:
+    """Drop process-level caches on the feature path so the next call runs cold."""
+    from src import api
+
+    re.purge()
+    api._tld_extractor.cache_clear()
+
+
+def time_calls(func: Callable[[Any], Any], inputs: list[Any], min_time: float, repeats: int) -> list[float]:
+    """Per-call seconds for `repeats` rounds, each cycling inputs for at least `min_time`."""
+    for item in inputs:
+        func(item)
+    rounds = []
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < min_time or calls < len(inputs):
+            for item in inputs:
+                func(item)
+            calls += len(inputs)
+            elapsed = time.perf_counter() - start
+        rounds.append(elapsed / calls)
+    return rounds
+
+
+def cold_call(func: Callable[[Any], Any], item: Any, samples: int) -> float:
+    times = []
+    for _ in range(samples):
+        reset_caches()
+        start = time.perf_counter()
+        func(item)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def alloc_per_call(func: Callable[[Any], Any], inputs: list[Any]) -> dict[str, float]:
+    # Прогреваем, чтобы не считать ленивую инициализацию как аллокации вызова
+    func(inputs[0])
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        snapshot_before = tracemalloc.take_snapshot()
+        for item in inputs:
+            func(item)
+        snapshot_after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    allocated = sum(
+        stat.size_diff for stat in snapshot_after.compare_to(snapshot_before, "filename") if stat.size_diff > 0
+    )
+    return {
+        "peak_bytes": float(max(peak - before, 0)),
+        "retained_bytes_per_call": float(allocated) / len(inputs),
+    }
+
+
+def build_cases(texts: list[str], batch_size: int) -> list[Case]:
+    import numpy as np
+    import pandas as pd
+
+    from src import api
+
+    if not api.load_model():
+        raise FileNotFoundError(f"Model not found at {api.MODEL_DIR / api.MODEL_FILENAME}")
+    model = api._model
+    scorer = api.get_scorer()
+    weird = pathological_messages()
+
+    rows = [api.build_features(t) for t in texts[:batch_size]]
+    batch = pd.DataFrame([[r[c] for c in api.FEATURE_COLUMNS] for r in rows], columns=api.FEATURE_COLUMNS)
+    single = [batch.iloc[[i]] for i in range(min(len(batch), 64))]
+    raw_rows = [np.asarray([[r[c] for c in api.FEATURE_COLUMNS]], dtype=float) for r in rows[:64]]
+
+    def frame_from_row(row: np.ndarray) -> Any:
+        return pd.DataFrame(row, columns=api.FEATURE_COLUMNS)
+
+    cases = [
+        Case("clean_text.corpus", api.clean_text, texts),
+        Case("num_domains.corpus", api.num_domains, texts),
+        Case("upper_ratio.corpus", api.upper_ratio, texts),
+        Case("build_features.corpus", api.build_features, texts),
+        Case("frame_build.single", frame_from_row, raw_rows),
+        Case("predict_proba.single", lambda X: model.predict_proba(X), single),
+        Case("predict_proba.batch", lambda X: model.predict_proba(X), [batch], items_per_call=len(batch)),
+        Case("scorer.single", scorer.score_one, rows[:64]),
+        Case("scorer.batch", scorer.score_rows, [batch.to_numpy()], items_per_call=len(batch)),
+        Case(
+            "build_features.batch",
+            lambda chunk: [api.build_features(t) for t in chunk],
+            [texts[:batch_size]],
+            items_per_call=min(batch_size, len(texts)),
+        ),
+    ]
+    cases += serialization_cases(texts[:batch_size])
+    for kind, text in weird.items():
+        cases.append(Case(f"clean_text.{kind}", api.clean_text, [text]))
+        cases.append(Case(f"num_domains.{kind}", api.num_domains, [text]))
+        cases.append(Case(f"build_features.{kind}", api.build_features, [text]))
+    return cases
+
+
+def serialization_cases(texts: list[str]) -> list[Case]:
+    """Request decode + response encode for the pre-orjson path and both wire formats."""
+    import json as stdjson
+
+    from fastapi.encoders import jsonable_encoder
+
+    from src import api, wire
+
+    out = {"label": "spam", "proba_spam": 0.87, "model_path": "model_store/random_forest.joblib"}
+    json_bodies = [wire.encode({"text": t}, wire.JSON) for t in texts]
+    msgpack_bodies = [wire.encode({"text": t}, wire.MSGPACK) for t in texts]
+    batch_out = {"predictions": [{"label": "ham", "proba_spam": 0.01}] * len(texts), "model_path": None}
+    batch_json = wire.encode({"texts": texts}, wire.JSON)
+    batch_msgpack = wire.encode({"texts": texts}, wire.MSGPACK)
+
+    def pydantic_single(body: bytes) -> bytes:
+        api.PredictIn.model_validate_json(body)
+        return stdjson.dumps(jsonable_encoder(api.PredictOut(**out))).encode()
+
+    def pydantic_batch(body: bytes) -> bytes:
+        api.PredictBatchIn.model_validate_json(body)
+        return stdjson.dumps(jsonable_encoder(api.PredictBatchOut(**batch_out))).encode()
+
+    def codec(media_type: str, payload: dict):
+        def run(body: bytes) -> bytes:
+            wire.decode(body, media_type)
+            return wire.encode(payload, media_type)
+
+        return run
+
+    n = len(texts)
+    return [
+        Case("serialization.pydantic_json.single", pydantic_single, json_bodies),
+        Case("serialization.orjson.single", codec(wire.JSON, out), json_bodies),
+        Case("serialization.msgpack.single", codec(wire.MSGPACK, out), msgpack_bodies),
+        Case("serialization.pydantic_json.batch", pydantic_batch, [batch_json], items_per_call=n),
+        Case("serialization.orjson.batch", codec(wire.JSON, batch_out), [batch_json], items_per_call=n),
+        Case("serialization.msgpack.batch", codec(wire.MSGPACK, batch_out), [batch_msgpack], items_per_call=n),
+    ]
+
+
+def run_case(case: Case, min_time: float, repeats: int, cold_samples: int) -> dict:
+    warm = time_calls(case.func, case.inputs, min_time, repeats)
+    per_item = [t / case.items_per_call for t in warm]
+    result = {
+        "warm_us_per_item": statistics.median(per_item) * 1e6,
+        "warm_us_per_item_min": min(per_item) * 1e6,
+        "cold_us_per_call": cold_call(case.func, case.inputs[0], cold_samples) * 1e6,
+    }
+    result.update(alloc_per_call(case.func, case.inputs[:200]))
+    return result
+
+
+def run_benchmarks(args: argparse.Namespace) -> dict:
+    texts = load_sms_corpus(args.sms_path)[: args.corpus_size]
+    results = {}
+    for case in build_cases(texts, args.batch_size):
+        if args.filter and not re.search(args.filter, case.name):
+            continue
+        results[case.name] = run_case(case, args.min_time, args.repeats, args.cold_samples)
+        print(
+            f"{case.name:<36} warm={results[case.name]['warm_us_per_item']:9.2f}us/item "
+            f"cold={results[case.name]['cold_us_per_call']:10.2f}us "
+            f"peak={results[case.name]['peak_bytes'] / 1024:8.1f}KiB"
+        )
+    return {
+        "meta": run_metadata(),
+        "config": {
+            "corpus_size": len(texts),
+            "batch_size": args.batch_size,
+            "min_time": args.min_time,
+            "repeats": args.repeats,
+            "cold_samples": args.cold_samples,
+        },
+        "results": results,
+    }
+
+
+def regressions(deltas: dict[str, dict], threshold: float) -> list[str]:
+    return [
+        name
+        for name, row in deltas.items()
+        if name.endswith(".warm_us_per_item") and row["change"] is not None and row["change"] > threshold
+    ]
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for feature extraction and model scoring")
+    parser.add_argument("--sms-path", type=Path, default=SMS_CORPUS_PATH)
+    parser.add_argument("--corpus-size", type=int, default=500, help="Corpus messages used as fixtures")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds per timing round")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--cold-samples", type=int, default=5)
+    parser.add_argument("--filter", type=str, default=None, help="Regex over case names")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None, help="Previous report to diff against")
+    parser.add_argument(
+        "--fail-threshold",
+        type=float,
+        default=None,
+        help="Exit non-zero if any warm timing regresses by more than this fraction vs baseline",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    report = run_benchmarks(args)
+    output = args.output or default_report_path("micro")
+    save_report(report, output)
+    print(f"Report saved to {output}")
+
+    if args.baseline is not None:
+        with args.baseline.open("r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        deltas = compare_reports(report, baseline)
+        print(f"Compared to {args.baseline}:")
+        print_comparison(deltas)
+        if args.fail_threshold is not None:
+            slower = regressions(deltas, args.fail_threshold)
+            if slower:
+                print(f"Regressions above {args.fail_threshold:.0%}: {slower}")
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
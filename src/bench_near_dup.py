@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.bench_common import (
+    SMS_CORPUS_PATH,
+    compare_reports,
+    default_report_path,
+    load_sms_corpus,
+    percentiles,
+    print_comparison,
+    run_metadata,
+    save_report,
+)
+
+
+DIGIT_RUN_RE = re.compile(r"\d+")
+
+
+def perturb(text: str, rng: random.Random) -> str:
+    """A template variant: new numbers, a new link and occasionally one dropped word."""
+    text = DIGIT_RUN_RE.sub(lambda m: "".join(rng.choice("0123456789") for _ in m.group()), text)
+    text = re.sub(r"(https?://\S+|www\.\S+)", lambda _: f"http://promo{rng.randint(0, 999)}.example.com/x", text)
+    words = text.split()
+    if len(words) > 8 and rng.random() < 0.5:
+        del words[rng.randrange(len(words))]
+    return " ".join(words)
+
+
+def exact_jaccard(query_sets: list[np.ndarray], corpus_sets: list[np.ndarray]) -> np.ndarray:
+    """(n_queries, n_corpus) exact Jaccard of shingle sets via sparse intersections."""
+    from scipy import sparse
+
+    vocab: dict[int, int] = {}
+
+    def matrix(sets: list[np.ndarray]):
+        rows, cols = [], []
+        for i, s in enumerate(sets):
+            for h in s.tolist():
+                rows.append(i)
+                cols.append(vocab.setdefault(h, len(vocab)))
+        return rows, cols
+
+    qr, qc = matrix(query_sets)
+    cr, cc = matrix(corpus_sets)
+    shape_cols = len(vocab)
+    Q = sparse.csr_matrix((np.ones(len(qr)), (qr, qc)), shape=(len(query_sets), shape_cols))
+    C = sparse.csr_matrix((np.ones(len(cr)), (cr, cc)), shape=(len(corpus_sets), shape_cols))
+    inter = (Q @ C.T).toarray()
+    sizes_q = np.array([len(s) for s in query_sets], dtype=float)[:, None]
+    sizes_c = np.array([len(s) for s in corpus_sets], dtype=float)[None, :]
+    return inter / (sizes_q + sizes_c - inter)
+
+
+def run_bench(corpus_path: Path, thresholds: list[float], n_queries: int, seed: int) -> dict:
+    from src import near_dup
+    from src.api import clean_text
+
+    rng = random.Random(seed)
+    texts = load_sms_corpus(corpus_path)
+    rng.shuffle(texts)
+    split = int(len(texts) * 0.8)
+    indexed, held_out = texts[:split], texts[split:]
+    # половина запросов — варианты проиндексированных шаблонов, половина — новые сообщения
+    queries = [perturb(rng.choice(indexed), rng) for _ in range(n_queries // 2)]
+    queries += held_out[: n_queries - len(queries)]
+
+    indexed_clean = [clean_text(t) for t in indexed]
+    query_clean = [clean_text(t) for t in queries]
+    indexed_sets = [near_dup.shingles(t) for t in indexed_clean]
+    query_sets = [near_dup.shingles(t) for t in query_clean]
+
+    start = time.perf_counter()
+    sigs = near_dup.signatures(indexed_sets)
+    batch_us = (time.perf_counter() - start) / len(indexed_sets) * 1e6
+    truth = exact_jaccard(query_sets, indexed_sets)
+
+    results = {"signature_batch_us_per_text": batch_us}
+    for threshold in thresholds:
+        index = near_dup.NearDupIndex(capacity=len(indexed), threshold=threshold)
+        for i, sig in enumerate(sigs):
+            index.add(sig, float(i))
+
+        latencies, tp, fp = [], 0, 0
+        for i, text_clean in enumerate(query_clean):
+            t0 = time.perf_counter()
+            hit = index.query(near_dup.signature(text_clean))
+            latencies.append((time.perf_counter() - t0) * 1e6)
+            if hit is not None:
+                if truth[i, int(hit[0])] >= threshold:
+                    tp += 1
+                else:
+                    fp += 1
+        positives = int((truth.max(axis=1) >= threshold).sum())
+        results[f"threshold_{threshold}"] = {
+            "queries": len(queries),
+            "true_near_duplicates": positives,
+            "hits": tp + fp,
+            "precision": tp / (tp + fp) if tp + fp else None,
+            "recall": tp / positives if positives else None,
+            "lookup_us": percentiles(latencies),
+            "index_entries": len(index),
+            "index_array_bytes": index.nbytes,
+        }
+    return results
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Recall/precision and latency of the near-duplicate lookup")
+    parser.add_argument("--corpus", type=Path, default=SMS_CORPUS_PATH)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.7, 0.8, 0.9])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None, help="Previous report to diff against")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    results = run_bench(args.corpus, args.thresholds, args.queries, args.seed)
+    print(f"signatures: {results['signature_batch_us_per_text']:.1f}us/text (batch)")
+    for threshold in args.thresholds:
+        row = results[f"threshold_{threshold}"]
+        precision = "n/a" if row["precision"] is None else f"{row['precision']:.3f}"
+        recall = "n/a" if row["recall"] is None else f"{row['recall']:.3f}"
+        print(
+            f"threshold={threshold:<4} hits={row['hits']:<5} true={row['true_near_duplicates']:<5} "
+            f"precision={precision} recall={recall} "
+            f"p50={row['lookup_us']['p50']:.0f}us p99={row['lookup_us']['p99']:.0f}us"
+        )
+    report = {
+        "meta": run_metadata(),
+        "config": {"thresholds": args.thresholds, "queries": args.queries, "seed": args.seed},
+        "results": results,
+    }
+    output = args.output or default_report_path("near-dup")
+    save_report(report, output)
+    print(f"Report saved to {output}")
+
+    if args.baseline is not None:
+        with args.baseline.open("r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        print(f"Compared to {args.baseline}:")
+        print_comparison(compare_reports(report, baseline))
+
+
+if __name__ == "__main__":
+    main()
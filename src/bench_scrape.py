@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+
+from src.bench_common import compare_reports, default_report_path, print_comparison, run_metadata, save_report
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5)
+
+
+def define_metrics(registry: CollectorRegistry | None) -> tuple[Counter, Histogram]:
+    """Same shape as REQUEST_COUNT / REQUEST_LATENCY in src/api.py."""
+    kwargs = {"registry": registry} if registry is not None else {}
+    count = Counter("request_count", "Total HTTP requests", ["method", "endpoint", "http_status"], **kwargs)
+    latency = Histogram(
+        "request_latency_seconds",
+        "HTTP request latency in seconds",
+        ["method", "endpoint", "http_status"],
+        buckets=LATENCY_BUCKETS,
+        **kwargs,
+    )
+    return count, latency
+
+
+def populate(count: Counter, latency: Histogram, series: int) -> None:
+    for i in range(series):
+        endpoint = f"/path/{i}"
+        count.labels("GET", endpoint, "200").inc()
+        latency.labels("GET", endpoint, "200").observe(0.01)
+
+
+def populate_worker(series: int) -> None:
+    """Runs in a child with PROMETHEUS_MULTIPROC_DIR set: writes one worker's mmap files."""
+    count, latency = define_metrics(None)
+    populate(count, latency, series)
+
+
+def time_render(render, repeats: int) -> tuple[float, int]:
+    times = []
+    size = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        size = len(render())
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), size
+
+
+def bench_series(series: int, workers: int, repeats: int) -> dict:
+    registry = CollectorRegistry()
+    populate(*define_metrics(registry), series)
+    single_s, single_bytes = time_render(lambda: generate_latest(registry), repeats)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": tmp}
+        for _ in range(workers):
+            subprocess.run(
+                [sys.executable, "-m", "src.bench_scrape", "--populate-worker", str(series)],
+                env=env,
+                check=True,
+            )
+        mmap_bytes = sum(p.stat().st_size for p in Path(tmp).glob("*.db"))
+
+        def render_multi() -> bytes:
+            merged = CollectorRegistry()
+            multiprocess.MultiProcessCollector(merged, path=tmp)
+            return generate_latest(merged)
+
+        multi_s, multi_bytes = time_render(render_multi, repeats)
+
+    return {
+        "singleprocess_ms": single_s * 1000,
+        "multiprocess_ms": multi_s * 1000,
+        "exposition_bytes": multi_bytes,
+        "singleprocess_exposition_bytes": single_bytes,
+        "mmap_bytes": mmap_bytes,
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure /metrics render cost vs label cardinality and worker count")
+    parser.add_argument(
+        "--series",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000, 10000],
+        help="Distinct endpoint label values per worker",
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Simulated gunicorn workers")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None, help="Previous report to diff against")
+    parser.add_argument("--populate-worker", type=int, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    if args.populate_worker is not None:
+        populate_worker(args.populate_worker)
+        return
+
+    results = {}
+    for series in args.series:
+        row = bench_series(series, args.workers, args.repeats)
+        results[f"series_{series}"] = row
+        print(
+            f"series={series:<6} workers={args.workers} single={row['singleprocess_ms']:9.2f}ms "
+            f"multi={row['multiprocess_ms']:9.2f}ms body={row['exposition_bytes'] / 1024:9.1f}KiB "
+            f"mmap={row['mmap_bytes'] / 1024:9.1f}KiB"
+        )
+    report = {
+        "meta": run_metadata(),
+        "config": {"series": args.series, "workers": args.workers, "repeats": args.repeats},
+        "results": results,
+    }
+    output = args.output or default_report_path("scrape")
+    save_report(report, output)
+    print(f"Report saved to {output}")
+
+    if args.baseline is not None:
+        with args.baseline.open("r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        print(f"Compared to {args.baseline}:")
+        print_comparison(compare_reports(report, baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import warnings
+from pathlib import Path
+from typing import Any, Mapping, Optional, Sequence
+
+import numpy as np
+from prometheus_client import Counter
+
+from src.scoring import Scorer
+
+
+# фичи, которые считаются по сырому тексту регулярками: без BeautifulSoup и tldextract
+CHEAP_COLUMNS = ["num_digits", "num_urls", "upper_ratio"]
+FIRST_STAGE_PARAMS = {"n_estimators": 8, "max_depth": 6, "min_samples_leaf": 5}
+AUC_TOLERANCE = 0.001
+CV_FOLDS = 5
+RANDOM_STATE = 42
+# кандидаты порогов — квантили скоров первой ступени по каждую сторону от 0.5
+THRESHOLD_QUANTILES = 41
+ARTIFACT_SUFFIX = ".cascade.joblib"
+# сглаживание оценки стоимости полного пути (фичи + лес) на одно сообщение
+FULL_COST_ALPHA = 0.05
+
+CASCADE_MESSAGES = Counter(
+    "cascade_messages_total",
+    "Messages scored by the default model, by the cascade stage that answered (first_stage, forest)",
+    ["stage"],
+)
+CASCADE_SAVED_SECONDS = Counter(
+    "cascade_saved_seconds_total",
+    "Estimated feature extraction and forest time skipped by short-circuited messages",
+)
+CASCADE_OVERHEAD_SECONDS = Counter(
+    "cascade_overhead_seconds_total",
+    "First-stage time spent on messages that still went to the forest",
+)
+
+
+def cascade_path(model_path: Path) -> Path:
+    """`model_store/random_forest.joblib` -> `model_store/random_forest.cascade.joblib`."""
+    return model_path.with_name(model_path.stem + ARTIFACT_SUFFIX)
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def short_circuit(proba: np.ndarray, low: float, high: float) -> np.ndarray:
+    return (proba <= low) | (proba >= high)
+
+
+# ==== обучение и калибровка ====
+def fit_first_stage(X: np.ndarray, y: np.ndarray, sample_weight: Optional[np.ndarray] = None):
+    from sklearn.ensemble import RandomForestClassifier
+
+    model = RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=1, **FIRST_STAGE_PARAMS)
+    return model.fit(X, y, sample_weight=sample_weight)
+
+
+def out_of_fold_proba(X: np.ndarray, y: np.ndarray, sample_weight: Optional[np.ndarray] = None) -> np.ndarray:
+    """First-stage spam probabilities for the training rows, each from a model that did not see it."""
+    from sklearn.model_selection import StratifiedKFold
+
+    proba = np.empty(len(y), dtype=np.float64)
+    folds = StratifiedKFold(CV_FOLDS, shuffle=True, random_state=RANDOM_STATE)
+    for fit_idx, pred_idx in folds.split(X, y):
+        weights = None if sample_weight is None else sample_weight[fit_idx]
+        model = fit_first_stage(X[fit_idx], y[fit_idx], weights)
+        proba[pred_idx] = model.predict_proba(X[pred_idx])[:, 1]
+    return proba
+
+
+def choose_thresholds(
+    samples: Sequence[tuple[np.ndarray, np.ndarray, np.ndarray]],
+    tolerance: float = AUC_TOLERANCE,
+) -> tuple[float, float]:
+    """
+    (low, high) that short-circuit the largest share of the first sample while the
+    combined score keeps ROC-AUC within `tolerance` of the forest's on every sample.
+
+    Each sample is (first-stage proba, forest proba, y). low < 0.5 <= high, so a
+    short-circuited message gets the label the first stage is confident about.
+    """
+    from sklearn.metrics import roc_auc_score
+
+    first = samples[0][0]
+    grid = np.linspace(0.0, 1.0, THRESHOLD_QUANTILES)
+    below, above = first[first < 0.5], first[first >= 0.5]
+    lows = np.append(-np.inf, np.unique(np.quantile(below, grid)) if below.size else [])
+    highs = np.append(np.unique(np.quantile(above, grid)) if above.size else [], np.inf)
+    baselines = [roc_auc_score(y, forest) for _, forest, y in samples]
+
+    best_low, best_high, best_share = -np.inf, np.inf, 0.0
+    for low in lows:
+        for high in highs:
+            share = float(short_circuit(first, low, high).mean())
+            if share <= best_share:
+                continue
+            if all(
+                roc_auc_score(y, np.where(short_circuit(p, low, high), p, forest)) >= base - tolerance
+                for (p, forest, y), base in zip(samples, baselines)
+            ):
+                best_low, best_high, best_share = float(low), float(high), share
+    return best_low, best_high
+
+
+def build_cascade(
+    X_train: np.ndarray,
+    y_train: np.ndarray,
+    forest_oob: np.ndarray,
+    X_test: np.ndarray,
+    y_test: np.ndarray,
+    forest_test: np.ndarray,
+    sample_weight: Optional[np.ndarray] = None,
+    tolerance: float = AUC_TOLERANCE,
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """
+    Fit the first stage on the CHEAP_COLUMNS of the forest's training split and pick
+    its thresholds; returns (artifact, report).
+
+    Thresholds are checked on two samples: out-of-fold first-stage scores against the
+    forest's out-of-bag scores on the training split (large, picks the share), and the
+    held-out split the forest's ROC-AUC is reported on. One alone is too noisy at the
+    size of the SMS corpus.
+    """
+    from sklearn.metrics import roc_auc_score
+
+    y_train, y_test = np.asarray(y_train), np.asarray(y_test)
+    first_oof = out_of_fold_proba(X_train, y_train, sample_weight)
+    model = fit_first_stage(X_train, y_train, sample_weight)
+    first_test = model.predict_proba(X_test)[:, 1]
+
+    # без OOB-оценки (строка попала во все бутстрэпы) строку пропускаем
+    seen = np.isfinite(forest_oob)
+    low, high = choose_thresholds(
+        [(first_oof[seen], forest_oob[seen], y_train[seen]), (first_test, forest_test, y_test)],
+        tolerance,
+    )
+    mask = short_circuit(first_test, low, high)
+    combined = np.where(mask, first_test, forest_test)
+    forest_auc = float(roc_auc_score(y_test, forest_test))
+    cascade_auc = float(roc_auc_score(y_test, combined))
+    report = {
+        "columns": list(CHEAP_COLUMNS),
+        "first_stage": dict(FIRST_STAGE_PARAMS),
+        # None — с этой стороны первая ступень не отвечает никогда
+        "low": low if np.isfinite(low) else None,
+        "high": high if np.isfinite(high) else None,
+        "auc_tolerance": tolerance,
+        "short_circuit_rate_train_oof": round(float(short_circuit(first_oof, low, high).mean()), 4),
+        "short_circuit_rate": round(float(mask.mean()), 4),
+        "first_stage_roc_auc": round(float(roc_auc_score(y_test, first_test)), 4),
+        "forest_roc_auc": round(forest_auc, 4),
+        "cascade_roc_auc": round(cascade_auc, 4),
+        "roc_auc_delta": round(cascade_auc - forest_auc, 4),
+        "label_agreement": round(float(((combined >= 0.5) == (forest_test >= 0.5)).mean()), 4),
+    }
+    artifact = {"columns": list(CHEAP_COLUMNS), "model": model, "low": low, "high": high}
+    return artifact, report
+
+
+def save_cascade(artifact: dict[str, Any], path: Path, forest_path: Path) -> None:
+    """Store the artifact next to the forest, bound to it by the forest file's hash."""
+    import joblib
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump({**artifact, "forest_sha256": file_sha256(forest_path)}, path)
+
+
+# ==== инференс ====
+class Cascade:
+    """
+    First stage in front of the forest: scores the CHEAP_COLUMNS and answers alone when
+    its probability is <= low or >= high. `forest` is the model object the cascade was
+    loaded for; the API uses it only while that model is the one serving.
+
+    Time saved is estimated per short-circuited message as the running average cost of
+    the full path (features + forest) minus what the first stage took.
+    """
+
+    def __init__(self, model: Any, low: float, high: float, columns: Sequence[str] = CHEAP_COLUMNS, forest: Any = None) -> None:
+        self.scorer = Scorer(model, columns)
+        self.columns = list(columns)
+        self.low = low
+        self.high = high
+        self.forest = forest
+        self._full_cost: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path, forest: Any, forest_path: Path) -> Optional["Cascade"]:
+        """The cascade stored for `forest_path`, or None if there is none or it was built for another forest."""
+        if not path.exists():
+            return None
+        import joblib
+
+        artifact = joblib.load(path)
+        if artifact.get("forest_sha256") != file_sha256(forest_path):
+            warnings.warn(f"{path} was calibrated for a different {forest_path.name}; cascade disabled", RuntimeWarning)
+            return None
+        return cls(artifact["model"], artifact["low"], artifact["high"], artifact["columns"], forest)
+
+    def screen(self, features: Mapping[str, float]) -> tuple[float, bool]:
+        """(first-stage spam probability, whether it is confident enough to answer)."""
+        proba = self.scorer.score_one(features)
+        return proba, proba <= self.low or proba >= self.high
+
+    def screen_rows(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Same for an (n, len(columns)) array: (probabilities, confident mask)."""
+        proba = self.scorer.score_rows(X)
+        return proba, short_circuit(proba, self.low, self.high)
+
+    def record(self, short_circuited: int, fallback: int, first_stage_seconds: float, full_seconds: float = 0.0) -> None:
+        """Account one request or batch: first-stage time covers all its messages, full time only the fallbacks."""
+        total = short_circuited + fallback
+        if total == 0:
+            return
+        per_message = first_stage_seconds / total
+        with self._lock:
+            if fallback:
+                cost = full_seconds / fallback
+                self._full_cost = cost if self._full_cost is None else self._full_cost + FULL_COST_ALPHA * (cost - self._full_cost)
+            full_cost = self._full_cost
+        if short_circuited:
+            CASCADE_MESSAGES.labels("first_stage").inc(short_circuited)
+            if full_cost is not None:
+                CASCADE_SAVED_SECONDS.inc(max(full_cost - per_message, 0.0) * short_circuited)
+        if fallback:
+            CASCADE_MESSAGES.labels("forest").inc(fallback)
+            CASCADE_OVERHEAD_SECONDS.inc(per_message * fallback)
@@ -0,0 +1,459 @@
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+
+DATA_PATH = Path("data/processed/processed.csv")
+MODEL_PATH = Path("model_store/random_forest.joblib")
+OUTPUT_PATH = Path("model_store/random_forest.compact.joblib")
+REPORT_PATH = Path("reports/compaction.json")
+FEATURE_COLUMNS = [
+    "char_len",
+    "word_len",
+    "num_digits",
+    "num_urls",
+    "num_domains",
+    "upper_ratio",
+]
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+EXPERIMENT_NAME = "flight_delay"
+THRESHOLD_ENCODINGS = ("bins", "float16")
+LEAF_ENCODINGS = ("uint8", "float16")
+# строк за проход обхода: рабочие массивы (rows × trees) не должны расти с размером батча
+PREDICT_CHUNK_ROWS = 4096
+# split листа; коды внутренних узлов всегда меньше (см. проверку в compact_forest)
+LEAF_SPLIT = int(np.iinfo(np.uint16).max)
+
+
+class CompactForest:
+    """
+    Read-only binary forest with a numpy-only predict_proba.
+
+    Split thresholds are stored as per-feature bin codes (uint16) into a sorted table of
+    distinct thresholds, so `x <= threshold` becomes `bin(x) <= code` and stays exact
+    ("bins") or, with "float16", uses thresholds rounded to half precision. Leaf spam
+    probabilities are uint8 (1/255 steps) or float16. Identical subtrees, within and
+    across trees, are stored once. All (row, tree) pairs are walked together one level
+    per numpy step, dropping pairs as they reach a leaf.
+    """
+
+    # Scorer подаёт ndarray в порядке feature_names_in_ без pandas
+    accepts_ndarray = True
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        split: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        edges: list[np.ndarray],
+        feature_names: Sequence[str],
+        leaf_encoding: str,
+    ) -> None:
+        self.feature = feature
+        self.split = split
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.edges = edges
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.n_features_in_ = len(feature_names)
+        self.classes_ = np.array([0, 1])
+        self.leaf_encoding = leaf_encoding
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.feature, self.split, self.left, self.right, self.value, self.roots, *self.edges]
+        return int(sum(a.nbytes for a in arrays))
+
+    def _bin(self, X: np.ndarray) -> np.ndarray:
+        codes = np.empty(X.shape, dtype=np.int32)
+        for f, edges in enumerate(self.edges):
+            # число порогов строго меньше x: x <= edges[k] <=> code <= k
+            codes[:, f] = np.searchsorted(edges, X[:, f], side="left")
+        return codes
+
+    def _decode(self, raw: np.ndarray) -> np.ndarray:
+        if self.leaf_encoding == "uint8":
+            return raw.astype(np.float64) / 255.0
+        return raw.view(np.float16).astype(np.float64)
+
+    def tree_outputs(self, X: np.ndarray) -> np.ndarray:
+        """(n_rows, n_trees) spam probability of every tree."""
+        X = np.asarray(X, dtype=np.float64)
+        out = np.empty((X.shape[0], self.n_trees), dtype=np.float64)
+        n_trees = self.n_trees
+        for start in range(0, X.shape[0], PREDICT_CHUNK_ROWS):
+            chunk = X[start : start + PREDICT_CHUNK_ROWS]
+            codes = self._bin(chunk).ravel()
+            n_features = chunk.shape[1]
+            node = np.tile(self.roots.astype(np.int64), chunk.shape[0])
+            # пары (строка, дерево), ещё не дошедшие до листа; на глубине остаётся малая доля
+            active = np.flatnonzero(self.split[node] != LEAF_SPLIT)
+            row_base = (active // n_trees) * n_features
+            while active.size:
+                current = node[active]
+                go_left = codes[row_base + self.feature[current]] <= self.split[current]
+                current = np.where(go_left, self.left[current], self.right[current])
+                node[active] = current
+                still = self.split[current] != LEAF_SPLIT
+                active = active[still]
+                row_base = row_base[still]
+            out[start : start + chunk.shape[0]] = self._decode(self.value[node]).reshape(-1, n_trees)
+        return out
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        spam = self.tree_outputs(X).mean(axis=1)
+        return np.column_stack([1.0 - spam, spam])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return (self.predict_proba(X)[:, 1] >= 0.5).astype(int)
+
+
+def _smallest_uint(max_value: int) -> np.dtype:
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+def _leaf_spam(tree: Any) -> np.ndarray:
+    value = tree.value[:, 0, :]
+    totals = value.sum(axis=1)
+    # в новых sklearn value уже доли, в старых — веса; нормируем в обоих случаях
+    return np.divide(value[:, 1], totals, out=np.zeros(len(value)), where=totals > 0)
+
+
+def compact_forest(
+    model: Any,
+    tree_indices: Optional[Sequence[int]] = None,
+    threshold_encoding: str = "bins",
+    leaf_encoding: str = "uint8",
+) -> CompactForest:
+    """Quantize a fitted binary RandomForestClassifier and hash-cons identical subtrees."""
+    if threshold_encoding not in THRESHOLD_ENCODINGS:
+        raise ValueError(f"threshold_encoding must be one of {THRESHOLD_ENCODINGS}")
+    if leaf_encoding not in LEAF_ENCODINGS:
+        raise ValueError(f"leaf_encoding must be one of {LEAF_ENCODINGS}")
+    if list(getattr(model, "classes_", [0, 1])) != [0, 1] or getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("Only single-output binary forests with classes [0, 1] are supported")
+
+    estimators = model.estimators_
+    trees = [estimators[i].tree_ for i in (tree_indices if tree_indices is not None else range(len(estimators)))]
+    n_features = int(model.n_features_in_)
+    names = getattr(model, "feature_names_in_", None)
+    feature_names = [str(n) for n in names] if names is not None else FEATURE_COLUMNS[:n_features]
+
+    def quantize_threshold(t: np.ndarray) -> np.ndarray:
+        return t.astype(np.float16).astype(np.float64) if threshold_encoding == "float16" else t
+
+    edges = []
+    for f in range(n_features):
+        values = [quantize_threshold(t.threshold[t.feature == f]) for t in trees]
+        edges.append(np.unique(np.concatenate(values)) if values else np.empty(0))
+    if max(len(e) for e in edges) >= np.iinfo(np.uint16).max:
+        raise ValueError("Too many distinct thresholds for uint16 bin codes")
+
+    if leaf_encoding == "uint8":
+        def encode_leaf(p: float) -> int:
+            return int(round(p * 255))
+    else:
+        def encode_leaf(p: float) -> int:
+            return int(np.float16(p).view(np.uint16))
+
+    feature: list[int] = []
+    split: list[int] = []
+    left: list[int] = []
+    right: list[int] = []
+    value: list[int] = []
+    interned: dict[tuple, int] = {}
+
+    def intern(key: tuple, f: int, s: int, l: Optional[int], r: Optional[int], v: int) -> int:
+        node = interned.get(key)
+        if node is None:
+            node = len(feature)
+            interned[key] = node
+            feature.append(f)
+            split.append(s)
+            left.append(node if l is None else l)
+            right.append(node if r is None else r)
+            value.append(v)
+        return node
+
+    roots = []
+    for tree in trees:
+        spam = _leaf_spam(tree)
+        thresholds = quantize_threshold(tree.threshold)
+        ids = np.empty(tree.node_count, dtype=np.int64)
+        # sklearn нумерует узлы в прямом порядке, поэтому обратный проход видит детей раньше родителей
+        for i in range(tree.node_count - 1, -1, -1):
+            l, r = tree.children_left[i], tree.children_right[i]
+            if l == -1:
+                code = encode_leaf(spam[i])
+                ids[i] = intern(("leaf", code), 0, LEAF_SPLIT, None, None, code)
+            else:
+                f = int(tree.feature[i])
+                s = int(np.searchsorted(edges[f], thresholds[i]))
+                ids[i] = intern((f, s, int(ids[l]), int(ids[r])), f, s, int(ids[l]), int(ids[r]), 0)
+        roots.append(int(ids[0]))
+
+    index_dtype = _smallest_uint(len(feature))
+    return CompactForest(
+        feature=np.asarray(feature, dtype=_smallest_uint(n_features)),
+        split=np.asarray(split, dtype=np.uint16),
+        left=np.asarray(left, dtype=index_dtype),
+        right=np.asarray(right, dtype=index_dtype),
+        value=np.asarray(value, dtype=np.uint8 if leaf_encoding == "uint8" else np.uint16),
+        roots=np.asarray(roots, dtype=index_dtype),
+        edges=edges,
+        feature_names=feature_names,
+        leaf_encoding=leaf_encoding,
+    )
+
+
+def auc_columns(y: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    """ROC-AUC of every column of `scores` at once (Mann-Whitney U with tie-averaged ranks)."""
+    from scipy.stats import rankdata
+
+    y = np.asarray(y).astype(bool)
+    n_pos = int(y.sum())
+    n_neg = len(y) - n_pos
+    ranks = rankdata(scores, axis=0)
+    return (ranks[y].sum(axis=0) - n_pos * (n_pos + 1) / 2.0) / (n_pos * n_neg)
+
+
+def greedy_drop(per_tree: np.ndarray, y: np.ndarray, tolerance: float, min_trees: int = 1) -> list[int]:
+    """
+    Backward elimination: repeatedly remove the tree whose removal keeps ROC-AUC
+    of the averaged forest highest, while it stays within `tolerance` of the full forest.
+    Returns indices of the kept trees.
+    """
+    kept = list(range(per_tree.shape[1]))
+    total = per_tree.sum(axis=1)
+    floor = float(auc_columns(y, total[:, None])[0]) - tolerance
+    while len(kept) > max(min_trees, 1):
+        # среднее и сумма дают одинаковый AUC — делить на число деревьев не нужно
+        candidates = total[:, None] - per_tree[:, kept]
+        aucs = auc_columns(y, candidates)
+        best = int(np.argmax(aucs))
+        if aucs[best] < floor:
+            break
+        total = candidates[:, best]
+        kept.pop(best)
+    return kept
+
+
+def sklearn_nbytes(model: Any) -> int:
+    total = 0
+    for est in model.estimators_:
+        tree = est.tree_
+        for name in ("children_left", "children_right", "feature", "threshold", "value", "impurity", "n_node_samples"):
+            total += getattr(tree, name).nbytes
+    return total
+
+
+def pickled_bytes(obj: Any) -> int:
+    import joblib
+
+    buf = io.BytesIO()
+    joblib.dump(obj, buf)
+    return buf.getbuffer().nbytes
+
+
+def latency_us(predict, X: np.ndarray, repeats: int = 200) -> float:
+    predict(X)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1e6
+
+
+def split_holdout(X: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    The evaluate.py hold-out, halved: one half picks trees to drop, the other
+    reports quality, so the reported AUC is not the one the pruning optimised.
+    """
+    from sklearn.model_selection import train_test_split
+
+    _, X_test, _, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y)
+    X_sel, X_rep, y_sel, y_rep = train_test_split(
+        X_test, y_test, test_size=0.5, random_state=RANDOM_STATE, stratify=y_test
+    )
+    return X_sel, y_sel, X_rep, y_rep
+
+
+def compact_and_report(
+    model: Any,
+    X: np.ndarray,
+    y: np.ndarray,
+    threshold_encoding: str = "bins",
+    leaf_encoding: str = "uint8",
+    drop_trees: bool = False,
+    auc_tolerance: float = 0.001,
+    min_trees: int = 10,
+) -> tuple[CompactForest, dict]:
+    from src.scoring import Scorer
+
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    X_sel, y_sel, X_rep, y_rep = split_holdout(X, y)
+
+    compact = compact_forest(model, threshold_encoding=threshold_encoding, leaf_encoding=leaf_encoding)
+    if drop_trees:
+        kept = greedy_drop(compact.tree_outputs(X_sel), y_sel, auc_tolerance, min_trees)
+        compact = compact_forest(model, kept, threshold_encoding, leaf_encoding)
+
+    columns = list(compact.feature_names_in_)
+    original_scorer = Scorer(model, columns)
+    compact_scorer = Scorer(compact, columns)
+    p_orig = original_scorer.score_rows(X_rep)
+    p_comp = compact_scorer.score_rows(X_rep)
+    auc_orig = float(auc_columns(y_rep, p_orig[:, None])[0])
+    auc_comp = float(auc_columns(y_rep, p_comp[:, None])[0])
+
+    batch = X[:1000]
+    row = X[:1]
+    total_nodes = sum(e.tree_.node_count for e in model.estimators_)
+    report = {
+        "config": {
+            "threshold_encoding": threshold_encoding,
+            "leaf_encoding": leaf_encoding,
+            "drop_trees": drop_trees,
+            "auc_tolerance": auc_tolerance,
+            "min_trees": min_trees,
+        },
+        "structure": {
+            "trees_before": len(model.estimators_),
+            "trees_after": compact.n_trees,
+            "nodes_before": int(total_nodes),
+            "nodes_after": compact.n_nodes,
+        },
+        "size": {
+            "memory_bytes_before": sklearn_nbytes(model),
+            "memory_bytes_after": compact.nbytes,
+            "pickle_bytes_before": pickled_bytes(model),
+            "pickle_bytes_after": pickled_bytes(compact),
+        },
+        "latency": {
+            "single_us_before": latency_us(original_scorer.score_rows, row),
+            "single_us_after": latency_us(compact_scorer.score_rows, row),
+            "batch_us_per_row_before": latency_us(original_scorer.score_rows, batch, 20) / len(batch),
+            "batch_us_per_row_after": latency_us(compact_scorer.score_rows, batch, 20) / len(batch),
+        },
+        "quality": {
+            "n_report_samples": int(len(y_rep)),
+            "roc_auc_before": auc_orig,
+            "roc_auc_after": auc_comp,
+            "roc_auc_delta": auc_comp - auc_orig,
+            "max_abs_proba_diff": float(np.max(np.abs(p_orig - p_comp))),
+            "label_agreement": float(np.mean((p_orig >= 0.5) == (p_comp >= 0.5))),
+        },
+    }
+    return compact, report
+
+
+def load_training_data(path: Path) -> tuple[np.ndarray, np.ndarray]:
+    import pandas as pd
+
+    if not path.exists():
+        raise FileNotFoundError(f"Processed dataset not found at {path}")
+    df = pd.read_csv(path)
+    missing = [col for col in FEATURE_COLUMNS + ["target"] if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing expected columns in dataset: {missing}")
+    return df[FEATURE_COLUMNS].to_numpy(dtype=np.float32), df["target"].to_numpy()
+
+
+def log_to_mlflow(report: dict, model_path: Path, report_path: Path) -> None:
+    from src.tracking import TrackedRun
+
+    with TrackedRun(EXPERIMENT_NAME, run_name="compaction", stage="compact") as run:
+        run.log_params(report["config"])
+        metrics = {}
+        for section in ("structure", "size", "latency", "quality"):
+            metrics.update({f"{section}.{k}": float(v) for k, v in report[section].items()})
+        run.log_metrics(metrics)
+        run.log_artifact(report_path)
+        run.log_model_file(model_path)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Quantize and prune the trained forest into a compact serving artifact")
+    parser.add_argument("--model-path", type=Path, default=MODEL_PATH)
+    parser.add_argument("--data-path", type=Path, default=DATA_PATH)
+    parser.add_argument("--output", type=Path, default=OUTPUT_PATH)
+    parser.add_argument("--report-path", type=Path, default=REPORT_PATH)
+    parser.add_argument("--threshold-encoding", choices=THRESHOLD_ENCODINGS, default="bins")
+    parser.add_argument("--leaf-encoding", choices=LEAF_ENCODINGS, default="uint8")
+    parser.add_argument("--drop-trees", action="store_true", help="Greedily drop trees within --auc-tolerance")
+    parser.add_argument("--auc-tolerance", type=float, default=0.001, help="Allowed ROC-AUC loss from dropping trees")
+    parser.add_argument("--min-trees", type=int, default=10)
+    parser.add_argument("--no-mlflow", action="store_true", help="Skip MLflow logging")
+    return parser.parse_args()
+
+
+def main() -> None:
+    import joblib
+
+    args = parse_args()
+    X, y = load_training_data(args.data_path)
+    model = joblib.load(args.model_path)
+    compact, report = compact_and_report(
+        model,
+        X,
+        y,
+        threshold_encoding=args.threshold_encoding,
+        leaf_encoding=args.leaf_encoding,
+        drop_trees=args.drop_trees,
+        auc_tolerance=args.auc_tolerance,
+        min_trees=args.min_trees,
+    )
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = args.output.with_suffix(args.output.suffix + ".tmp")
+    joblib.dump(compact, tmp)
+    os.replace(tmp, args.output)
+    args.report_path.parent.mkdir(parents=True, exist_ok=True)
+    with args.report_path.open("w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+
+    if not args.no_mlflow:
+        log_to_mlflow(report, args.output, args.report_path)
+
+    s, q, lat, st = report["size"], report["quality"], report["latency"], report["structure"]
+    print(f"Compact model saved to {args.output}")
+    print(f"  trees {st['trees_before']} -> {st['trees_after']}, nodes {st['nodes_before']} -> {st['nodes_after']}")
+    print(f"  memory {s['memory_bytes_before'] / 1024:.0f}KiB -> {s['memory_bytes_after'] / 1024:.0f}KiB, "
+          f"pickle {s['pickle_bytes_before'] / 1024:.0f}KiB -> {s['pickle_bytes_after'] / 1024:.0f}KiB")
+    print(f"  single row {lat['single_us_before']:.0f}us -> {lat['single_us_after']:.0f}us, "
+          f"batch {lat['batch_us_per_row_before']:.2f} -> {lat['batch_us_per_row_after']:.2f}us/row")
+    print(f"  ROC AUC {q['roc_auc_before']:.4f} -> {q['roc_auc_after']:.4f}, "
+          f"max |dp| {q['max_abs_proba_diff']:.4f}, label agreement {q['label_agreement']:.4f}")
+    print(f"Report saved to {args.report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,266 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import shutil
+import urllib.error
+import urllib.request
+from email.utils import formatdate
 from pathlib import Path
+from typing import Iterator, Optional
+
 import pandas as pd
 
 RAW_DIR = Path("data/raw")
-RAW_DIR.mkdir(parents=True, exist_ok=True)
-OUT = RAW_DIR / "sms_spam.csv"
+OUT_DIR = RAW_DIR / "ingest"
+STAGING_DIR = RAW_DIR / ".staging"
+# зеркало по умолчанию лежит в репозитории — воркеры без сети тоже могут собрать набор
+DEFAULT_SOURCE = os.environ.get("DATA_SOURCE", str(RAW_DIR / "SMSSpamCollection"))
+CHUNK_ROWS = 50_000
+MANIFEST = "_manifest.json"
+SOURCE_SUFFIXES = {".csv", ".tsv", ".txt", ""}
+HASH_BLOCK = 1 << 20
 
-def main():
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for block in iter(lambda: fh.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fetch(url: str, staging_dir: Path = STAGING_DIR, timeout: float = 30.0) -> Path:
+    """
+    Download `url` into the staging dir, continuing a previous partial download with
+    an HTTP Range request. A file staged earlier is revalidated with a conditional GET
+    (its ETag / Last-Modified) and downloaded again only if the mirror has a newer one.
+    Returns the complete local file.
+    """
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    name = re.sub(r"[^\w.-]", "_", url.rstrip("/").rsplit("/", 1)[-1]) or "download"
+    target = staging_dir / name
+    partial = target.with_name(target.name + ".partial")
+    validators_path = target.with_name(target.name + ".validators.json")
+    headers = {}
+    offset = 0
+    if target.exists():
+        validators = _load_manifest(validators_path) or {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        headers["If-Modified-Since"] = validators.get("last_modified") or formatdate(target.stat().st_mtime, usegmt=True)
+    elif partial.exists():
+        offset = partial.stat().st_size
+        headers["Range"] = f"bytes={offset}-"
+    try:
+        resp = urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout)
+    except urllib.error.HTTPError as exc:
+        if exc.code == 304 and target.exists():
+            exc.close()
+            print(f"{url}: not modified, reusing {target}")
+            return target
+        raise
+    with resp:
+        # сервер без Range вернёт 200 и весь файл — начинаем заново
+        mode = "ab" if offset and resp.status == 206 else "wb"
+        with partial.open(mode) as fh:
+            shutil.copyfileobj(resp, fh, HASH_BLOCK)
+        validators = {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+    os.replace(partial, target)
+    _save_manifest(validators, validators_path)
+    return target
+
+
+def resolve_sources(source: str, staging_dir: Path = STAGING_DIR) -> list[Path]:
+    """A URL, a single file, or a file-drop directory (every csv/tsv/txt file, sorted)."""
+    if source.startswith(("http://", "https://")):
+        return [fetch(source, staging_dir)]
+    path = Path(source.removeprefix("file://"))
+    if path.is_dir():
+        files = sorted(
+            p for p in path.iterdir()
+            if p.is_file() and p.suffix.lower() in SOURCE_SUFFIXES and not p.name.startswith((".", "_"))
+        )
+        if not files:
+            raise FileNotFoundError(f"No source files in {path}")
+        return files
+    if not path.exists():
+        raise FileNotFoundError(f"Source not found at {path}")
+    return [path]
+
+
+def iter_records(path: Path, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """
+    Chunks of (text, label) from one source file.
+
+    `.csv` files carry a header with text/label (or Kaggle's v1/v2) columns; anything
+    else is read as the UCI `label<TAB>text` format without a header.
+    """
+    if path.suffix.lower() == ".csv":
+        reader = pd.read_csv(path, chunksize=chunk_rows, dtype=str, keep_default_na=False)
+        for chunk in reader:
+            chunk.columns = [c.strip().lower() for c in chunk.columns]
+            chunk = chunk.rename(columns={"v1": "label", "v2": "text"})
+            missing = {"text", "label"} - set(chunk.columns)
+            if missing:
+                raise ValueError(f"{path} is missing columns: {sorted(missing)}")
+            yield chunk[["text", "label"]]
+        return
+    reader = pd.read_csv(
+        path,
+        sep="\t",
+        names=["label", "text"],
+        chunksize=chunk_rows,
+        dtype=str,
+        keep_default_na=False,
+        quoting=csv.QUOTE_NONE,
+    )
+    for chunk in reader:
+        yield chunk[["text", "label"]]
+
+
+def _load_manifest(path: Path) -> Optional[dict]:
+    if not path.exists():
+        return None
     try:
-        from datasets import load_dataset
-        ds = load_dataset("sms_spam_collection", split="train")
-        df = pd.DataFrame(ds)
-        df.columns = [c.lower() for c in df.columns]
-        if "v1" in df.columns and "v2" in df.columns:
-            df = df.rename(columns={"v1": "label", "v2": "text"})
-        df = df[["text", "label"]].dropna()
-    except Exception:
-        print("HF dataset failed — downloading raw csv instead")
-        url = "https://raw.githubusercontent.com/justmarkham/pycon-2016-tutorial/master/data/sms.tsv"
-        df = pd.read_csv(url, sep="\t", names=["label", "text"])
-    df.to_csv(OUT, index=False)
-    print(f"Saved {len(df)} rows to {OUT}")
+        return json.loads(path.read_text(encoding="utf-8"))
+    except ValueError:
+        return None
+
+
+def _save_manifest(manifest: dict, path: Path) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _unchanged(path: Path, record: dict, prefix: str = "") -> bool:
+    """
+    Whether `path` still matches the `bytes`/`mtime_ns`/`sha256` keys (with `prefix`) of
+    `record`. Size and mtime decide without reading the file; only a touched file of the
+    same size is hashed, and if its content is the same the new mtime goes into `record`.
+    """
+    if not path.exists():
+        return False
+    stat = path.stat()
+    if stat.st_size != record.get(prefix + "bytes"):
+        return False
+    if stat.st_mtime_ns == record.get(prefix + "mtime_ns"):
+        return True
+    if sha256_file(path) != record.get(prefix + "sha256"):
+        return False
+    record[prefix + "mtime_ns"] = stat.st_mtime_ns
+    return True
+
+
+def _valid_prefix(manifest: dict, partition: Path) -> int:
+    """Number of leading chunks whose files are present and unchanged."""
+    for i, chunk in enumerate(manifest["chunks"]):
+        if not _unchanged(partition / chunk["file"], chunk):
+            return i
+    return len(manifest["chunks"])
+
+
+def ingest_file(path: Path, out_dir: Path = OUT_DIR, chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Stream one source into `out_dir/source=<name>/chunk-NNNNN.parquet`.
+
+    The per-source `_manifest.json` records the size, mtime and sha256 of the source
+    and of every written chunk; it is rewritten after each chunk, so an interrupted run
+    resumes after the last complete one. A source whose file and chunking already match
+    a complete manifest is skipped without being parsed; files are only hashed when their
+    size matches but their mtime does not.
+    """
+    name = re.sub(r"[^\w.-]", "_", path.stem or path.name)
+    partition = out_dir / f"source={name}"
+    manifest_path = partition / MANIFEST
+
+    manifest = _load_manifest(manifest_path)
+    recorded = json.dumps(manifest)
+    if manifest and (manifest.get("chunk_rows") != chunk_rows or not _unchanged(path, manifest, "source_")):
+        print(f"{path} or --chunk-rows changed since the last ingestion, rebuilding {partition}")
+        manifest = None
+    if manifest is None:
+        shutil.rmtree(partition, ignore_errors=True)
+        stat = path.stat()
+        manifest = {
+            "source": str(path),
+            "source_sha256": sha256_file(path),
+            "source_bytes": stat.st_size,
+            "source_mtime_ns": stat.st_mtime_ns,
+            "chunk_rows": chunk_rows,
+            "chunks": [],
+            "complete": False,
+        }
+
+    done = _valid_prefix(manifest, partition)
+    if manifest["complete"] and done == len(manifest["chunks"]):
+        if json.dumps(manifest) != recorded:
+            # файлы тронуты без изменений: запоминаем новые mtime, чтобы не хэшировать снова
+            _save_manifest(manifest, manifest_path)
+        print(f"{path}: {sum(c['rows'] for c in manifest['chunks'])} rows already ingested, skipping")
+        return manifest
+    manifest["chunks"] = manifest["chunks"][:done]
+    manifest["complete"] = False
+    partition.mkdir(parents=True, exist_ok=True)
+
+    for index, chunk in enumerate(iter_records(path, chunk_rows)):
+        if index < done:
+            continue
+        file_name = f"chunk-{index:05d}.parquet"
+        tmp = partition / f".{file_name}.tmp"
+        chunk.to_parquet(tmp, index=False)
+        os.replace(tmp, partition / file_name)
+        stat = (partition / file_name).stat()
+        manifest["chunks"].append(
+            {
+                "file": file_name,
+                "rows": int(len(chunk)),
+                "bytes": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": sha256_file(partition / file_name),
+            }
+        )
+        _save_manifest(manifest, manifest_path)
+
+    manifest["complete"] = True
+    _save_manifest(manifest, manifest_path)
+    resumed = f" (resumed after {done} chunks)" if done else ""
+    print(f"{path}: wrote {len(manifest['chunks']) - done} chunks to {partition}{resumed}")
+    return manifest
+
+
+def ingest(
+    source: str = DEFAULT_SOURCE,
+    out_dir: Path = OUT_DIR,
+    chunk_rows: int = CHUNK_ROWS,
+    staging_dir: Path = STAGING_DIR,
+) -> list[dict]:
+    return [ingest_file(path, out_dir, chunk_rows) for path in resolve_sources(source, staging_dir)]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Ingest raw SMS data into partitioned Parquet with checksum manifests")
+    parser.add_argument(
+        "--source",
+        default=DEFAULT_SOURCE,
+        help="Local file, file-drop directory or http(s) mirror URL (env DATA_SOURCE)",
+    )
+    parser.add_argument("--out-dir", type=Path, default=OUT_DIR)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    manifests = ingest(args.source, args.out_dir, args.chunk_rows)
+    rows = sum(c["rows"] for m in manifests for c in m["chunks"])
+    print(f"{rows} rows from {len(manifests)} source(s) in {args.out_dir}")
+
 
 if __name__ == "__main__":
     main()
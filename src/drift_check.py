@@ -4,7 +4,7 @@ import argparse
 import json
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Optional
 
 import joblib
 import numpy as np
@@ -110,6 +110,8 @@ def run_drift_check(
     ks_threshold: float = 0.15,
     metric_drop_threshold: float = 0.05,
     psi_bins: int = 10,
+    history_path: Optional[Path] = None,
+    segment: str = "all",
 ) -> dict:
     reference_df = load_dataset(reference_path)
     production_df = load_dataset(production_path)
@@ -164,6 +166,13 @@ def run_drift_check(
     status = "DRIFT DETECTED" if drift_detected else "No drift detected"
     print(status)
     print(f"Report saved to {report_path}")
+    if history_path is not None:
+        from src.drift_history import DriftHistory
+
+        # отчёт выше перезаписывается каждым прогоном, история — только дополняется
+        with DriftHistory(history_path) as history:
+            run_id = history.append(report, segment=segment)
+        print(f"Appended run {run_id} to drift history {history_path}")
     return report
 
 
@@ -199,6 +208,14 @@ def parse_args() -> argparse.Namespace:
         default=Path("reports/drift_report.json"),
         help="Where to write the drift report",
     )
+    parser.add_argument(
+        "--history-path",
+        type=Path,
+        default=Path("reports/drift_history.sqlite"),
+        help="Append-only drift history (SQLite); see src/drift_history.py",
+    )
+    parser.add_argument("--no-history", action="store_true", help="Do not append this run to the history")
+    parser.add_argument("--segment", default="all", help="Segment label stored with the run in the history")
     parser.add_argument("--psi-threshold", type=float, default=0.2, help="PSI threshold for drift flag")
     parser.add_argument("--ks-threshold", type=float, default=0.15, help="KS statistic threshold for drift flag")
     parser.add_argument(
@@ -228,6 +245,8 @@ def main() -> None:
         ks_threshold=args.ks_threshold,
         metric_drop_threshold=args.metric_drop_threshold,
         psi_bins=args.psi_bins,
+        history_path=None if args.no_history else args.history_path,
+        segment=args.segment,
     )
     if args.fail_on_drift and report["drift_detected"]:
         raise SystemExit(1)
@@ -0,0 +1,343 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+
+HISTORY_PATH = Path(os.environ.get("DRIFT_HISTORY_PATH", "reports/drift_history.sqlite"))
+DEFAULT_SEGMENT = "all"
+EXPORTER_PORT = 9108
+RELATIVE_RE = re.compile(r"^(\d+(?:\.\d+)?)([smhdw])$")
+RELATIVE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+BUCKETS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+
+# feature_stats без rowid и с ключом (feature, ts, ...): строки одного признака лежат в
+# B-дереве подряд по времени, диапазонный запрос читает только свои страницы; последний
+# прогон сегмента находится по индексу runs (segment, ts) без скана истории
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    segment TEXT NOT NULL,
+    ts REAL NOT NULL,
+    production_path TEXT,
+    reference_path TEXT,
+    model_path TEXT,
+    psi_threshold REAL,
+    ks_threshold REAL,
+    baseline_roc_auc REAL,
+    current_roc_auc REAL,
+    metric_drop REAL,
+    drift_detected INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_segment_ts ON runs (segment, ts);
+CREATE TABLE IF NOT EXISTS feature_stats (
+    feature TEXT NOT NULL,
+    ts REAL NOT NULL,
+    segment TEXT NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    psi REAL,
+    ks REAL,
+    drift INTEGER NOT NULL,
+    PRIMARY KEY (feature, ts, segment, run_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS feature_stats_ts ON feature_stats (ts);
+"""
+
+
+def parse_time(value: str, now: Optional[float] = None) -> float:
+    """Unix time from an ISO date/datetime or a relative age like `90d`, `12h`, `2w`."""
+    match = RELATIVE_RE.match(value.strip())
+    if match:
+        return (time.time() if now is None else now) - float(match.group(1)) * RELATIVE_UNITS[match.group(2)]
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+class DriftHistory:
+    """
+    Append-only history of drift checks in SQLite: one `runs` row per check and one
+    `feature_stats` row per (feature, segment) with its PSI/KS. Rows are never updated,
+    so concurrent writers (Airflow retries, backfills) only add data.
+    """
+
+    def __init__(self, path: Path = HISTORY_PATH) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        # WAL: экспортер и CLI читают, не блокируя запись очередного прогона
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "DriftHistory":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def append(self, report: dict, segment: str = DEFAULT_SEGMENT) -> int:
+        """Store one `run_drift_check` report; returns its run id."""
+        ts = parse_time(report["generated_at"]) if report.get("generated_at") else time.time()
+        metrics = report.get("metrics") or {}
+        with self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO runs (segment, ts, production_path, reference_path, model_path, psi_threshold, ks_threshold,"
+                " baseline_roc_auc, current_roc_auc, metric_drop, drift_detected)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    segment,
+                    ts,
+                    report.get("production_path"),
+                    report.get("reference_path"),
+                    report.get("model_path"),
+                    report.get("psi_threshold"),
+                    report.get("ks_threshold"),
+                    metrics.get("baseline_roc_auc"),
+                    metrics.get("current_roc_auc"),
+                    metrics.get("drop"),
+                    int(bool(report.get("drift_detected"))),
+                ),
+            )
+            run_id = int(cur.lastrowid)
+            self._conn.executemany(
+                "INSERT INTO feature_stats (feature, segment, ts, run_id, psi, ks, drift) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (feature, segment, ts, run_id, stats.get("psi"), stats.get("ks"), int(bool(stats.get("drift"))))
+                    for feature, stats in (report.get("features") or {}).items()
+                ],
+            )
+        return run_id
+
+    def _query_sql(
+        self,
+        features: Optional[Iterable[str]] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        segment: Optional[str] = None,
+        bucket: Optional[str] = None,
+    ) -> tuple[str, list]:
+        where, params = [], []
+        features = list(features or [])
+        if features:
+            where.append(f"feature IN ({', '.join('?' * len(features))})")
+            params.extend(features)
+        if segment is not None:
+            where.append("segment = ?")
+            params.append(segment)
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("ts < ?")
+            params.append(until)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        if not features and (since is not None or until is not None):
+            # без признака ключ не помогает, а без ANALYZE планировщик выбирает полный скан
+            clause = f"INDEXED BY feature_stats_ts {clause}"
+
+        if bucket is None:
+            sql = (
+                f"SELECT feature, segment, ts, run_id, psi, ks, drift FROM feature_stats {clause}"
+                " ORDER BY feature, ts, segment"
+            )
+            return sql, params
+        if bucket not in BUCKETS:
+            raise ValueError(f"bucket must be one of {sorted(BUCKETS)}")
+        width = BUCKETS[bucket]
+        sql = (
+            f"SELECT feature, segment, CAST(ts / {width} AS INTEGER) * {width} AS ts, COUNT(*) AS runs,"
+            " AVG(psi) AS psi_mean, MAX(psi) AS psi_max, AVG(ks) AS ks_mean, MAX(ks) AS ks_max,"
+            f" SUM(drift) AS drift_runs FROM feature_stats {clause}"
+            f" GROUP BY feature, segment, CAST(ts / {width} AS INTEGER) ORDER BY feature, segment, ts"
+        )
+        return sql, params
+
+    def query(self, **filters: Any) -> list[dict[str, Any]]:
+        """
+        Feature stats filtered by `features`, `segment` and the [`since`, `until`) unix
+        time range, ordered by feature, segment and time. With `bucket` ("hour", "day",
+        "week") rows are aggregated per bucket: mean and max PSI/KS and the number of
+        runs that flagged drift.
+        """
+        sql, params = self._query_sql(**filters)
+        return [{**dict(row), "time": iso(row["ts"])} for row in self._conn.execute(sql, params)]
+
+    def explain(self, **filters: Any) -> list[str]:
+        """SQLite query plan of `query(**filters)`, to check which index a range query uses."""
+        sql, params = self._query_sql(**filters)
+        return [row[3] for row in self._conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+    def segments(self) -> list[str]:
+        return [row[0] for row in self._conn.execute("SELECT DISTINCT segment FROM runs ORDER BY segment")]
+
+    def latest(self) -> list[dict[str, Any]]:
+        """Feature stats of the most recent run of every segment, with that run's model metrics."""
+        rows = []
+        for segment in self.segments():
+            run = self._conn.execute(
+                "SELECT run_id, ts, current_roc_auc, metric_drop, drift_detected FROM runs"
+                " WHERE segment = ? ORDER BY ts DESC, run_id DESC LIMIT 1",
+                (segment,),
+            ).fetchone()
+            stats = self._conn.execute(
+                "SELECT feature, segment, ts, run_id, psi, ks, drift FROM feature_stats"
+                " WHERE ts = ? AND segment = ? AND run_id = ? ORDER BY feature",
+                (run["ts"], segment, run["run_id"]),
+            )
+            for row in stats:
+                rows.append(
+                    {
+                        **dict(row),
+                        "current_roc_auc": run["current_roc_auc"],
+                        "metric_drop": run["metric_drop"],
+                        "drift_detected": run["drift_detected"],
+                        "time": iso(row["ts"]),
+                    }
+                )
+        return rows
+
+
+class DriftCollector:
+    """
+    Prometheus collector over the latest rows of the history, read on every scrape:
+    Grafana charts drift without re-running checks and the exporter keeps no state.
+    """
+
+    def __init__(self, path: Path = HISTORY_PATH) -> None:
+        self.path = path
+
+    def collect(self):
+        from prometheus_client.core import GaugeMetricFamily
+
+        psi = GaugeMetricFamily("drift_psi", "PSI of the latest drift check", labels=["feature", "segment"])
+        ks = GaugeMetricFamily("drift_ks", "KS statistic of the latest drift check", labels=["feature", "segment"])
+        flagged = GaugeMetricFamily(
+            "drift_feature_flagged", "1 if the latest check flagged the feature", labels=["feature", "segment"]
+        )
+        last_run = GaugeMetricFamily(
+            "drift_last_check_timestamp_seconds", "Unix time of the latest drift check", labels=["segment"]
+        )
+        detected = GaugeMetricFamily(
+            "drift_detected", "1 if the latest check of the segment detected drift", labels=["segment"]
+        )
+        roc_auc = GaugeMetricFamily("drift_current_roc_auc", "ROC-AUC of the model on the latest batch", labels=["segment"])
+        if self.path.exists():
+            with DriftHistory(self.path) as history:
+                rows = history.latest()
+            segments: dict[str, dict] = {}
+            for row in rows:
+                labels = [row["feature"], row["segment"]]
+                if row["psi"] is not None:
+                    psi.add_metric(labels, row["psi"])
+                if row["ks"] is not None:
+                    ks.add_metric(labels, row["ks"])
+                flagged.add_metric(labels, row["drift"])
+                segments[row["segment"]] = row
+            for segment, row in segments.items():
+                last_run.add_metric([segment], row["ts"])
+                detected.add_metric([segment], row["drift_detected"])
+                if row["current_roc_auc"] is not None:
+                    roc_auc.add_metric([segment], row["current_roc_auc"])
+        yield from (psi, ks, flagged, last_run, detected, roc_auc)
+
+
+def serve_exporter(path: Path, port: int) -> None:
+    from prometheus_client import CollectorRegistry, start_http_server
+
+    registry = CollectorRegistry()
+    registry.register(DriftCollector(path))
+    start_http_server(port, registry=registry)
+    print(f"Serving drift metrics from {path} on :{port}/metrics")
+    while True:
+        time.sleep(3600)
+
+
+def _print_rows(rows: list[dict], fmt: str) -> None:
+    if fmt == "json":
+        print(json.dumps(rows, indent=2))
+        return
+    if not rows:
+        print("No rows")
+        return
+    columns = [c for c in rows[0] if c not in ("ts", "run_id")]
+    print("  ".join(f"{c:>12}" if c != "time" else f"{c:<25}" for c in columns))
+    for row in rows:
+        cells = []
+        for c in columns:
+            value = row[c]
+            if c == "time":
+                cells.append(f"{value:<25}")
+            elif isinstance(value, float):
+                cells.append(f"{value:>12.4f}")
+            else:
+                cells.append(f"{'' if value is None else value!s:>12}")
+        print("  ".join(cells))
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Query and export the drift-check history")
+    parser.add_argument("--history-path", type=Path, default=HISTORY_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    query = sub.add_parser("query", help="PSI/KS of features over a time range")
+    query.add_argument("--feature", action="append", default=[], help="Repeatable; all features if omitted")
+    query.add_argument("--segment", default=None)
+    query.add_argument("--since", default=None, help="ISO date/datetime or age like 90d, 12h")
+    query.add_argument("--until", default=None)
+    query.add_argument("--bucket", choices=sorted(BUCKETS), default=None, help="Aggregate per time bucket")
+    query.add_argument("--format", choices=("table", "json"), default="table")
+
+    latest = sub.add_parser("latest", help="Latest stats of every feature")
+    latest.add_argument("--format", choices=("table", "json"), default="table")
+
+    ingest = sub.add_parser("ingest", help="Append existing drift_report.json files (backfill)")
+    ingest.add_argument("reports", type=Path, nargs="+")
+    ingest.add_argument("--segment", default=DEFAULT_SEGMENT)
+
+    export = sub.add_parser("export", help="Serve the latest values as Prometheus metrics")
+    export.add_argument("--port", type=int, default=EXPORTER_PORT)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.command == "export":
+        serve_exporter(args.history_path, args.port)
+        return
+    with DriftHistory(args.history_path) as history:
+        if args.command == "query":
+            rows = history.query(
+                features=args.feature,
+                since=parse_time(args.since) if args.since else None,
+                until=parse_time(args.until) if args.until else None,
+                segment=args.segment,
+                bucket=args.bucket,
+            )
+            _print_rows(rows, args.format)
+        elif args.command == "latest":
+            _print_rows(history.latest(), args.format)
+        elif args.command == "ingest":
+            for report_path in args.reports:
+                with report_path.open("r", encoding="utf-8") as fh:
+                    run_id = history.append(json.load(fh), segment=args.segment)
+                print(f"{report_path} -> run {run_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,6 @@ from pathlib import Path
 from typing import Any
 
 import joblib
-import mlflow
 import pandas as pd
 from sklearn.metrics import (
     confusion_matrix,
@@ -15,6 +14,8 @@ from sklearn.metrics import (
 )
 from sklearn.model_selection import train_test_split
 
+from src.tracking import TrackedRun
+
 
 DATA_PATH = Path("data/processed/processed.csv")
 MODEL_PATH = Path("model_store/random_forest.joblib")
@@ -100,11 +101,10 @@ def main() -> None:
 
     save_report(metrics, cm, n_samples, REPORT_PATH)
 
-    mlflow.set_experiment(EXPERIMENT_NAME)
-    with mlflow.start_run(run_name="evaluation"):
-        mlflow.log_metrics(metrics)
+    with TrackedRun(EXPERIMENT_NAME, run_name="evaluation", stage="evaluate") as run:
+        run.log_metrics(metrics)
         tn, fp, fn, tp = (cm[0][0], cm[0][1], cm[1][0], cm[1][1])
-        mlflow.log_metrics(
+        run.log_metrics(
             {
                 "confusion_tn": tn,
                 "confusion_fp": fp,
@@ -112,8 +112,8 @@ def main() -> None:
                 "confusion_tp": tp,
             }
         )
-        mlflow.log_metric("n_test_samples", n_samples)
-        mlflow.log_artifact(str(REPORT_PATH))
+        run.log_metric("n_test_samples", n_samples)
+        run.log_artifact(REPORT_PATH)
 
     print("Evaluation metrics:")
     for name, value in metrics.items():
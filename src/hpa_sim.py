@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import os
+import time
+from pathlib import Path
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+from src.bench_common import SMS_CORPUS_PATH, default_report_path, message_mix, run_metadata, save_report
+from src.bench_load import uvicorn_client
+
+
+SCRAPED = (
+    "process_cpu_seconds_total",
+    "api_scoring_arrivals_total",
+    "api_capacity_rps_estimate",
+    "api_in_flight_requests",
+    "api_queue_wait_seconds_sum",
+    "api_queue_wait_seconds_count",
+)
+
+
+def scrape(text: str) -> dict[str, float]:
+    """Unlabelled samples of the metrics the autoscaling signals are built from."""
+    values: dict[str, float] = {}
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            if sample.name in SCRAPED and not sample.labels:
+                values[sample.name] = sample.value
+    return values
+
+
+def windowed(history: list[tuple[float, dict]], now: float, window: float) -> tuple[dict, dict, float]:
+    """Oldest sample inside the window, the latest one and the time between them (like rate[window])."""
+    oldest = next((s for s in history if s[0] >= now - window), history[-1])
+    latest = history[-1]
+    return oldest[1], latest[1], latest[0] - oldest[0]
+
+
+def hpa_desired(current: int, value: float, target: float, max_replicas: int, tolerance: float = 0.1) -> int:
+    """Kubernetes HPA formula: ceil(current * value / target), ignoring changes inside the tolerance."""
+    ratio = value / target
+    if abs(ratio - 1.0) <= tolerance:
+        return current
+    return max(1, min(max_replicas, math.ceil(current * ratio)))
+
+
+def signals(history: list[tuple[float, dict]], now: float, args: argparse.Namespace) -> dict:
+    old, new, dt = windowed(history, now, args.cpu_window)
+    cores = (new["process_cpu_seconds_total"] - old["process_cpu_seconds_total"]) / dt if dt > 0 else 0.0
+    # контейнер не может потратить больше лимита: всё сверх него — троттлинг
+    cpu_util = min(cores, args.cpu_limit) / args.cpu_request
+
+    old, new, dt = windowed(history, now, args.window)
+    arrivals = (new["api_scoring_arrivals_total"] - old["api_scoring_arrivals_total"]) / dt if dt > 0 else 0.0
+    capacity = new.get("api_capacity_rps_estimate", 0.0)
+    saturation = arrivals / capacity if capacity > 0 else 0.0
+    waited = new.get("api_queue_wait_seconds_count", 0.0) - old.get("api_queue_wait_seconds_count", 0.0)
+    queue_wait = (
+        (new.get("api_queue_wait_seconds_sum", 0.0) - old.get("api_queue_wait_seconds_sum", 0.0)) / waited
+        if waited > 0
+        else 0.0
+    )
+    return {
+        "cpu_utilization": cpu_util,
+        "arrival_rps": arrivals,
+        "capacity_rps": capacity,
+        "saturation": saturation,
+        "queue_wait_seconds": queue_wait,
+        "in_flight": new.get("api_in_flight_requests", 0.0),
+    }
+
+
+async def run_simulation(args: argparse.Namespace) -> dict:
+    texts = message_mix(sms_path=args.sms_path, jsonl_path=None, n=10_000, seed=args.seed)
+    timeline: list[dict] = []
+    history: list[tuple[float, dict]] = []
+    errors = 0
+    scrape_failures = 0
+
+    async with uvicorn_client(max_connections=args.max_connections) as client:
+        start = time.perf_counter()
+        stop = start + args.duration
+
+        async def one(i: int) -> None:
+            nonlocal errors
+            try:
+                resp = await client.post("/predict", json={"text": texts[i % len(texts)]})
+                if resp.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+
+        async def load() -> None:
+            # open-loop: запросы отправляются по расписанию, независимо от ответов
+            tasks = []
+            sent = 0
+            while (now := time.perf_counter()) < stop:
+                elapsed = now - start
+                rate = args.peak_rate if elapsed >= args.step_at else args.base_rate
+                due = int(args.base_rate * min(elapsed, args.step_at) + args.peak_rate * max(elapsed - args.step_at, 0))
+                while sent < due:
+                    tasks.append(asyncio.ensure_future(one(sent)))
+                    sent += 1
+                await asyncio.sleep(min(0.01, 1.0 / max(rate, 1.0)))
+            # хвост очереди не нужен: решения HPA уже записаны
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        async def sample() -> None:
+            nonlocal scrape_failures
+            # отдельный клиент, как у Prometheus: скрейп не должен стоять в пуле соединений нагрузки
+            async with httpx.AsyncClient(base_url=client.base_url, timeout=args.tick * 5) as scraper:
+                while (now := time.perf_counter()) < stop:
+                    try:
+                        resp = await scraper.get("/metrics")
+                    except httpx.HTTPError:
+                        # перегруженный под GIL event loop не успевает ответить — как и настоящему Prometheus
+                        scrape_failures += 1
+                        continue
+                    history.append((now - start, scrape(resp.text)))
+                    if len(history) > 1:
+                        sig = signals(history, now - start, args)
+                        sig["t"] = round(now - start, 2)
+                        sig["replicas_cpu"] = hpa_desired(
+                            1, sig["cpu_utilization"], args.cpu_target, args.max_replicas
+                        )
+                        sig["replicas_custom"] = max(
+                            hpa_desired(1, sig["saturation"], args.saturation_target, args.max_replicas),
+                            hpa_desired(1, sig["queue_wait_seconds"], args.queue_wait_target, args.max_replicas),
+                        )
+                        timeline.append(sig)
+                    await asyncio.sleep(args.tick)
+
+        await asyncio.gather(load(), sample())
+
+    def first_scale_up(key: str) -> float | None:
+        for point in timeline:
+            if point["t"] >= args.step_at and point[key] > 1:
+                return round(point["t"] - args.step_at, 2)
+        return None
+
+    return {
+        "meta": run_metadata(),
+        "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items() if k != "output"},
+        "results": {
+            "errors": errors,
+            "scrape_failures": scrape_failures,
+            "seconds_to_scale_up": {
+                "cpu": first_scale_up("replicas_cpu"),
+                "custom": first_scale_up("replicas_custom"),
+            },
+            "false_scale_ups_before_step": {
+                "cpu": sum(1 for p in timeline if p["t"] < args.step_at and p["replicas_cpu"] > 1),
+                "custom": sum(1 for p in timeline if p["t"] < args.step_at and p["replicas_custom"] > 1),
+            },
+        },
+        "timeline": timeline,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Step the API from base to peak load and compare CPU-based vs saturation-based HPA decisions"
+    )
+    parser.add_argument("--duration", type=float, default=45.0, help="Total seconds of load")
+    parser.add_argument("--step-at", type=float, default=15.0, help="Second at which load jumps to --peak-rate")
+    parser.add_argument("--base-rate", type=float, default=10.0, help="Req/s before the step")
+    parser.add_argument("--peak-rate", type=float, default=120.0, help="Req/s after the step")
+    parser.add_argument("--simulated-latency", type=float, default=0.5, help="SIMULATED_LATENCY_SEC for the server")
+    parser.add_argument("--tick", type=float, default=1.0, help="Seconds between metric scrapes / HPA evaluations")
+    parser.add_argument("--window", type=float, default=30.0, help="Rate window of the recording rules")
+    parser.add_argument("--cpu-window", type=float, default=30.0, help="CPU usage averaging window (metrics-server)")
+    parser.add_argument("--cpu-request", type=float, default=0.1, help="Pod CPU request in cores (k8s/deployment.yaml)")
+    parser.add_argument("--cpu-limit", type=float, default=0.5, help="Pod CPU limit in cores (k8s/deployment.yaml)")
+    parser.add_argument("--cpu-target", type=float, default=0.7, help="averageUtilization from k8s/hpa.yaml")
+    parser.add_argument("--saturation-target", type=float, default=0.7, help="Target from k8s/hpa-custom.yaml")
+    parser.add_argument("--queue-wait-target", type=float, default=0.05, help="Target from k8s/hpa-custom.yaml")
+    parser.add_argument("--max-replicas", type=int, default=5)
+    parser.add_argument("--max-connections", type=int, default=1000, help="Client connection pool size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sms-path", type=Path, default=SMS_CORPUS_PATH)
+    parser.add_argument("--output", type=Path, default=None, help="Where to write the JSON report")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    os.environ["SIMULATED_LATENCY_SEC"] = str(args.simulated_latency)
+    # без отбрасывания: нужно увидеть, как растёт очередь
+    os.environ.setdefault("ADMISSION_CONTROL", "0")
+    report = asyncio.run(run_simulation(args))
+    output = args.output or default_report_path("hpa-sim")
+    save_report(report, output)
+
+    print(f"{'t':>6} {'rps':>7} {'cap':>7} {'sat':>6} {'qwait':>7} {'cpu%':>6} {'cpu→':>5} {'custom→':>8}")
+    for p in report["timeline"]:
+        print(
+            f"{p['t']:>6.1f} {p['arrival_rps']:>7.1f} {p['capacity_rps']:>7.1f} {p['saturation']:>6.2f} "
+            f"{p['queue_wait_seconds'] * 1000:>6.0f}ms {p['cpu_utilization'] * 100:>5.0f}% "
+            f"{p['replicas_cpu']:>5} {p['replicas_custom']:>8}"
+        )
+    res = report["results"]
+    print(f"Seconds from load step to first scale-up: {res['seconds_to_scale_up']}")
+    print(f"Scale-ups requested before the step: {res['false_scale_ups_before_step']}")
+    print(f"Request errors: {res['errors']}, failed scrapes: {res['scrape_failures']}")
+    print(f"Report saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
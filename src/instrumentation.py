@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Iterator, Optional
+
+from prometheus_client import Histogram
+
+
+STAGE_LATENCY = Histogram(
+    "predict_stage_latency_seconds",
+    "Latency of individual /predict stages in seconds",
+    ["stage"],
+    buckets=(0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+
+_NULL_STAGE = nullcontext()
+_enabled = os.environ.get("STAGE_TIMING", "1").lower() not in ("0", "false", "no")
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(enabled: bool) -> None:
+    global _enabled
+    _enabled = bool(enabled)
+
+
+class JsonlSpanExporter:
+    """
+    Minimal OpenTelemetry-style span sink: one JSON object per line in a local file.
+    Spans are buffered and written in batches to keep file I/O off most requests.
+    """
+
+    def __init__(self, path: Path, batch_size: int = 256) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self._buffer: list[dict] = []
+        self._lock = threading.Lock()
+
+    def export(self, spans: list[dict]) -> None:
+        with self._lock:
+            self._buffer.extend(spans)
+            if len(self._buffer) < self.batch_size:
+                return
+            pending, self._buffer = self._buffer, []
+        self._write(pending)
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._buffer = self._buffer, []
+        if pending:
+            self._write(pending)
+
+    def _write(self, spans: list[dict]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as fh:
+            fh.write("".join(json.dumps(span) + "\n" for span in spans))
+
+
+_span_path = os.environ.get("STAGE_SPANS_PATH")
+span_exporter: Optional[JsonlSpanExporter] = JsonlSpanExporter(Path(_span_path)) if _span_path else None
+
+
+class StageTimer:
+    """
+    Collects per-stage durations for one request.
+    When disabled, `stage()` hands out a shared no-op context so the hot path pays
+    only for an attribute check.
+    """
+
+    __slots__ = ("enabled", "durations", "_spans", "_trace_id", "_root_span_id")
+
+    def __init__(self, enabled: Optional[bool] = None) -> None:
+        self.enabled = _enabled if enabled is None else enabled
+        self.durations: dict[str, float] = {}
+        self._spans: Optional[list[dict]] = [] if self.enabled and span_exporter is not None else None
+        self._trace_id = secrets.token_hex(16) if self._spans is not None else ""
+        self._root_span_id = secrets.token_hex(8) if self._spans is not None else ""
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name: str) -> Iterator[None]:
+        start_ns = time.perf_counter_ns()
+        wall_ns = time.time_ns() if self._spans is not None else 0
+        try:
+            yield
+        finally:
+            elapsed_ns = time.perf_counter_ns() - start_ns
+            self.record(name, elapsed_ns / 1e9, wall_ns)
+
+    def record(self, name: str, seconds: float, wall_start_ns: int = 0) -> None:
+        if not self.enabled:
+            return
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        if self._spans is not None:
+            start = wall_start_ns or time.time_ns() - int(seconds * 1e9)
+            self._spans.append(
+                {
+                    "trace_id": self._trace_id,
+                    "span_id": secrets.token_hex(8),
+                    "parent_span_id": self._root_span_id,
+                    "name": name,
+                    "start_time_unix_nano": start,
+                    "end_time_unix_nano": start + int(seconds * 1e9),
+                }
+            )
+
+    def finish(self, root_name: str = "predict") -> None:
+        """Push collected durations to Prometheus and, if configured, spans to the exporter."""
+        if not self.enabled:
+            return
+        for name, seconds in self.durations.items():
+            STAGE_LATENCY.labels(name).observe(seconds)
+        if self._spans:
+            start = min(s["start_time_unix_nano"] for s in self._spans)
+            end = max(s["end_time_unix_nano"] for s in self._spans)
+            root = {
+                "trace_id": self._trace_id,
+                "span_id": self._root_span_id,
+                "parent_span_id": None,
+                "name": root_name,
+                "start_time_unix_nano": start,
+                "end_time_unix_nano": end,
+            }
+            span_exporter.export([root] + self._spans)
+
+
+NULL_TIMER = StageTimer(enabled=False)
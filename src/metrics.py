@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Iterable, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+
+
+OTHER = "other"
+
+
+def multiproc_dir() -> Optional[str]:
+    """
+    Shared directory of mmap'ed metric files. prometheus_client picks the storage
+    backend when it is imported, so the variable must be set before the workers start
+    (gunicorn_conf.py does that).
+    """
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or None
+
+
+def render_latest() -> tuple[bytes, str]:
+    """Exposition for /metrics: aggregated over all workers in multiprocess mode, else this process."""
+    path = multiproc_dir()
+    if path is None:
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=path)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop live* gauge files of an exited worker so in-flight counts do not stick."""
+    path = multiproc_dir()
+    if path is not None:
+        multiprocess.mark_process_dead(pid, path)
+
+
+class LabelGuard:
+    """
+    Caps the number of distinct values a label can take. The first `limit` values
+    pass through, later ones collapse into "other"; `allowed` values always pass.
+    Every distinct label value is a separate series (and, in multiprocess mode,
+    an entry in every worker's mmap file), so the cap bounds memory and scrape size.
+    """
+
+    def __init__(self, limit: int, allowed: Iterable[str] = ()) -> None:
+        self.limit = limit
+        self.allowed = frozenset(allowed)
+        self._seen: set[str] = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, value: str) -> str:
+        if value in self.allowed or value in self._seen:
+            return value
+        with self._lock:
+            if len(self._seen) >= self.limit:
+                return OTHER
+            self._seen.add(value)
+        return value
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from src.metrics import LabelGuard
+from src.scoring import Scorer
+from src.singleflight import SingleFlight
+
+
+# имя модели — один сегмент пути: без "/" и "..", чтобы не выйти за пределы хранилища
+MODEL_NAME_RE = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]*$")
+MODEL_SUFFIX = ".joblib"
+# label для несуществующих имён: их произвольно много, в серии они не попадают
+NOT_FOUND_LABEL = "unknown"
+
+MODEL_CACHE_REQUESTS = Counter(
+    "model_cache_requests_total",
+    "Named-model lookups by result (hit, miss, not_found, invalid)",
+    ["model", "result"],
+)
+MODEL_LOAD_SECONDS = Histogram(
+    "model_load_seconds",
+    "Time to load a model from the store and build its scorer",
+    ["model"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+MODEL_CACHE_BYTES = Gauge(
+    "model_cache_bytes",
+    "Artifact size of a loaded model, its memory estimate (0 once evicted)",
+    ["model"],
+    multiprocess_mode="livesum",
+)
+MODEL_CACHE_EVICTIONS = Counter(
+    "model_cache_evictions_total",
+    "Models dropped from the cache by reason (memory, idle)",
+    ["model", "reason"],
+)
+
+
+class ModelNotFound(LookupError):
+    pass
+
+
+class InvalidModel(ValueError):
+    """The artifact exists but is not a classifier the service can score with."""
+
+
+def _load_joblib(path: Path) -> Any:
+    import joblib
+
+    return joblib.load(path)
+
+
+@dataclass
+class CachedModel:
+    name: str
+    path: Path
+    scorer: Scorer
+    nbytes: int
+    load_seconds: float
+    last_used: float = field(default_factory=time.monotonic)
+    hits: int = 0
+
+
+class ModelCache:
+    """
+    On-demand LRU of named models from a model store directory.
+
+    `get(name)` returns the scorer for `<model_dir>/<name>.joblib`, loading it on the
+    first request; concurrent first requests for the same name share one load. The
+    total estimated memory of loaded models is kept under `max_bytes` by evicting the
+    least recently used ones, and models unused for `idle_seconds` are dropped on the
+    next access. A model larger than the whole budget is still served, alone.
+
+    The store may hold other artifacts (cascade first stages, checkpoints): a loaded
+    object without `predict_proba`, or with another feature count, raises InvalidModel,
+    and the file is not loaded again until its size or mtime changes. The memory estimate
+    of a model is the size of its (uncompressed joblib) file.
+    """
+
+    def __init__(
+        self,
+        model_dir: Path,
+        feature_columns: Sequence[str],
+        max_bytes: int,
+        idle_seconds: float = 0.0,
+        loader: Callable[[Path], Any] = _load_joblib,
+        clock: Callable[[], float] = time.monotonic,
+        label_limit: int = 50,
+    ) -> None:
+        self.model_dir = model_dir
+        self.feature_columns = list(feature_columns)
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._loader = loader
+        self._clock = clock
+        self._entries: OrderedDict[str, CachedModel] = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._label = LabelGuard(label_limit)
+        # name -> (size, mtime_ns) файла, который уже не удалось загрузить как модель
+        self._invalid: dict[str, tuple[int, int]] = {}
+
+    def path_for(self, name: str) -> Path:
+        if not MODEL_NAME_RE.match(name):
+            raise ModelNotFound(f"Invalid model name '{name}'")
+        path = self.model_dir / f"{name}{MODEL_SUFFIX}"
+        if not path.is_file():
+            raise ModelNotFound(f"Model '{name}' not found in {self.model_dir}")
+        return path
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(e.nbytes for e in self._entries.values())
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._entries
+
+    def lookup(self, name: str) -> Optional[CachedModel]:
+        """The loaded model or None; never touches the disk, so it is safe on the event loop."""
+        self.evict_idle()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries.move_to_end(name)
+                entry.last_used = self._clock()
+                entry.hits += 1
+        if entry is not None:
+            MODEL_CACHE_REQUESTS.labels(self._label(name), "hit").inc()
+        return entry
+
+    def get(self, name: str) -> CachedModel:
+        entry = self.lookup(name)
+        if entry is not None:
+            return entry
+        try:
+            path = self.path_for(name)
+        except ModelNotFound:
+            MODEL_CACHE_REQUESTS.labels(NOT_FOUND_LABEL, "not_found").inc()
+            raise
+        stat = path.stat()
+        with self._lock:
+            known_invalid = self._invalid.get(name) == (stat.st_size, stat.st_mtime_ns)
+        if known_invalid:
+            MODEL_CACHE_REQUESTS.labels(self._label(name), "invalid").inc()
+            raise InvalidModel(f"'{name}' in {self.model_dir} is not a servable model")
+        MODEL_CACHE_REQUESTS.labels(self._label(name), "miss").inc()
+        return self._flight.do(("load", name), lambda: self._load(name, path, stat.st_size, stat.st_mtime_ns))
+
+    def _load(self, name: str, path: Path, nbytes: int, mtime_ns: int) -> CachedModel:
+        with self._lock:
+            # пока ждали single-flight, модель мог загрузить предыдущий лидер
+            entry = self._entries.get(name)
+        if entry is not None:
+            return entry
+        started = time.perf_counter()
+        model = self._loader(path)
+        try:
+            if not callable(getattr(model, "predict_proba", None)):
+                raise ValueError(f"{type(model).__name__} has no predict_proba")
+            scorer = Scorer(model, self.feature_columns)
+        except ValueError as exc:
+            with self._lock:
+                self._invalid[name] = (nbytes, mtime_ns)
+            raise InvalidModel(f"'{name}' in {self.model_dir} is not a servable model: {exc}") from exc
+        elapsed = time.perf_counter() - started
+        entry = CachedModel(name, path, scorer, nbytes, elapsed, self._clock())
+        label = self._label(name)
+        MODEL_LOAD_SECONDS.labels(label).observe(elapsed)
+        with self._lock:
+            self._entries[name] = entry
+            evicted = self._evict_over_budget(keep=name)
+        MODEL_CACHE_BYTES.labels(label).set(entry.nbytes)
+        self._report_evicted(evicted, "memory")
+        return entry
+
+    def _evict_over_budget(self, keep: str) -> list[CachedModel]:
+        evicted = []
+        total = sum(e.nbytes for e in self._entries.values())
+        for name in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            entry = self._entries.pop(name)
+            total -= entry.nbytes
+            evicted.append(entry)
+        return evicted
+
+    def evict_idle(self) -> list[str]:
+        if self.idle_seconds <= 0:
+            return []
+        deadline = self._clock() - self.idle_seconds
+        evicted = []
+        with self._lock:
+            # порядок LRU: первыми идут самые давно использованные
+            while self._entries:
+                entry = next(iter(self._entries.values()))
+                if entry.last_used > deadline:
+                    break
+                evicted.append(self._entries.pop(entry.name))
+        self._report_evicted(evicted, "idle")
+        return [e.name for e in evicted]
+
+    def _report_evicted(self, entries: list[CachedModel], reason: str) -> None:
+        for entry in entries:
+            label = self._label(entry.name)
+            MODEL_CACHE_EVICTIONS.labels(label, reason).inc()
+            MODEL_CACHE_BYTES.labels(label).set(0)
+
+    def clear(self) -> None:
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            MODEL_CACHE_BYTES.labels(self._label(entry.name)).set(0)
+
+    def describe(self) -> list[dict]:
+        now = self._clock()
+        with self._lock:
+            entries = list(self._entries.values())
+        return [
+            {
+                "name": e.name,
+                "path": str(e.path),
+                "bytes": e.nbytes,
+                "load_seconds": round(e.load_seconds, 4),
+                "idle_seconds": round(now - e.last_used, 3),
+                "hits": e.hits,
+            }
+            for e in reversed(entries)
+        ]
+
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import re
+import threading
+from typing import Any, Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16
+# столько хэшей шинглов за раз превращается в матрицу (NUM_PERM × n) uint64 — ~32 MiB
+MAX_SHINGLES_PER_BLOCK = 1 << 16
+DIGITS_RE = re.compile(r"\d+")
+_MASK32 = np.uint64(0xFFFFFFFF)
+_SHIFT32 = np.uint64(32)
+
+_rng = np.random.default_rng(20240601)
+# multiply-shift: h(x) = ((a·x + b) mod 2^64) >> 32 с нечётным a — универсальное семейство хэшей
+_PERM_A = _rng.integers(1, 2**63, size=NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_PERM_B = _rng.integers(0, 2**63, size=NUM_PERM, dtype=np.uint64)
+_SHINGLE_POW = np.array([pow(1099511628211, i, 2**64) for i in range(SHINGLE_SIZE)], dtype=np.uint64)
+_BAND_MUL = _rng.integers(1, 2**63, size=NUM_PERM // BANDS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+
+def normalize(text_clean: str) -> str:
+    """Templates differ in numbers and links: `text_clean` already has <url>, digits collapse to 0."""
+    return DIGITS_RE.sub("0", text_clean)
+
+
+def shingles(text_clean: str, k: int = SHINGLE_SIZE) -> np.ndarray:
+    """Unique uint32 hashes of the character k-grams of the normalized text."""
+    data = np.frombuffer(normalize(text_clean).encode("utf-8"), dtype=np.uint8)
+    if data.size < k:
+        data = np.concatenate([data, np.zeros(k - data.size, dtype=np.uint8)])
+    windows = sliding_window_view(data, k).astype(np.uint64)
+    # полиномиальный хэш окна: переполнение uint64 — это и есть mod 2^64
+    hashed = (windows * _SHINGLE_POW[:k]).sum(axis=1, dtype=np.uint64)
+    return np.unique(((hashed * _PERM_A[0]) >> _SHIFT32).astype(np.uint32))
+
+
+def signatures(shingle_sets: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    (n, NUM_PERM) uint32 MinHash signatures.
+
+    All shingle hashes of a block of texts are concatenated and pushed through the
+    NUM_PERM hash functions at once; per-text minima come from one `minimum.reduceat`.
+    """
+    out = np.empty((len(shingle_sets), NUM_PERM), dtype=np.uint32)
+    start = 0
+    while start < len(shingle_sets):
+        stop, total = start, 0
+        while stop < len(shingle_sets) and (stop == start or total + len(shingle_sets[stop]) <= MAX_SHINGLES_PER_BLOCK):
+            total += len(shingle_sets[stop])
+            stop += 1
+        block = shingle_sets[start:stop]
+        values = np.concatenate(block).astype(np.uint64)
+        offsets = np.cumsum([0] + [len(s) for s in block[:-1]])
+        hashed = (_PERM_A[:, None] * values[None, :] + _PERM_B[:, None]) >> _SHIFT32
+        out[start:stop] = np.minimum.reduceat(hashed, offsets, axis=1).T.astype(np.uint32)
+        start = stop
+    return out
+
+
+def signature(text_clean: str) -> np.ndarray:
+    return signatures([shingles(text_clean)])[0]
+
+
+def band_keys(sigs: np.ndarray) -> np.ndarray:
+    """(n, BANDS) uint64 bucket keys: one hash per band of NUM_PERM // BANDS rows."""
+    rows = NUM_PERM // BANDS
+    bands = sigs.reshape(len(sigs), BANDS, rows).astype(np.uint64)
+    return (bands * _BAND_MUL).sum(axis=2, dtype=np.uint64)
+
+
+def estimated_jaccard(sig: np.ndarray, others: np.ndarray) -> np.ndarray:
+    return (others == sig).mean(axis=-1)
+
+
+class NearDupIndex:
+    """
+    Bounded MinHash/LSH index: signature -> cached value (e.g. a spam score).
+
+    Holds at most `capacity` entries in preallocated arrays; when full, the oldest entry
+    is evicted (FIFO) and removed from its LSH buckets. A lookup returns the stored value
+    of the most similar entry whose estimated Jaccard similarity is at least `threshold`.
+    `bind(owner)` clears the index when the owner (the served model) changes.
+    """
+
+    def __init__(self, capacity: int = 10_000, threshold: float = 0.8) -> None:
+        self.capacity = capacity
+        self.threshold = threshold
+        self._sigs = np.zeros((capacity, NUM_PERM), dtype=np.uint32)
+        self._keys = np.zeros((capacity, BANDS), dtype=np.uint64)
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._buckets: list[dict[int, list[int]]] = [{} for _ in range(BANDS)]
+        self._size = 0
+        self._next = 0
+        self._owner: Any = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return self._sigs.nbytes + self._keys.nbytes + self._values.nbytes
+
+    def bind(self, owner: Any) -> None:
+        if owner is not self._owner:
+            with self._lock:
+                if owner is not self._owner:
+                    self._clear()
+                    self._owner = owner
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def _clear(self) -> None:
+        self._buckets = [{} for _ in range(BANDS)]
+        self._size = 0
+        self._next = 0
+
+    def add(self, sig: np.ndarray, value: float) -> None:
+        keys = band_keys(sig[None, :])[0]
+        with self._lock:
+            slot = self._next
+            if self._size == self.capacity:
+                for band, key in enumerate(self._keys[slot].tolist()):
+                    members = self._buckets[band].get(key)
+                    if members is not None:
+                        members.remove(slot)
+                        if not members:
+                            del self._buckets[band][key]
+            else:
+                self._size += 1
+            self._sigs[slot] = sig
+            self._keys[slot] = keys
+            self._values[slot] = value
+            for band, key in enumerate(keys.tolist()):
+                self._buckets[band].setdefault(key, []).append(slot)
+            self._next = (slot + 1) % self.capacity
+
+    def query(self, sig: np.ndarray) -> Optional[tuple[float, float]]:
+        """(value, estimated similarity) of the best match at or above the threshold."""
+        keys = band_keys(sig[None, :])[0].tolist()
+        with self._lock:
+            candidates: set[int] = set()
+            for band, key in enumerate(keys):
+                members = self._buckets[band].get(key)
+                if members:
+                    candidates.update(members)
+            if not candidates:
+                return None
+            slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            sims = estimated_jaccard(sig, self._sigs[slots])
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+            return float(self._values[slots[best]]), float(sims[best])
+
+
+def near_duplicate_groups(texts_clean: Sequence[str], threshold: float = 0.8) -> np.ndarray:
+    """
+    Group id (index of the group's first member) for every text.
+
+    Texts sharing an LSH bucket are linked to the bucket's first member when their
+    estimated Jaccard similarity reaches `threshold`; groups are the connected components.
+    Work is linear in the number of texts: no pairwise comparison inside large buckets.
+    """
+    n = len(texts_clean)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    sigs = signatures([shingles(t) for t in texts_clean])
+    keys = band_keys(sigs)
+    parent = np.arange(n)
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(BANDS):
+        _, first, inverse = np.unique(keys[:, band], return_index=True, return_inverse=True)
+        heads = first[inverse]
+        linked = np.flatnonzero(heads != np.arange(n))
+        if linked.size == 0:
+            continue
+        sims = (sigs[linked] == sigs[heads[linked]]).mean(axis=1)
+        for i, head in zip(linked[sims >= threshold].tolist(), heads[linked[sims >= threshold]].tolist()):
+            a, b = find(i), find(head)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+    return np.array([find(i) for i in range(n)], dtype=np.int64)
@@ -1,3 +1,4 @@
+import argparse
 from pathlib import Path
 import pandas as pd
 import numpy as np
@@ -6,7 +7,9 @@ import regex as re2
 from bs4 import BeautifulSoup
 import tldextract
 
-RAW = Path("data/raw/sms_spam.csv")
+from src.near_dup import near_duplicate_groups
+
+RAW = Path("data/raw/ingest")
 PROCESSED_DIR = Path("data/processed")
 PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 OUT = PROCESSED_DIR / "processed.csv"
@@ -49,8 +52,35 @@ def num_domains(s: str) -> int:
             domains.add(dom)
     return len(domains)
 
+def load_raw(path: Path) -> pd.DataFrame:
+    # каталог — партиционированный Parquet из download_data.py, файл — старый csv
+    if path.is_dir():
+        return pd.read_parquet(path, columns=["text", "label"])
+    return pd.read_csv(path)
+
+def near_dup_columns(df: pd.DataFrame, mode: str, threshold: float) -> pd.DataFrame:
+    """
+    weight: keep every row, add dup_group and sample_weight = 1 / size of its
+    (near-duplicate group, label); drop: keep the first row of each such group.
+    """
+    if mode == "off":
+        return df
+    df = df.copy()
+    df["dup_group"] = near_duplicate_groups(df["text_clean"].tolist(), threshold)
+    if mode == "drop":
+        return df[~df.duplicated(subset=["dup_group", "target"])].assign(sample_weight=1.0)
+    df["sample_weight"] = 1.0 / df.groupby(["dup_group", "target"])["target"].transform("size")
+    return df
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Clean raw SMS data and compute features")
+    parser.add_argument("--near-dup-mode", choices=("weight", "drop", "off"), default="weight")
+    parser.add_argument("--near-dup-threshold", type=float, default=0.9)
+    return parser.parse_args()
+
 def main():
-    df = pd.read_csv(RAW)
+    args = parse_args()
+    df = load_raw(RAW)
     df.columns = [c.strip().lower() for c in df.columns]
     assert "text" in df.columns and "label" in df.columns, "Ожидаются колонки text и label"
 
@@ -66,17 +96,20 @@ def main():
     df["label"] = df["label"].astype(str).str.lower().str.strip()
     df = df[df["label"].isin(["ham", "spam"])].copy()
     df["target"] = (df["label"] == "spam").astype(int)
+    df = near_dup_columns(df, args.near_dup_mode, args.near_dup_threshold)
     df = df.reset_index(drop=True)
     df["sms_id"] = df.index.astype(int)
 
+    # время события растёт вместе с sms_id: строки, дописанные в сырой корпус, попадают
+    # после high-water mark материализации, а не в уже записанный интервал
     base_ts = pd.Timestamp("2020-01-01T00:00:00+00:00")
-    df["event_timestamp"] = base_ts + pd.to_timedelta(df["sms_id"] % 365, unit="D")
+    df["event_timestamp"] = base_ts + pd.to_timedelta(df["sms_id"], unit="min")
 
     keep = [
         "sms_id", "event_timestamp",
         "text", "text_clean", "label", "target",
         "char_len", "word_len", "num_digits", "num_urls", "num_domains", "upper_ratio"
-    ]
+    ] + [c for c in ("dup_group", "sample_weight") if c in df.columns]
     features = df[keep]
     features.to_csv(OUT, index=False)
     features.to_parquet(OUT_PARQUET, index=False)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Optional
+
+# верхний кадр потока, который ждёт работу или I/O: простаивающие воркеры пула,
+# event loop в select, join. Их стеки забили бы flame graph ожиданием
+IDLE_FRAMES = frozenset(
+    {
+        ("threading", "wait"),
+        ("threading", "_wait_for_tstate_lock"),
+        ("queue", "get"),
+        ("selectors", "select"),
+        ("concurrent.futures.thread", "_worker"),
+    }
+)
+
+
+@dataclass
+class ProfileResult:
+    duration_s: float
+    interval_s: float
+    samples: int
+    stacks: Counter = field(default_factory=Counter)
+    heap_diff: list[dict] = field(default_factory=list)
+    idle_stacks: int = 0
+
+    def collapsed(self) -> str:
+        """Brendan Gregg collapsed-stack format, consumable by flamegraph.pl / speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 25) -> list[dict]:
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for name in set(frames):
+                total[name] += count
+        samples = max(sum(self.stacks.values()), 1)
+        return [
+            {
+                "function": name,
+                "self_samples": own[name],
+                "total_samples": total[name],
+                "self_pct": 100.0 * own[name] / samples,
+                "total_pct": 100.0 * total[name] / samples,
+            }
+            for name, _ in own.most_common(limit)
+        ]
+
+    def to_dict(self, top: int = 25) -> dict:
+        return {
+            "duration_s": self.duration_s,
+            "interval_s": self.interval_s,
+            "samples": self.samples,
+            "idle_stacks": self.idle_stacks,
+            "top_functions": self.top_functions(top),
+            "heap_diff": self.heap_diff,
+            "collapsed": self.collapsed(),
+        }
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{code.co_name}:{code.co_firstlineno}"
+
+
+def _is_idle(frame: FrameType) -> bool:
+    return (frame.f_globals.get("__name__"), frame.f_code.co_name) in IDLE_FRAMES
+
+
+def _collapse(frame: Optional[FrameType], max_depth: int) -> str:
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a background thread snapshots every other thread's stack
+    every `interval` seconds. Nothing runs between sessions, so an idle profiler
+    costs nothing on the request path. Threads parked in a wait (IDLE_FRAMES) are
+    only counted in `idle_stacks` unless `include_idle`.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64, heap_top: int = 25, include_idle: bool = False) -> None:
+        self.interval = interval
+        self.max_depth = max_depth
+        self.heap_top = heap_top
+        self.include_idle = include_idle
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def run(self, seconds: float, interval: Optional[float] = None, trace_heap: bool = True) -> ProfileResult:
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Profiling session already in progress")
+        try:
+            return self._run(seconds, interval or self.interval, trace_heap)
+        finally:
+            self._lock.release()
+
+    def _run(self, seconds: float, interval: float, trace_heap: bool) -> ProfileResult:
+        started_tracing = False
+        snapshot_before = None
+        if trace_heap:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            snapshot_before = tracemalloc.take_snapshot()
+
+        stacks: Counter = Counter()
+        samples = 0
+        idle = 0
+        caller = threading.get_ident()
+        stop = threading.Event()
+
+        def sample() -> None:
+            nonlocal samples, idle
+            me = threading.get_ident()
+            while not stop.wait(interval):
+                for ident, frame in sys._current_frames().items():
+                    if ident in (me, caller):
+                        continue
+                    if not self.include_idle and _is_idle(frame):
+                        idle += 1
+                        continue
+                    stacks[_collapse(frame, self.max_depth)] += 1
+                samples += 1
+
+        sampler = threading.Thread(target=sample, name="sampling-profiler", daemon=True)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            time.sleep(seconds)
+        finally:
+            stop.set()
+            sampler.join()
+        duration = time.perf_counter() - start
+
+        heap_diff: list[dict] = []
+        if snapshot_before is not None:
+            snapshot_after = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+            for stat in snapshot_after.compare_to(snapshot_before, "lineno")[: self.heap_top]:
+                frame = stat.traceback[0]
+                heap_diff.append(
+                    {
+                        "location": f"{frame.filename}:{frame.lineno}",
+                        "size_diff_bytes": stat.size_diff,
+                        "count_diff": stat.count_diff,
+                        "size_bytes": stat.size,
+                    }
+                )
+
+        return ProfileResult(
+            duration_s=duration,
+            interval_s=interval,
+            samples=samples,
+            stacks=stacks,
+            heap_diff=heap_diff,
+            idle_stacks=idle,
+        )
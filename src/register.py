@@ -5,6 +5,8 @@ import json
 import shutil
 from pathlib import Path
 
+from src.cascade import cascade_path
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Register trained model if evaluation passes threshold")
@@ -66,6 +68,13 @@ def main() -> None:
 
     args.registry_path.parent.mkdir(parents=True, exist_ok=True)
     shutil.copy2(args.model_path, args.registry_path)
+    # первая ступень каскада привязана к хэшу леса и едет вместе с ним
+    cascade = cascade_path(args.model_path)
+    if cascade.exists():
+        shutil.copy2(cascade, cascade_path(args.registry_path))
+    else:
+        # инкрементальное обучение каскад не строит; старый в production уже не к этой модели
+        cascade_path(args.registry_path).unlink(missing_ok=True)
 
     print(
         f"Model registered at {args.registry_path} based on {args.metric}={metric_value:.4f} >= {args.threshold:.4f}"
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import anyio
+import anyio.to_thread
+from fastapi.concurrency import run_in_threadpool
+from prometheus_client import Counter, Gauge, Histogram
+
+
+ARRIVALS = Counter(
+    "api_scoring_arrivals_total",
+    "Scoring HTTP requests received, counted on arrival (including shed ones)",
+)
+IN_FLIGHT = Gauge(
+    "api_in_flight_requests",
+    "Scoring HTTP requests currently being handled",
+    multiprocess_mode="livesum",
+)
+QUEUE_WAIT = Histogram(
+    "api_queue_wait_seconds",
+    "Time scoring work waited for a free worker thread",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+POOL_BUSY = Gauge(
+    "api_worker_pool_busy_ratio",
+    "Share of worker threads currently busy",
+    multiprocess_mode="livemax",
+)
+SERVICE_TIME = Gauge(
+    "api_service_time_seconds",
+    "Smoothed wall time of one scoring call on a worker",
+    multiprocess_mode="livemax",
+)
+CAPACITY = Gauge(
+    "api_capacity_rps_estimate",
+    "Estimated sustainable scoring requests/sec derived from recent service times",
+    # ёмкость пода — сумма ёмкостей воркеров
+    multiprocess_mode="livesum",
+)
+
+
+def cpu_quota(cgroup_root: Path = Path("/sys/fs/cgroup")) -> Optional[float]:
+    """CPU cores allowed by the container limit (cgroup v2 or v1), None when unlimited or unknown."""
+    try:
+        quota, period = (cgroup_root / "cpu.max").read_text().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int((cgroup_root / "cpu" / "cpu.cfs_quota_us").read_text())
+        period = int((cgroup_root / "cpu" / "cpu.cfs_period_us").read_text())
+        return quota / period if quota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def cpu_parallelism(processes: Optional[int] = None) -> float:
+    """
+    How many cores of Python work one process can actually burn: at most one
+    because of the GIL, less under a CPU limit. The limit is shared by the pod's
+    `processes` (WEB_CONCURRENCY, set by gunicorn_conf.py), so each gets its share
+    and the summed CAPACITY stays within the quota. CPU_PARALLELISM overrides.
+    """
+    override = os.environ.get("CPU_PARALLELISM")
+    if override:
+        return float(override)
+    if processes is None:
+        processes = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    quota = cpu_quota()
+    return min(1.0, quota / max(processes, 1)) if quota else 1.0
+
+
+class SaturationTracker:
+    """
+    Runs scoring work on the threadpool and keeps the saturation gauges current.
+
+    Capacity is the tighter of two bounds: worker threads / wall service time
+    (I/O-ish waits) and available cores / CPU time per call (GIL + cgroup limit).
+    Gauges are set explicitly on every call instead of via set_function so the
+    values survive Prometheus multiprocess mode.
+    """
+
+    def __init__(self, smoothing: float = 0.1, parallelism: Optional[float] = None) -> None:
+        self.smoothing = smoothing
+        self.parallelism = parallelism if parallelism is not None else cpu_parallelism()
+        self.wall_time: Optional[float] = None
+        self.cpu_time: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _update_busy(limiter: anyio.CapacityLimiter) -> None:
+        POOL_BUSY.set(limiter.borrowed_tokens / max(limiter.total_tokens, 1))
+
+    def observe(self, wall: float, cpu: float, workers: float) -> None:
+        with self._lock:
+            if self.wall_time is None:
+                self.wall_time, self.cpu_time = wall, cpu
+            else:
+                self.wall_time += self.smoothing * (wall - self.wall_time)
+                self.cpu_time += self.smoothing * (cpu - self.cpu_time)
+            wall_time, cpu_time = self.wall_time, self.cpu_time
+        SERVICE_TIME.set(wall_time)
+        CAPACITY.set(min(workers / max(wall_time, 1e-6), self.parallelism / max(cpu_time, 1e-6)))
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        workers = limiter.total_tokens
+        submitted = time.perf_counter()
+
+        def work() -> Any:
+            started = time.perf_counter()
+            cpu_started = time.thread_time()
+            QUEUE_WAIT.observe(started - submitted)
+            self._update_busy(limiter)
+            try:
+                return fn(*args)
+            finally:
+                self.observe(time.perf_counter() - started, time.thread_time() - cpu_started, workers)
+
+        try:
+            return await run_in_threadpool(work)
+        finally:
+            self._update_busy(limiter)
@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+import joblib
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.api import FEATURE_COLUMNS, features_matrix
+from src.scoring import Scorer
+
+
+PROGRESS_FILE = "_progress.json"
+FORMATS = ("csv", "parquet", "jsonl")
+
+
+def detect_format(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix in (".parquet", ".pq"):
+        return "parquet"
+    if suffix in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    if suffix in (".csv", ".tsv", ".txt"):
+        return "csv"
+    raise ValueError(f"Cannot infer input format from {path}; pass --format")
+
+
+def _quote_state(line: bytes, sep: bytes, in_quotes: bool) -> bool:
+    """
+    Whether a CSV record is still inside a quoted field after `line`. A quote opens a
+    field only at its start (as in the csv module), `""` inside a field is an escape.
+    """
+    closed_at = -2
+    i = line.find(b'"')
+    while i != -1:
+        if in_quotes:
+            in_quotes, closed_at = False, i
+        elif i == 0 or line[i - 1 : i] == sep or closed_at == i - 1:
+            in_quotes = True
+        i = line.find(b'"', i + 1)
+    return in_quotes
+
+
+def _read_records(fh: BinaryIO, batch_size: int, quoted_sep: Optional[bytes]) -> list[bytes]:
+    """
+    Up to `batch_size` raw records from the current position, one line each unless a
+    quoted CSV field (`quoted_sep` is the separator) spans several lines.
+    """
+    records = []
+    while len(records) < batch_size:
+        line = fh.readline()
+        if not line:
+            break
+        if quoted_sep is not None:
+            in_quotes = _quote_state(line, quoted_sep, False)
+            while in_quotes:
+                more = fh.readline()
+                if not more:
+                    break
+                line += more
+                in_quotes = _quote_state(more, quoted_sep, True)
+        if line.strip():
+            records.append(line)
+    return records
+
+
+def iter_batches(
+    path: Path,
+    fmt: str,
+    batch_size: int,
+    text_column: str,
+    id_column: Optional[str],
+    start: Optional[dict] = None,
+) -> Iterator[tuple[list, list[str], dict]]:
+    """
+    Yield (ids, texts, position) batches of at most `batch_size` rows without loading
+    the whole input. `position` is where the next batch starts (rows before it plus a
+    byte offset for text formats, the row count alone for Parquet); passed back as
+    `start`, it seeks there instead of re-reading the batches before it.
+    """
+    columns = [text_column] + ([id_column] if id_column else [])
+    offset = start["rows"] if start else 0
+
+    def split(ids, texts) -> tuple[list, list[str]]:
+        nonlocal offset
+        if ids is None:
+            ids = list(range(offset, offset + len(texts)))
+        offset += len(texts)
+        return list(ids), ["" if t is None else str(t) for t in texts]
+
+    if fmt == "parquet":
+        parquet = pq.ParquetFile(path)
+        # первый row group, где ещё есть непрочитанные строки; уже прочитанную часть отрезаем
+        group, skip = 0, offset
+        while group < parquet.num_row_groups and skip >= parquet.metadata.row_group(group).num_rows:
+            skip -= parquet.metadata.row_group(group).num_rows
+            group += 1
+        groups = list(range(group, parquet.num_row_groups))
+        batches = parquet.iter_batches(batch_size=batch_size, columns=columns, row_groups=groups) if groups else []
+        for batch in batches:
+            if skip:
+                batch, skip = batch.slice(min(skip, batch.num_rows)), max(skip - batch.num_rows, 0)
+                if not batch.num_rows:
+                    continue
+            data = batch.to_pydict()
+            yield (*split(data[id_column] if id_column else None, data[text_column]), {"rows": offset})
+        return
+
+    import pandas as pd
+
+    if fmt == "csv":
+        # TSV-дампы (как SMSSpamCollection) не экранируют кавычки внутри текста
+        tsv = path.suffix.lower() == ".tsv"
+        sep = "\t" if tsv else ","
+        quoted_sep = None if tsv else sep.encode()
+
+        def parse(header: bytes, records: list[bytes]) -> pd.DataFrame:
+            return pd.read_csv(
+                io.BytesIO(header + b"".join(records)),
+                sep=sep,
+                quoting=csv.QUOTE_NONE if tsv else csv.QUOTE_MINIMAL,
+                usecols=columns,
+                dtype={text_column: str},
+            )
+    elif fmt == "jsonl":
+        quoted_sep = None
+
+        def parse(header: bytes, records: list[bytes]) -> pd.DataFrame:
+            return pd.read_json(io.BytesIO(b"".join(records)), lines=True, dtype=False)
+    else:
+        raise ValueError(f"Unsupported format {fmt}; expected one of {FORMATS}")
+
+    with path.open("rb") as fh:
+        header = b"".join(_read_records(fh, 1, quoted_sep)) if fmt == "csv" else b""
+        if start:
+            fh.seek(start["byte_offset"])
+        while True:
+            records = _read_records(fh, batch_size, quoted_sep)
+            if not records:
+                break
+            chunk = parse(header, records)
+            missing = [c for c in columns if c not in chunk.columns]
+            if missing:
+                raise ValueError(f"Input {path} is missing columns: {missing}")
+            texts = chunk[text_column].where(chunk[text_column].notna(), None).tolist()
+            ids, texts = split(chunk[id_column].tolist() if id_column else None, texts)
+            yield ids, texts, {"rows": offset, "byte_offset": fh.tell()}
+
+
+def extract_features(texts: list[str], pool: Optional[Executor], chunk_size: int) -> np.ndarray:
+    if pool is None or len(texts) <= chunk_size:
+        return features_matrix(texts)
+    chunks = [texts[i : i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    return np.concatenate(list(pool.map(features_matrix, chunks)))
+
+
+def input_signature(path: Path, batch_size: int, model_path: Path) -> dict:
+    stat = path.stat()
+    return {
+        "input": str(path.resolve()),
+        "input_size": stat.st_size,
+        "input_mtime_ns": stat.st_mtime_ns,
+        "batch_size": batch_size,
+        "model_path": str(model_path.resolve()),
+    }
+
+
+def read_progress(output_dir: Path) -> Optional[dict]:
+    path = output_dir / PROGRESS_FILE
+    if not path.exists():
+        return None
+    with path.open("r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def write_progress(output_dir: Path, progress: dict) -> None:
+    tmp = output_dir / f"{PROGRESS_FILE}.tmp"
+    with tmp.open("w", encoding="utf-8") as fh:
+        json.dump(progress, fh, indent=2)
+    os.replace(tmp, output_dir / PROGRESS_FILE)
+
+
+def write_part(output_dir: Path, index: int, ids: list, proba: np.ndarray, threshold: float) -> Path:
+    table = pa.table(
+        {
+            "id": ids,
+            "proba_spam": pa.array(proba, type=pa.float32()),
+            "label": pa.array(np.where(proba >= threshold, "spam", "ham")),
+        }
+    )
+    final = output_dir / f"part-{index:06d}.parquet"
+    tmp = final.with_suffix(".parquet.tmp")
+    pq.write_table(table, tmp)
+    os.replace(tmp, final)
+    return final
+
+
+def score_file(
+    input_path: Path,
+    output_dir: Path,
+    model_path: Path,
+    fmt: Optional[str] = None,
+    text_column: str = "text",
+    id_column: Optional[str] = None,
+    batch_size: int = 50_000,
+    workers: int = 0,
+    chunk_size: int = 2_000,
+    threshold: float = 0.5,
+    overwrite: bool = False,
+) -> dict:
+    fmt = fmt or detect_format(input_path)
+    if not model_path.exists():
+        raise FileNotFoundError(f"Model not found at {model_path}")
+    scorer = Scorer(joblib.load(model_path), FEATURE_COLUMNS)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    signature = input_signature(input_path, batch_size, model_path)
+    progress = read_progress(output_dir)
+    if progress is not None and (overwrite or progress["signature"] != signature):
+        if not overwrite:
+            raise ValueError(
+                f"{output_dir} holds a run for a different input/model/batch size; pass --overwrite to restart"
+            )
+        for part in output_dir.glob("part-*.parquet"):
+            part.unlink()
+        progress = None
+    if progress is None:
+        progress = {"signature": signature, "completed_batches": 0, "rows": 0, "done": False}
+        write_progress(output_dir, progress)
+
+    resumed_from = progress["completed_batches"]
+    # прогресс старого формата без позиции: батчи до resumed_from читаются и пропускаются
+    position = progress.get("position") if resumed_from else None
+    if resumed_from:
+        print(f"Resuming after batch {resumed_from} ({progress['rows']} rows already scored)")
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    start = time.perf_counter()
+    scored = 0
+    try:
+        batches = iter_batches(input_path, fmt, batch_size, text_column, id_column, start=position)
+        for index, (ids, texts, next_position) in enumerate(batches, start=resumed_from if position else 0):
+            if index < resumed_from:
+                continue
+            t0 = time.perf_counter()
+            X = extract_features(texts, pool, chunk_size)
+            proba = scorer.score_rows(X)
+            write_part(output_dir, index, ids, proba, threshold)
+
+            progress["completed_batches"] = index + 1
+            progress["rows"] += len(ids)
+            progress["position"] = next_position
+            write_progress(output_dir, progress)
+            scored += len(ids)
+            elapsed = time.perf_counter() - t0
+            print(f"batch {index}: {len(ids)} rows in {elapsed:.2f}s ({len(ids) / max(elapsed, 1e-9):.0f} rows/s)")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    wall = time.perf_counter() - start
+    progress["done"] = True
+    progress["last_run"] = {
+        "rows": scored,
+        "seconds": wall,
+        "rows_per_sec": scored / wall if wall > 0 else 0.0,
+        "workers": workers,
+    }
+    write_progress(output_dir, progress)
+    print(
+        f"Scored {scored} rows in {wall:.2f}s ({progress['last_run']['rows_per_sec']:.0f} rows/s); "
+        f"total {progress['rows']} rows in {output_dir}"
+    )
+    return progress
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bulk-score an SMS archive with the production model")
+    parser.add_argument("--input", type=Path, required=True, help="CSV/TSV, Parquet or JSONL file")
+    parser.add_argument("--output-dir", type=Path, required=True, help="Directory for Parquet part files")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="Input format (default: by extension)")
+    parser.add_argument(
+        "--model-path",
+        type=Path,
+        default=Path("model_store/production/random_forest.joblib"),
+        help="Registered model used for scoring",
+    )
+    parser.add_argument("--text-column", type=str, default="text")
+    parser.add_argument("--id-column", type=str, default=None, help="Column copied to output (default: row number)")
+    parser.add_argument("--batch-size", type=int, default=50_000, help="Rows per input batch / output part")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Feature extraction processes")
+    parser.add_argument("--chunk-size", type=int, default=2_000, help="Rows per task sent to a worker")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Spam label threshold")
+    parser.add_argument("--overwrite", action="store_true", help="Discard previous progress in --output-dir")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    score_file(
+        input_path=args.input,
+        output_dir=args.output_dir,
+        model_path=args.model_path,
+        fmt=args.format,
+        text_column=args.text_column,
+        id_column=args.id_column,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        threshold=args.threshold,
+        overwrite=args.overwrite,
+    )
+
+
+if __name__ == "__main__":
+    main()
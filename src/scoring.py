@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Mapping, Sequence
+
+import numpy as np
+
+
+class Scorer:
+    """
+    Pandas-free wrapper around a fitted classifier.
+
+    Feature order is resolved once, when the scorer is built: if the model was fitted on
+    a DataFrame, its `feature_names_in_` must be a permutation of `feature_columns`.
+    For sklearn random forests and extra trees the trees are evaluated directly on a reusable
+    float32 buffer, skipping sklearn's per-call input validation; other models (boosting included)
+    get the same buffer through their own `predict_proba` (wrapped in a DataFrame only when they carry
+    `feature_names_in_` and do not declare `accepts_ndarray`).
+    """
+
+    def __init__(self, model: Any, feature_columns: Sequence[str]) -> None:
+        self.model = model
+        self.feature_columns = list(feature_columns)
+        self.model_columns = self._resolve_model_columns(model, self.feature_columns)
+        # индексы колонок модели в порядке FEATURE_COLUMNS, для батчей
+        self._order = [self.feature_columns.index(c) for c in self.model_columns]
+        self._identity_order = self._order == list(range(len(self._order)))
+        self._trees = self._forest_trees(model)
+        self._n_classes = int(getattr(model, "n_classes_", 2)) if self._trees else 2
+        self._needs_frame = (
+            self._trees is None
+            and getattr(model, "feature_names_in_", None) is not None
+            and not getattr(model, "accepts_ndarray", False)
+        )
+        self._local = threading.local()
+
+    @staticmethod
+    def _resolve_model_columns(model: Any, feature_columns: list[str]) -> list[str]:
+        names = getattr(model, "feature_names_in_", None)
+        if names is None:
+            n_features = getattr(model, "n_features_in_", None)
+            if n_features is not None and int(n_features) != len(feature_columns):
+                raise ValueError(
+                    f"Model expects {n_features} features, service provides {len(feature_columns)}"
+                )
+            return list(feature_columns)
+        names = [str(n) for n in names]
+        if sorted(names) != sorted(feature_columns):
+            raise ValueError(f"Model features {names} do not match service features {feature_columns}")
+        return names
+
+    @staticmethod
+    def _forest_trees(model: Any) -> list | None:
+        if getattr(model, "estimators_", None) is None:
+            return None
+        # только леса усредняют деревья с равным весом; у бустинга веса и 2-D estimators_.
+        # ForestClassifier не в публичном API sklearn — перечисляем публичные леса
+        from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+        if not isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)) or getattr(model, "n_outputs_", 1) != 1:
+            return None
+        estimators = model.estimators_
+        trees = [getattr(e, "tree_", None) for e in estimators]
+        if any(t is None for t in trees):
+            return None
+        return trees
+
+    @property
+    def is_fast_path(self) -> bool:
+        return self._trees is not None
+
+    def _row_buffer(self) -> np.ndarray:
+        buf = getattr(self._local, "row", None)
+        if buf is None:
+            buf = np.empty((1, len(self.model_columns)), dtype=np.float32)
+            self._local.row = buf
+        return buf
+
+    def _predict_model_order(self, X: np.ndarray) -> np.ndarray:
+        if self._trees is not None:
+            # то же, что RandomForestClassifier.predict_proba при n_jobs=1, без проверок входа
+            proba = np.zeros((X.shape[0], self._n_classes), dtype=np.float64)
+            for tree in self._trees:
+                proba += tree.predict(X)[:, : self._n_classes]
+            proba /= len(self._trees)
+            return proba
+        if self._needs_frame:
+            import pandas as pd
+
+            return self.model.predict_proba(pd.DataFrame(X, columns=self.model_columns))
+        return self.model.predict_proba(X)
+
+    def score_one(self, features: Mapping[str, float]) -> float:
+        """Spam probability for one feature dict."""
+        buf = self._row_buffer()
+        for i, col in enumerate(self.model_columns):
+            buf[0, i] = features[col]
+        return float(self._predict_model_order(buf)[0, 1])
+
+    def score_rows(self, X: np.ndarray) -> np.ndarray:
+        """Spam probabilities for an (n, len(feature_columns)) array in service column order."""
+        X = np.asarray(X, dtype=np.float32)
+        if not self._identity_order:
+            X = X[:, self._order]
+        return self._predict_model_order(np.ascontiguousarray(X))[:, 1]
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from prometheus_client import Counter
+
+
+COALESCED = Counter(
+    "predict_coalesced_total",
+    "Scoring requests that reused an identical in-flight computation",
+    ["mode"],
+)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent calls with the same key: the first caller computes,
+    everyone who arrives while it is running gets the same result (or exception).
+    Nothing is cached after the call finishes.
+
+    `do` is for plain threads, `do_async` for coroutines on one event loop.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            COALESCED.labels("thread").inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            # отдельная задача: отключение первого клиента не должно отменять расчёт для остальных
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            COALESCED.labels("async").inc()
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # помечаем исключение прочитанным, даже если все ожидающие уже ушли
+            task.exception()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls) + len(self._tasks)
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import yaml
+
+
+DVC_FILE = Path("dvc.yaml")
+PARAMS_FILE = Path("params.yaml")
+CACHE_DIR = Path(".stage_cache")
+HASH_CHUNK = 1 << 20
+INTERPOLATION_RE = re.compile(r"\$\{\s*([\w.-]+)\s*\}")
+
+
+class StageError(RuntimeError):
+    pass
+
+
+def _entries(items: Optional[list]) -> list[str]:
+    """dvc.yaml lists mix plain paths and `{path: {cache: false}}` mappings."""
+    paths = []
+    for item in items or []:
+        paths.extend(item.keys() if isinstance(item, dict) else [item])
+    return [str(p) for p in paths]
+
+
+def _lookup(params: dict, dotted: str) -> Any:
+    value: Any = params
+    for part in dotted.split("."):
+        if not isinstance(value, dict) or part not in value:
+            raise StageError(f"Parameter '{dotted}' is not defined in params")
+        value = value[part]
+    return value
+
+
+def _assign(params: dict, dotted: str, raw: str) -> None:
+    *parents, leaf = dotted.split(".")
+    node = params
+    for part in parents:
+        node = node.setdefault(part, {})
+    value = yaml.safe_load(raw)
+    # числа и bool — как в params.yaml, всё остальное («?», «a: b») — строкой как есть
+    node[leaf] = value if isinstance(value, (int, float, bool)) else raw
+
+
+class FileHasher:
+    """
+    md5 of files and directories, memoised by (size, mtime_ns) like DVC's state db,
+    so checking a large unchanged dataset costs a stat() rather than a full read.
+    """
+
+    def __init__(self, state_path: Path) -> None:
+        self.state_path = state_path
+        self._state: dict[str, list] = {}
+        if state_path.exists():
+            try:
+                self._state = json.loads(state_path.read_text(encoding="utf-8"))
+            except ValueError:
+                self._state = {}
+        self._dirty = False
+
+    def file_md5(self, path: Path) -> str:
+        st = path.stat()
+        key = str(path.resolve())
+        cached = self._state.get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.md5()
+        with path.open("rb") as fh:
+            for chunk in iter(lambda: fh.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+        md5 = digest.hexdigest()
+        self._state[key] = [st.st_size, st.st_mtime_ns, md5]
+        self._dirty = True
+        return md5
+
+    def tree(self, path: Path) -> dict[str, str]:
+        """relative file path -> md5; a single file maps "" to its md5."""
+        if path.is_file():
+            return {"": self.file_md5(path)}
+        if path.is_dir():
+            return {
+                p.relative_to(path).as_posix(): self.file_md5(p)
+                for p in sorted(path.rglob("*"))
+                if p.is_file() and "__pycache__" not in p.parts
+            }
+        raise FileNotFoundError(path)
+
+    def save(self) -> None:
+        if self._dirty:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.state_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self._state), encoding="utf-8")
+            os.replace(tmp, self.state_path)
+            self._dirty = False
+
+
+class StageCache:
+    """
+    Run-cache for the stages declared in dvc.yaml.
+
+    A stage's fingerprint is the md5 of its (interpolated) cmd, the content hashes of
+    its deps and the values of its params. Outputs (`outs` and `metrics`) of a finished
+    run are stored content-addressed under `.stage_cache/objects`; a later run with the
+    same fingerprint restores them instead of executing the command.
+    """
+
+    def __init__(self, root: Path = Path("."), cache_dir: Optional[Path] = None) -> None:
+        self.root = root.resolve()
+        self.cache_dir = (cache_dir or self.root / CACHE_DIR).resolve()
+        with (self.root / DVC_FILE).open("r", encoding="utf-8") as fh:
+            self.stages: dict[str, dict] = (yaml.safe_load(fh) or {}).get("stages", {})
+        params_path = self.root / PARAMS_FILE
+        self.params: dict = {}
+        if params_path.exists():
+            with params_path.open("r", encoding="utf-8") as fh:
+                self.params = yaml.safe_load(fh) or {}
+        self.hasher = FileHasher(self.cache_dir / "state.json")
+
+    def override(self, assignments: list[str]) -> None:
+        for item in assignments:
+            key, sep, raw = item.partition("=")
+            if not sep:
+                raise StageError(f"Expected key=value, got '{item}'")
+            _assign(self.params, key.strip(), raw)
+
+    def stage(self, name: str) -> dict:
+        if name not in self.stages:
+            raise StageError(f"Stage '{name}' is not declared in {DVC_FILE}")
+        return self.stages[name]
+
+    def command(self, name: str) -> str:
+        return INTERPOLATION_RE.sub(lambda m: str(_lookup(self.params, m.group(1))), self.stage(name)["cmd"])
+
+    def outputs(self, name: str) -> list[str]:
+        stage = self.stage(name)
+        return _entries(stage.get("outs")) + _entries(stage.get("metrics"))
+
+    def fingerprint(self, name: str) -> str:
+        stage = self.stage(name)
+        deps = {}
+        for dep in _entries(stage.get("deps")):
+            path = self.root / dep
+            if not path.exists():
+                raise StageError(f"Stage '{name}' dependency {dep} is missing")
+            deps[dep] = self.hasher.tree(path)
+        params = {p: _lookup(self.params, p) for p in _entries(stage.get("params"))}
+        payload = json.dumps({"cmd": self.command(name), "deps": deps, "params": params}, sort_keys=True)
+        return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+    def _run_record(self, name: str, fingerprint: str) -> Path:
+        return self.cache_dir / "runs" / name / f"{fingerprint}.json"
+
+    def _object(self, md5: str) -> Path:
+        return self.cache_dir / "objects" / md5[:2] / md5[2:]
+
+    def is_cached(self, name: str) -> bool:
+        if self.stage(name).get("always_changed"):
+            return False
+        try:
+            return self._run_record(name, self.fingerprint(name)).exists()
+        except StageError:
+            return False
+
+    def _store(self, name: str, fingerprint: str) -> None:
+        outs = {}
+        for out in self.outputs(name):
+            path = self.root / out
+            if not path.exists():
+                raise StageError(f"Stage '{name}' did not produce {out}")
+            tree = self.hasher.tree(path)
+            for rel, md5 in tree.items():
+                obj = self._object(md5)
+                if not obj.exists():
+                    obj.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = obj.with_suffix(".tmp")
+                    shutil.copyfile(path / rel if rel else path, tmp)
+                    os.replace(tmp, obj)
+            outs[out] = tree
+        record = self._run_record(name, fingerprint)
+        record.parent.mkdir(parents=True, exist_ok=True)
+        record.write_text(json.dumps({"outs": outs, "created": time.time()}, indent=2), encoding="utf-8")
+
+    def _restore(self, name: str, fingerprint: str) -> list[str]:
+        """Put cached outputs in place; returns the files that actually had to be copied."""
+        record = json.loads(self._run_record(name, fingerprint).read_text(encoding="utf-8"))
+        restored = []
+        for out, tree in record["outs"].items():
+            for rel, md5 in tree.items():
+                target = self.root / out / rel if rel else self.root / out
+                if target.is_file() and self.hasher.file_md5(target) == md5:
+                    continue
+                target.parent.mkdir(parents=True, exist_ok=True)
+                tmp = target.with_name(target.name + ".tmp")
+                shutil.copyfile(self._object(md5), tmp)
+                os.replace(tmp, target)
+                restored.append(str(target.relative_to(self.root)))
+        return restored
+
+    def run(self, name: str, force: bool = False) -> str:
+        """Run one stage unless a cached run matches. Returns "cached" or "ran"."""
+        stage = self.stage(name)
+        try:
+            if not force and not stage.get("always_changed"):
+                fingerprint = self.fingerprint(name)
+                if self._run_record(name, fingerprint).exists():
+                    restored = self._restore(name, fingerprint)
+                    note = f", restored {', '.join(restored)}" if restored else ""
+                    print(f"Stage '{name}' is unchanged ({fingerprint[:8]}), skipping{note}")
+                    return "cached"
+
+            cmd = self.command(name)
+            # `python` в dvc.yaml — интерпретатор текущего процесса (PYTHON_BIN в DAG)
+            if cmd.startswith("python "):
+                cmd = f"{shlex.quote(sys.executable)} {cmd[len('python '):]}"
+            print(f"Running stage '{name}': {cmd}")
+            result = subprocess.run(cmd, shell=True, cwd=self.root)
+            if result.returncode != 0:
+                raise StageError(f"Stage '{name}' failed with exit code {result.returncode}")
+            # при --force и always_changed отпечаток ещё не считался
+            self._store(name, self.fingerprint(name))
+            return "ran"
+        finally:
+            self.hasher.save()
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run dvc.yaml stages with a content-hash run cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="Run stages in order, skipping ones with a cached matching run")
+    run.add_argument("stages", nargs="+")
+    run.add_argument("--force", action="store_true", help="Ignore the cache and re-run")
+    run.add_argument("--set", dest="overrides", action="append", default=[], metavar="KEY=VALUE",
+                     help="Override a params.yaml value, e.g. register.threshold=0.95")
+    status = sub.add_parser("status", help="Show whether each stage has a cached run for its current inputs")
+    status.add_argument("--set", dest="overrides", action="append", default=[], metavar="KEY=VALUE")
+    for p in (run, status):
+        p.add_argument("--root", type=Path, default=Path("."))
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    cache = StageCache(args.root)
+    cache.override(args.overrides)
+    if args.command == "status":
+        for name in cache.stages:
+            print(f"{name:<16} {'cached' if cache.is_cached(name) else 'changed'}")
+        cache.hasher.save()
+        return
+    for name in args.stages:
+        cache.run(name, force=args.force)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except StageError as exc:
+        sys.exit(str(exc))
@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Mapping, Optional
+
+
+EXPERIMENT_NAME = "flight_delay"
+TIMING_PATH = Path("reports/tracking.json")
+# лимиты одного log_batch в MLflow REST API
+MAX_METRICS_PER_BATCH = 1000
+MAX_PARAMS_PER_BATCH = 100
+MAX_TAGS_PER_BATCH = 100
+MAX_ENTITIES_PER_BATCH = 1000
+# метрики уходят пачкой, как только их накопилось столько
+FLUSH_EVERY = 500
+MODEL_ARTIFACT_DIR = "model"
+MODEL_ARTIFACT_TAG = "model_artifact"
+
+
+class MlflowBackend:
+    """The four MlflowClient calls a tracked run needs, with plain tuples in and out."""
+
+    def __init__(self) -> None:
+        from mlflow.tracking import MlflowClient
+
+        self.client = MlflowClient()
+
+    def create_run(self, experiment: str, run_name: Optional[str]) -> str:
+        found = self.client.get_experiment_by_name(experiment)
+        experiment_id = found.experiment_id if found else self.client.create_experiment(experiment)
+        tags = {"mlflow.runName": run_name} if run_name else None
+        return self.client.create_run(experiment_id, tags=tags).info.run_id
+
+    def log_batch(self, run_id: str, metrics: list, params: list, tags: list) -> None:
+        from mlflow.entities import Metric, Param, RunTag
+
+        self.client.log_batch(
+            run_id,
+            metrics=[Metric(key, value, ts, step) for key, value, ts, step in metrics],
+            params=[Param(key, value) for key, value in params],
+            tags=[RunTag(key, value) for key, value in tags],
+        )
+
+    def log_artifact(self, run_id: str, path: str, artifact_path: Optional[str]) -> None:
+        self.client.log_artifact(run_id, path, artifact_path)
+
+    def set_terminated(self, run_id: str, status: str) -> None:
+        self.client.set_terminated(run_id, status)
+
+
+def _split_batch(metrics: list, params: list, tags: list) -> list[tuple[list, list, list]]:
+    """Chunks that respect the per-call limits of log_batch."""
+    chunks = []
+    metrics, params, tags = list(metrics), list(params), list(tags)
+    while metrics or params or tags:
+        p, params = params[:MAX_PARAMS_PER_BATCH], params[MAX_PARAMS_PER_BATCH:]
+        t, tags = tags[:MAX_TAGS_PER_BATCH], tags[MAX_TAGS_PER_BATCH:]
+        room = min(MAX_METRICS_PER_BATCH, MAX_ENTITIES_PER_BATCH - len(p) - len(t))
+        m, metrics = metrics[:room], metrics[room:]
+        chunks.append((m, p, t))
+    return chunks
+
+
+class TrackedRun:
+    """
+    MLflow run whose network calls happen on one background thread.
+
+    Creating the run, sending metrics/params/tags (buffered and sent through
+    `log_batch`) and uploading artifacts are queued in order on a single worker, so
+    the caller only appends to a list or enqueues a file path. `close()` — called by
+    the context manager, or by an atexit hook if the process exits first — sends what
+    is left, waits for uploads and marks the run finished (FAILED on an exception).
+    Files passed to `log_artifact` must not change until the run is closed.
+
+    `log_model_file` uploads the joblib file the pipeline already wrote instead of
+    `mlflow.sklearn.log_model`, which pickles the model again and builds env files.
+    """
+
+    def __init__(
+        self,
+        experiment: str = EXPERIMENT_NAME,
+        run_name: Optional[str] = None,
+        stage: Optional[str] = None,
+        backend_factory: Callable[[], Any] = MlflowBackend,
+        timing_path: Optional[Path] = TIMING_PATH,
+        flush_every: int = FLUSH_EVERY,
+    ) -> None:
+        self.experiment = experiment
+        self.run_name = run_name
+        self.stage = stage or run_name or "run"
+        self.timing_path = timing_path
+        self.flush_every = flush_every
+        self._backend_factory = backend_factory
+        self._backend: Any = None
+        self._run_id: Optional[str] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mlflow-tracking")
+        self._futures: list[Future] = []
+        self._metrics: list = []
+        self._params: list = []
+        self._tags: list = []
+        self._closed = False
+        self._stats = {"batches": 0, "metrics": 0, "params": 0, "artifacts": 0, "artifact_bytes": 0}
+        self._caller_seconds = 0.0
+        self._background_seconds = 0.0
+        self._opened_at = time.perf_counter()
+        self._submit(self._create_run)
+        atexit.register(self._close_at_exit)
+
+    @property
+    def run_id(self) -> Optional[str]:
+        return self._run_id
+
+    # ==== фоновые операции ====
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> None:
+        def timed() -> None:
+            started = time.perf_counter()
+            try:
+                fn(*args)
+            finally:
+                self._background_seconds += time.perf_counter() - started
+
+        try:
+            self._futures.append(self._executor.submit(timed))
+        except RuntimeError:
+            # после начала завершения интерпретатора executor не принимает задачи — пишем сами
+            future: Future = Future()
+            try:
+                timed()
+                future.set_result(None)
+            except Exception as exc:  # noqa: BLE001 — ошибка вернётся из close()
+                future.set_exception(exc)
+            self._futures.append(future)
+
+    def _create_run(self) -> None:
+        backend = self._backend_factory()
+        self._run_id = backend.create_run(self.experiment, self.run_name)
+        self._backend = backend
+
+    def _send(self, metrics: list, params: list, tags: list) -> None:
+        for m, p, t in _split_batch(metrics, params, tags):
+            self._backend.log_batch(self._run_id, m, p, t)
+            self._stats["batches"] += 1
+
+    def _upload(self, path: str, artifact_path: Optional[str]) -> None:
+        self._backend.log_artifact(self._run_id, path, artifact_path)
+
+    def _terminate(self, status: str) -> None:
+        self._backend.set_terminated(self._run_id, status)
+
+    # ==== API для шагов пайплайна ====
+    def log_param(self, key: str, value: Any) -> None:
+        self.log_params({key: value})
+
+    def log_params(self, params: Mapping[str, Any]) -> None:
+        self._params.extend((str(k), str(v)) for k, v in params.items())
+        self._stats["params"] += len(params)
+
+    def set_tag(self, key: str, value: Any) -> None:
+        self._tags.append((str(key), str(value)))
+
+    def log_metric(self, key: str, value: float, step: int = 0) -> None:
+        self.log_metrics({key: value}, step)
+
+    def log_metrics(self, metrics: Mapping[str, float], step: int = 0) -> None:
+        ts = int(time.time() * 1000)
+        self._metrics.extend((str(k), float(v), ts, step) for k, v in metrics.items())
+        self._stats["metrics"] += len(metrics)
+        if len(self._metrics) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """Queue the buffered metrics, params and tags as log_batch calls."""
+        if self._metrics or self._params or self._tags:
+            batch = (self._metrics, self._params, self._tags)
+            self._metrics, self._params, self._tags = [], [], []
+            self._submit(self._send, *batch)
+
+    def log_artifact(self, path: Path, artifact_path: Optional[str] = None) -> None:
+        path = Path(path)
+        self._stats["artifacts"] += 1
+        self._stats["artifact_bytes"] += path.stat().st_size
+        self._submit(self._upload, str(path), artifact_path)
+
+    def log_model_file(self, path: Path, flavor: str = "sklearn") -> None:
+        """Upload an already serialized model file under `model/` and tag the run with it."""
+        path = Path(path)
+        self.set_tag(MODEL_ARTIFACT_TAG, f"{MODEL_ARTIFACT_DIR}/{path.name}")
+        self.set_tag("model_flavor", flavor)
+        self.log_artifact(path, MODEL_ARTIFACT_DIR)
+
+    def close(self, status: str = "FINISHED") -> dict[str, Any]:
+        """Send everything, wait for uploads, terminate the run; returns the timing summary."""
+        if self._closed:
+            return self.summary()
+        self._closed = True
+        atexit.unregister(self._close_at_exit)
+        started = time.perf_counter()
+        self.flush()
+        self._submit(self._terminate, status)
+        errors = []
+        for future in self._futures:
+            exc = future.exception()
+            if exc is not None:
+                errors.append(exc)
+        self._executor.shutdown(wait=True)
+        self._caller_seconds += time.perf_counter() - started
+        summary = self.summary()
+        self._write_summary(summary)
+        if errors:
+            raise errors[0]
+        return summary
+
+    def summary(self) -> dict[str, Any]:
+        # вызывающий поток ждёт только в close(): всё остальное — добавление в буфер/очередь
+        blocking = self._caller_seconds
+        background = self._background_seconds
+        return {
+            "run_id": self._run_id,
+            "status": "closed" if self._closed else "open",
+            **self._stats,
+            "caller_blocked_seconds": round(blocking, 4),
+            "background_seconds": round(background, 4),
+            # фоновая работа, которая шла параллельно шагу, а не в его критическом пути
+            "overlapped_seconds": round(max(background - blocking, 0.0), 4),
+            "wall_seconds": round(time.perf_counter() - self._opened_at, 4),
+        }
+
+    def _write_summary(self, summary: dict) -> None:
+        if self.timing_path is None:
+            return
+        try:
+            existing = json.loads(self.timing_path.read_text(encoding="utf-8")) if self.timing_path.exists() else {}
+        except ValueError:
+            existing = {}
+        existing[self.stage] = summary
+        self.timing_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.timing_path.with_name(self.timing_path.name + ".tmp")
+        tmp.write_text(json.dumps(existing, indent=2), encoding="utf-8")
+        os.replace(tmp, self.timing_path)
+        print(
+            f"MLflow tracking ({self.stage}): {summary['caller_blocked_seconds']:.3f}s on the critical path, "
+            f"{summary['overlapped_seconds']:.3f}s overlapped in the background"
+        )
+
+    def _close_at_exit(self) -> None:
+        # процесс завершился без close(): данные всё равно уходят, прогон помечается KILLED
+        try:
+            self.close(status="KILLED")
+        except Exception as exc:  # noqa: BLE001 — на выходе остаётся только сообщить
+            print(f"MLflow tracking flush at exit failed: {exc}")
+
+    def __enter__(self) -> "TrackedRun":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(status="FAILED" if exc_type else "FINISHED")
+
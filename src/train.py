@@ -1,22 +1,26 @@
 from __future__ import annotations
 
+import json
 from pathlib import Path
 
 import joblib
-import mlflow
-import mlflow.sklearn
 import pandas as pd
 from feast import FeatureStore
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, roc_auc_score
 from sklearn.model_selection import train_test_split
 
+from src.cascade import CHEAP_COLUMNS, build_cascade, cascade_path, save_cascade
+from src.tracking import TrackedRun
+
 
 DATA_PATH = Path("data/processed/processed.csv")
 FEATURE_REPO = Path("feature_repo")
 MODEL_DIR = Path("model_store")
 MODEL_DIR.mkdir(parents=True, exist_ok=True)
 MODEL_PATH = MODEL_DIR / "random_forest.joblib"
+CASCADE_PATH = cascade_path(MODEL_PATH)
+CASCADE_REPORT_PATH = Path("reports/cascade.json")
 
 
 FEATURE_COLUMNS = [
@@ -37,7 +41,9 @@ def load_entity_dataframe(path: Path) -> pd.DataFrame:
     missing = [col for col in required if col not in df.columns]
     if missing:
         raise ValueError(f"Missing required columns for entity dataframe: {missing}")
-    return df[required]
+    # веса почти-дубликатов из preprocess.py (--near-dup-mode weight), если они есть
+    optional = [col for col in ["sample_weight"] if col in df.columns]
+    return df[required + optional]
 
 
 def fetch_features_from_store(store: FeatureStore, entity_df: pd.DataFrame) -> pd.DataFrame:
@@ -58,21 +64,29 @@ def fetch_features_from_store(store: FeatureStore, entity_df: pd.DataFrame) -> p
     return training_df
 
 
-def train_model(df: pd.DataFrame) -> tuple[RandomForestClassifier, float, float]:
+def split_dataset(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame, pd.Series, pd.Series, pd.Series]:
     X = df[FEATURE_COLUMNS]
     y = df["target"]
+    weights = df["sample_weight"] if "sample_weight" in df.columns else pd.Series(1.0, index=df.index)
 
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
+    X_train, X_test, y_train, y_test, w_train, _ = train_test_split(
+        X, y, weights, test_size=0.2, random_state=42, stratify=y
     )
+    return X_train, X_test, y_train, y_test, w_train
+
 
+def train_model(df: pd.DataFrame) -> tuple[RandomForestClassifier, float, float]:
+    X_train, X_test, y_train, y_test, w_train = split_dataset(df)
+
+    # OOB-оценки нужны для калибровки каскада; деревья от этого не меняются
     model = RandomForestClassifier(
         n_estimators=200,
         random_state=42,
         n_jobs=1,
+        oob_score=True,
     )
 
-    model.fit(X_train, y_train)
+    model.fit(X_train, y_train, sample_weight=w_train.to_numpy())
 
     y_pred = model.predict(X_test)
     y_proba = model.predict_proba(X_test)[:, 1]
@@ -83,25 +97,53 @@ def train_model(df: pd.DataFrame) -> tuple[RandomForestClassifier, float, float]
     return model, accuracy, roc_auc
 
 
+def train_cascade(df: pd.DataFrame, model: RandomForestClassifier) -> tuple[dict, dict]:
+    """First stage on the same split as the forest, thresholds checked against its OOB and held-out scores."""
+    X_train, X_test, y_train, y_test, w_train = split_dataset(df)
+    return build_cascade(
+        X_train[CHEAP_COLUMNS].to_numpy(),
+        y_train.to_numpy(),
+        model.oob_decision_function_[:, 1],
+        X_test[CHEAP_COLUMNS].to_numpy(),
+        y_test.to_numpy(),
+        model.predict_proba(X_test)[:, 1],
+        sample_weight=w_train.to_numpy(),
+    )
+
+
 def main() -> None:
     entity_df = load_entity_dataframe(DATA_PATH)
     store = FeatureStore(repo_path=str(FEATURE_REPO))
     training_df = fetch_features_from_store(store, entity_df)
 
-    mlflow.set_experiment("flight_delay")
-    with mlflow.start_run():
+    # прогон создаётся в фоне, пока идёт обучение; модель уходит тем же joblib-файлом
+    with TrackedRun(stage="train") as run:
         model, accuracy, roc_auc = train_model(training_df)
 
         joblib.dump(model, MODEL_PATH)
 
-        mlflow.log_param("model", "RandomForest")
-        mlflow.log_metric("accuracy", accuracy)
-        mlflow.log_metric("roc_auc", roc_auc)
-        mlflow.sklearn.log_model(model, "model")
+        cascade, cascade_report = train_cascade(training_df, model)
+        save_cascade(cascade, CASCADE_PATH, MODEL_PATH)
+        CASCADE_REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with CASCADE_REPORT_PATH.open("w", encoding="utf-8") as fh:
+            json.dump(cascade_report, fh, indent=2)
+
+        run.log_param("model", "RandomForest")
+        run.log_metrics({"accuracy": accuracy, "roc_auc": roc_auc})
+        run.log_metrics(
+            {f"cascade.{k}": float(v) for k, v in cascade_report.items() if isinstance(v, (int, float))}
+        )
+        run.log_model_file(MODEL_PATH)
+        run.log_artifact(CASCADE_PATH, "model")
 
         print(f"Model saved to {MODEL_PATH}")
         print(f"Accuracy: {accuracy:.4f}")
         print(f"ROC AUC: {roc_auc:.4f}")
+        print(
+            f"Cascade saved to {CASCADE_PATH}: {cascade_report['short_circuit_rate']:.1%} of held-out messages "
+            f"answered by the first stage, ROC AUC {cascade_report['cascade_roc_auc']:.4f} "
+            f"({cascade_report['roc_auc_delta']:+.4f})"
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import argparse
+import os
+import resource
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import joblib
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+
+SOURCE_PATH = Path("data/processed/processed.parquet")
+MODEL_DIR = Path("model_store")
+MODEL_PATH = MODEL_DIR / "sgd_incremental.joblib"
+CHECKPOINT_PATH = MODEL_DIR / "incremental" / "checkpoint.joblib"
+FEATURE_COLUMNS = [
+    "char_len",
+    "word_len",
+    "num_digits",
+    "num_urls",
+    "num_domains",
+    "upper_ratio",
+]
+TARGET = "target"
+ID_COLUMN = "sms_id"
+# sms_id % 5 == 0 уходит в hold-out: ~20%, как test_size=0.2 в train.py, но без загрузки всего набора
+HOLDOUT_MODULO = 5
+AUC_BINS = 1000
+RANDOM_STATE = 42
+PHASES = ("scale", "fit", "evaluate", "done")
+
+
+def source_fingerprint(source: Path) -> list[tuple[str, int, int]]:
+    """Files of the Parquet source with size and mtime: a changed source invalidates the checkpoint."""
+    files = [source] if source.is_file() else sorted(source.rglob("*.parquet"))
+    if not files:
+        raise FileNotFoundError(f"No Parquet files found at {source}")
+    return [(str(p.relative_to(source) if p != source else p.name), p.stat().st_size, p.stat().st_mtime_ns) for p in files]
+
+
+def iter_batches(source: Path, batch_rows: int) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    (X, y, is_holdout) per record batch, in a deterministic order.
+
+    Only one batch (plus one of read-ahead) is decoded at a time, so memory follows
+    `batch_rows`, not the size of the source. Hive-style partition directories
+    (e.g. `day=2024-01-01/part-0.parquet`) are read as one dataset.
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(str(source), format="parquet", partitioning="hive")
+    columns = FEATURE_COLUMNS + [TARGET, ID_COLUMN]
+    missing = [c for c in columns if c not in dataset.schema.names]
+    if missing:
+        raise ValueError(f"Missing expected columns in dataset: {missing}")
+    for batch in dataset.to_batches(columns=columns, batch_size=batch_rows, batch_readahead=1, fragment_readahead=1):
+        if batch.num_rows == 0:
+            continue
+        X = np.column_stack([batch.column(c).to_numpy(zero_copy_only=False) for c in FEATURE_COLUMNS]).astype(np.float64)
+        y = batch.column(TARGET).to_numpy(zero_copy_only=False).astype(np.int64)
+        holdout = batch.column(ID_COLUMN).to_numpy(zero_copy_only=False) % HOLDOUT_MODULO == 0
+        yield X, y, holdout
+
+
+class StreamingAUC:
+    """ROC-AUC from per-class score histograms: O(bins) memory however many rows are scored."""
+
+    def __init__(self, bins: int = AUC_BINS) -> None:
+        self.pos = np.zeros(bins, dtype=np.int64)
+        self.neg = np.zeros(bins, dtype=np.int64)
+        self.correct = 0
+
+    def update(self, proba: np.ndarray, y: np.ndarray) -> None:
+        idx = np.minimum((proba * len(self.pos)).astype(np.int64), len(self.pos) - 1)
+        self.pos += np.bincount(idx[y == 1], minlength=len(self.pos))
+        self.neg += np.bincount(idx[y == 0], minlength=len(self.neg))
+        self.correct += int(np.sum((proba >= 0.5) == (y == 1)))
+
+    @property
+    def rows(self) -> int:
+        return int(self.pos.sum() + self.neg.sum())
+
+    def roc_auc(self) -> float:
+        n_pos, n_neg = self.pos.sum(), self.neg.sum()
+        if n_pos == 0 or n_neg == 0:
+            return float("nan")
+        # позитив выше негатива из бинов ниже + половина совпадений внутри бина
+        neg_below = np.cumsum(self.neg) - self.neg
+        return float((np.sum(self.pos * neg_below) + 0.5 * np.sum(self.pos * self.neg)) / (n_pos * n_neg))
+
+    def accuracy(self) -> float:
+        return self.correct / self.rows if self.rows else float("nan")
+
+
+def new_state(fingerprint: list, config: dict) -> dict[str, Any]:
+    return {
+        "phase": "scale",
+        "epoch": 0,
+        "batch": 0,
+        "rows_seen": 0,
+        "fingerprint": fingerprint,
+        "config": config,
+        "scaler": StandardScaler(),
+        "classifier": SGDClassifier(loss="log_loss", alpha=1e-4, random_state=RANDOM_STATE),
+        "metrics": StreamingAUC(),
+    }
+
+
+def save_checkpoint(state: dict, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    joblib.dump(state, tmp)
+    # атомарная замена: прерывание посреди записи оставляет прошлый чекпоинт целым
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: Path, fingerprint: list, config: dict) -> Optional[dict]:
+    if not path.exists():
+        return None
+    state = joblib.load(path)
+    if state.get("fingerprint") != fingerprint or state.get("config") != config:
+        print(f"Checkpoint {path} is for another source or config, starting over")
+        return None
+    return state
+
+
+def serving_model(state: dict) -> Pipeline:
+    """Scaler + SGD as one estimator with predict_proba on raw FEATURE_COLUMNS order."""
+    return Pipeline([("scaler", state["scaler"]), ("classifier", state["classifier"])])
+
+
+def train_incremental(
+    source: Path = SOURCE_PATH,
+    checkpoint_path: Path = CHECKPOINT_PATH,
+    batch_rows: int = 50_000,
+    epochs: int = 3,
+    checkpoint_every: int = 1,
+    restart: bool = False,
+) -> dict[str, Any]:
+    """
+    Three streamed passes over the Parquet source, resumable at batch granularity:
+    scaler statistics, `epochs` rounds of SGD `partial_fit` on the training rows,
+    then hold-out evaluation. Returns the final state with the fitted components.
+    """
+    fingerprint = source_fingerprint(source)
+    config = {"batch_rows": batch_rows, "epochs": epochs}
+    state = None if restart else load_checkpoint(checkpoint_path, fingerprint, config)
+    if state is None:
+        state = new_state(fingerprint, config)
+    elif state["phase"] != "done":
+        print(f"Resuming {state['phase']} phase at epoch {state['epoch']}, batch {state['batch']}")
+
+    classes = np.array([0, 1])
+    while state["phase"] != "done":
+        phase = state["phase"]
+        for index, (X, y, holdout) in enumerate(iter_batches(source, batch_rows)):
+            if index < state["batch"]:
+                continue
+            if phase == "scale":
+                if (~holdout).any():
+                    state["scaler"].partial_fit(X[~holdout])
+            elif phase == "fit":
+                train = ~holdout
+                if train.any():
+                    # перемешивание внутри батча с сидом от (эпоха, батч): после резюма тот же порядок
+                    order = np.random.default_rng((RANDOM_STATE, state["epoch"], index)).permutation(int(train.sum()))
+                    Xs = state["scaler"].transform(X[train])[order]
+                    state["classifier"].partial_fit(Xs, y[train][order], classes=classes)
+                    state["rows_seen"] += int(train.sum())
+            else:
+                if holdout.any():
+                    proba = serving_model(state).predict_proba(X[holdout])[:, 1]
+                    state["metrics"].update(proba, y[holdout])
+            state["batch"] = index + 1
+            if state["batch"] % checkpoint_every == 0:
+                save_checkpoint(state, checkpoint_path)
+
+        state["batch"] = 0
+        if phase == "fit" and state["epoch"] + 1 < epochs:
+            state["epoch"] += 1
+        else:
+            state["phase"] = PHASES[PHASES.index(phase) + 1]
+        save_checkpoint(state, checkpoint_path)
+    return state
+
+
+def peak_rss_mib() -> float:
+    # ru_maxrss в KiB на Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def log_to_mlflow(state: dict, model_path: Path) -> None:
+    from src.tracking import TrackedRun
+
+    with TrackedRun(stage="train") as run:
+        run.log_param("model", "SGDClassifier(log_loss)")
+        run.log_param("train_mode", "incremental")
+        run.log_params(state["config"])
+        run.log_metrics(
+            {
+                "accuracy": state["metrics"].accuracy(),
+                "roc_auc": state["metrics"].roc_auc(),
+                "rows_seen": state["rows_seen"],
+                "peak_rss_mib": peak_rss_mib(),
+            }
+        )
+        run.log_model_file(model_path)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Out-of-core SGD training over a (partitioned) Parquet source")
+    parser.add_argument("--source", type=Path, default=SOURCE_PATH, help="Parquet file or hive-partitioned directory")
+    parser.add_argument("--model-path", type=Path, default=MODEL_PATH)
+    parser.add_argument("--checkpoint", type=Path, default=CHECKPOINT_PATH)
+    parser.add_argument("--batch-rows", type=int, default=50_000)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--checkpoint-every", type=int, default=1, help="Save state every N batches")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--no-mlflow", action="store_true", help="Skip MLflow logging")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    state = train_incremental(
+        source=args.source,
+        checkpoint_path=args.checkpoint,
+        batch_rows=args.batch_rows,
+        epochs=args.epochs,
+        checkpoint_every=args.checkpoint_every,
+        restart=args.restart,
+    )
+    args.model_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = args.model_path.with_suffix(args.model_path.suffix + ".tmp")
+    joblib.dump(serving_model(state), tmp)
+    os.replace(tmp, args.model_path)
+
+    if not args.no_mlflow:
+        log_to_mlflow(state, args.model_path)
+
+    metrics = state["metrics"]
+    print(f"Model saved to {args.model_path}")
+    print(f"Rows trained: {state['rows_seen']}, hold-out rows: {metrics.rows}")
+    print(f"Accuracy: {metrics.accuracy():.4f}")
+    print(f"ROC AUC: {metrics.roc_auc():.4f}")
+    print(f"Peak RSS: {peak_rss_mib():.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
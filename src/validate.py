@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+import sys
+from pathlib import Path
+from typing import Any, Iterator
+
+import numpy as np
+import yaml
+
+
+DATA_PATH = Path("data/processed/processed.parquet")
+CONTRACT_PATH = Path("feature_repo/contract.yaml")
+FEATURE_REPO_PATH = Path("feature_repo/feature_repo.py")
+REPORT_PATH = Path("reports/validation.json")
+BATCH_ROWS = 131_072
+FEAST_TYPES = ("Int32", "Int64", "Float32", "Float64")
+FLOAT32_MAX = float(np.finfo(np.float32).max)
+
+
+def schema_from_feature_repo(path: Path, view_name: str) -> dict[str, str]:
+    """
+    `Field(name=..., dtype=...)` pairs of a FeatureView, read from the source with `ast`
+    so validation does not need feast installed or the feature repo importable.
+    """
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and getattr(node.func, "id", None) == "FeatureView"):
+            continue
+        kwargs = {kw.arg: kw.value for kw in node.keywords}
+        name = kwargs.get("name")
+        if not (isinstance(name, ast.Constant) and name.value == view_name):
+            continue
+        schema = {}
+        for field in getattr(kwargs.get("schema"), "elts", []):
+            args = {kw.arg: kw.value for kw in field.keywords}
+            if isinstance(args.get("name"), ast.Constant) and isinstance(args.get("dtype"), ast.Name):
+                schema[args["name"].value] = args["dtype"].id
+        return schema
+    raise ValueError(f"FeatureView '{view_name}' not found in {path}")
+
+
+def load_contract(contract_path: Path = CONTRACT_PATH, feature_repo_path: Path = FEATURE_REPO_PATH) -> dict[str, Any]:
+    """contract.yaml with column types filled in from the FeatureView schema."""
+    with contract_path.open("r", encoding="utf-8") as fh:
+        contract = yaml.safe_load(fh)
+    columns = {name: dict(rules or {}) for name, rules in (contract.get("columns") or {}).items()}
+    for name, dtype in schema_from_feature_repo(feature_repo_path, contract["feature_view"]).items():
+        columns.setdefault(name, {}).setdefault("type", dtype)
+    for name, rules in columns.items():
+        if rules.get("type") not in (None, *FEAST_TYPES):
+            raise ValueError(f"Unsupported type {rules['type']} for column {name}")
+    contract["columns"] = columns
+    return contract
+
+
+def required_columns(contract: dict) -> list[str]:
+    names = [contract["entity"], contract["timestamp"], *contract["columns"]]
+    return list(dict.fromkeys(names))
+
+
+class ContractValidator:
+    """
+    Streaming evaluation of a contract: every rule is a vectorised mask over a record
+    batch, and only counts, min/max and a few example entity ids are kept between
+    batches, so memory does not depend on the size of the input.
+    """
+
+    def __init__(self, contract: dict) -> None:
+        self.contract = contract
+        self.rows = 0
+        self.positives = 0
+        self.counts: dict[tuple[str, str], int] = {}
+        self.examples: dict[tuple[str, str], list] = {}
+        self.stats = {name: {"min": None, "max": None, "nulls": 0} for name in contract["columns"]}
+        self._limit = int(contract.get("examples_per_rule", 5))
+
+    def _record(self, column: str, rule: str, mask: np.ndarray, ids: np.ndarray) -> None:
+        count = int(mask.sum())
+        if not count:
+            return
+        key = (column, rule)
+        self.counts[key] = self.counts.get(key, 0) + count
+        examples = self.examples.setdefault(key, [])
+        if len(examples) < self._limit:
+            examples.extend(ids[mask][: self._limit - len(examples)].tolist())
+
+    def update(self, batch) -> None:
+        n = batch.num_rows
+        ids = np.asarray(batch.column(self.contract["entity"]).to_numpy(zero_copy_only=False))
+        values = {}
+        for name in self.contract["columns"]:
+            # null и NaN считаются одинаково пропуском
+            col = batch.column(name).cast("float64").fill_null(np.nan).to_numpy(zero_copy_only=False)
+            values[name] = col
+            missing = np.isnan(col)
+            self.stats[name]["nulls"] += int(missing.sum())
+            self._record(name, "null", missing, ids)
+        self._record(
+            self.contract["timestamp"],
+            "null",
+            np.asarray(batch.column(self.contract["timestamp"]).is_null().to_numpy(zero_copy_only=False), dtype=bool),
+            ids,
+        )
+
+        for name, rules in self.contract["columns"].items():
+            col = values[name]
+            finite = np.isfinite(col)
+            if finite.any():
+                lo, hi = float(col[finite].min()), float(col[finite].max())
+                stats = self.stats[name]
+                stats["min"] = lo if stats["min"] is None else min(stats["min"], lo)
+                stats["max"] = hi if stats["max"] is None else max(stats["max"], hi)
+            dtype = rules.get("type")
+            if dtype in ("Int32", "Int64"):
+                self._record(name, "not_integer", finite & (col != np.floor(col)), ids)
+            if dtype is not None:
+                self._record(name, "not_finite", np.isinf(col), ids)
+            if dtype == "Float32":
+                self._record(name, "float32_overflow", finite & (np.abs(col) > FLOAT32_MAX), ids)
+            if "min" in rules:
+                self._record(name, f"min={rules['min']}", col < rules["min"], ids)
+            if "max" in rules:
+                self._record(name, f"max={rules['max']}", col > rules["max"], ids)
+            if "le" in rules:
+                self._record(name, f"<= {rules['le']}", col > values[rules["le"]], ids)
+            if "allowed" in rules:
+                self._record(name, f"in {rules['allowed']}", ~np.isin(col, rules["allowed"]) & ~np.isnan(col), ids)
+
+        target = values.get("target")
+        if target is not None:
+            self.positives += int(np.nansum(target == 1))
+        self.rows += n
+
+    def report(self) -> dict[str, Any]:
+        max_fraction = float(self.contract.get("max_violation_fraction", 0.0))
+        violations = []
+        for (column, rule), count in sorted(self.counts.items(), key=lambda kv: (-kv[1], kv[0])):
+            fraction = count / self.rows if self.rows else 1.0
+            violations.append(
+                {
+                    "column": column,
+                    "rule": rule,
+                    "count": count,
+                    "fraction": round(fraction, 6),
+                    "failed": fraction > max_fraction,
+                    "examples": self.examples.get((column, rule), []),
+                }
+            )
+
+        dataset_rules = self.contract.get("dataset") or {}
+        checks = {}
+        min_rows = dataset_rules.get("min_rows")
+        if min_rows is not None:
+            checks["min_rows"] = {"value": self.rows, "expected": f">= {min_rows}", "failed": self.rows < min_rows}
+        rate_rule = dataset_rules.get("target_rate")
+        if rate_rule is not None:
+            rate = self.positives / self.rows if self.rows else 0.0
+            failed = rate < rate_rule.get("min", 0.0) or rate > rate_rule.get("max", 1.0)
+            checks["target_rate"] = {
+                "value": round(rate, 6),
+                "expected": f"[{rate_rule.get('min', 0.0)}, {rate_rule.get('max', 1.0)}]",
+                "failed": failed,
+            }
+
+        passed = not any(v["failed"] for v in violations) and not any(c["failed"] for c in checks.values())
+        return {
+            "passed": passed,
+            "rows": self.rows,
+            "violations": violations,
+            "dataset": checks,
+            "columns": self.stats,
+        }
+
+
+def iter_record_batches(path: Path, columns: list[str], batch_rows: int = BATCH_ROWS) -> Iterator:
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(str(path), format="parquet", partitioning="hive")
+    missing = [c for c in columns if c not in dataset.schema.names]
+    if missing:
+        raise ValueError(f"Dataset {path} is missing contract columns: {missing}")
+    yield from dataset.to_batches(columns=columns, batch_size=batch_rows, batch_readahead=1, fragment_readahead=1)
+
+
+def validate(path: Path, contract: dict, batch_rows: int = BATCH_ROWS) -> dict[str, Any]:
+    validator = ContractValidator(contract)
+    for batch in iter_record_batches(path, required_columns(contract), batch_rows):
+        if batch.num_rows:
+            validator.update(batch)
+    return validator.report()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Validate processed features against the data contract")
+    parser.add_argument("--data-path", type=Path, default=DATA_PATH, help="Parquet file or partitioned directory")
+    parser.add_argument("--contract", type=Path, default=CONTRACT_PATH)
+    parser.add_argument("--feature-repo", type=Path, default=FEATURE_REPO_PATH)
+    parser.add_argument("--report-path", type=Path, default=REPORT_PATH)
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    contract = load_contract(args.contract, args.feature_repo)
+    try:
+        report = validate(args.data_path, contract, args.batch_rows)
+    except ValueError as exc:
+        report = {"passed": False, "rows": 0, "error": str(exc), "violations": [], "dataset": {}, "columns": {}}
+
+    args.report_path.parent.mkdir(parents=True, exist_ok=True)
+    with args.report_path.open("w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+
+    print(f"Validated {report['rows']} rows against {args.contract}: {'passed' if report['passed'] else 'FAILED'}")
+    if "error" in report:
+        print(f"  {report['error']}")
+    for v in report["violations"]:
+        marker = "x" if v["failed"] else "~"
+        print(f"  [{marker}] {v['column']} {v['rule']}: {v['count']} rows ({v['fraction']:.2%}), e.g. sms_id {v['examples']}")
+    for name, check in report["dataset"].items():
+        if check["failed"]:
+            print(f"  [x] dataset {name}: {check['value']} not {check['expected']}")
+    print(f"Report saved to {args.report_path}")
+    if not report["passed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
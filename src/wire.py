@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import msgpack
+import orjson
+
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+_MSGPACK_ALIASES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+class WireError(Exception):
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _media_type(header: Optional[str]) -> str:
+    return (header or "").split(";", 1)[0].strip().lower()
+
+
+def is_msgpack(header: Optional[str]) -> bool:
+    return _media_type(header) in _MSGPACK_ALIASES
+
+
+def decode(body: bytes, content_type: Optional[str]) -> Any:
+    media_type = _media_type(content_type)
+    try:
+        if media_type in _MSGPACK_ALIASES:
+            return msgpack.unpackb(body, raw=False)
+        if media_type in ("", JSON) or media_type.endswith("+json"):
+            return orjson.loads(body)
+    except (orjson.JSONDecodeError, ValueError, msgpack.UnpackException) as exc:
+        raise WireError(400, f"Malformed request body: {exc}") from exc
+    raise WireError(415, f"Unsupported Content-Type {media_type!r}; use {JSON} or {MSGPACK}")
+
+
+def negotiate(accept: Optional[str], content_type: Optional[str]) -> str:
+    """Response media type: an explicit Accept wins, wildcards answer in the request's format."""
+    if accept:
+        for part in accept.split(","):
+            media_type = _media_type(part)
+            if media_type in _MSGPACK_ALIASES:
+                return MSGPACK
+            if media_type == JSON or media_type.endswith("+json"):
+                return JSON
+    return MSGPACK if is_msgpack(content_type) else JSON
+
+
+def encode(payload: Any, media_type: str) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True)
+    return orjson.dumps(payload)
@@ -8,10 +8,12 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from src.api import app
+from src.api import app, wait_ready
 
 
 @pytest.fixture()
 def client() -> TestClient:
     with TestClient(app) as test_client:
+        # прогрев идёт в фоне; тесты подменяют модель и не должны с ним пересекаться
+        assert wait_ready(30)
         yield test_client
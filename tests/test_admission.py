@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from src import api
+from src.admission import AdaptiveLimiter
+
+
+class DummyModel:
+    def predict_proba(self, X):
+        return np.tile([0.2, 0.8], (len(X), 1))
+
+
+@pytest.fixture()
+def limiter(monkeypatch):
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=4, target_latency=0.1)
+    monkeypatch.setattr(api, "_limiter", limiter)
+    monkeypatch.setattr(api, "_batch_limiter", limiter)
+    monkeypatch.setattr(api, "_model", DummyModel())
+    return limiter
+
+
+def test_limit_grows_on_fast_and_shrinks_on_slow_completions():
+    limiter = AdaptiveLimiter(initial_limit=4, max_limit=8, target_latency=0.1)
+    for _ in range(20):
+        assert limiter.try_acquire() is None
+        assert limiter.try_acquire() is None
+        limiter.release(0.01)
+        limiter.release(0.01)
+    grown = limiter.limit
+    assert grown > 4
+
+    limiter.try_acquire()
+    limiter.release(1.0)
+    assert limiter.limit == pytest.approx(grown * limiter.backoff)
+
+
+def test_rejects_when_limit_reached_or_deadline_unreachable():
+    limiter = AdaptiveLimiter(initial_limit=1, target_latency=0.1)
+    assert limiter.try_acquire() is None
+    assert limiter.try_acquire() == "concurrency"
+    limiter.release(0.5)
+    assert limiter.try_acquire(deadline=0.2) == "deadline"
+    assert limiter.try_acquire(deadline=2.0) is None
+
+
+def test_deadline_rejections_recover_after_latency_spike():
+    limiter = AdaptiveLimiter(initial_limit=4, target_latency=1.0, pool="batch")
+    assert limiter.try_acquire() is None
+    limiter.release(1.5)
+    assert limiter.try_acquire(deadline=1.0) == "deadline"
+
+    # пул простаивал дольше сглаженного времени обслуживания — пускаем один пробный запрос
+    limiter._last_completion -= 2.0
+    assert limiter.try_acquire(deadline=1.0) is None
+    assert limiter.try_acquire(deadline=1.0) == "deadline"
+    limiter.release(0.05)
+    while limiter.ewma_latency > 1.0:
+        limiter._last_completion -= 2.0
+        assert limiter.try_acquire(deadline=1.0) is None
+        limiter.release(0.05)
+    assert limiter.try_acquire(deadline=1.0) is None
+    assert limiter.try_acquire(deadline=1.0) is None
+
+
+def test_predict_sheds_with_retry_after(client, limiter):
+    limiter.in_flight = 2
+    resp = client.post("/predict", json={"text": "hello"})
+    assert resp.status_code == 503
+    assert int(resp.headers["retry-after"]) >= 1
+
+    limiter.in_flight = 0
+    resp = client.post("/predict/batch", json={"texts": ["a", "b"]})
+    assert resp.status_code == 200
+    assert limiter.in_flight == 0
+
+
+def test_degraded_mode_serves_heuristic_score(client, limiter, monkeypatch):
+    monkeypatch.setattr(api, "ADMISSION_DEGRADED_MODE", True)
+    limiter.in_flight = 2
+    resp = client.post("/predict", json={"text": "WIN £1000 cash! Call 09061701461 www.prize.com"})
+    assert resp.status_code == 200
+    assert resp.headers["x-degraded"] == "heuristic"
+    assert resp.json()["label"] == "spam"
+
+    resp = client.post("/predict/batch", json={"texts": ["see you at lunch"]})
+    assert resp.json()["predictions"][0]["label"] == "ham"
+
+
+def test_slow_batches_do_not_shed_single_texts(client, monkeypatch):
+    single = AdaptiveLimiter(initial_limit=2, target_latency=0.1)
+    batch = AdaptiveLimiter(initial_limit=2, target_latency=0.1, pool="batch")
+    monkeypatch.setattr(api, "_limiter", single)
+    monkeypatch.setattr(api, "_batch_limiter", batch)
+    monkeypatch.setattr(api, "_model", DummyModel())
+    for _ in range(5):
+        assert batch.try_acquire() is None
+        batch.release(5.0)
+
+    resp = client.post("/predict/batch", json={"texts": ["a", "b"]})
+    assert resp.status_code == 503
+    resp = client.post("/predict", json={"text": "hello"})
+    assert resp.status_code == 200
+    assert single.ewma_latency is not None and single.ewma_latency < 1.0
+
+
+def test_admission_metrics_exported(client, limiter):
+    limiter.in_flight = 2
+    client.post("/predict", json={"text": "hello"})
+    body = client.get("/metrics").text
+    assert 'admission_rejected_total{reason="concurrency"}' in body
+    assert "admission_in_flight" in body
+    assert "admission_limit" in body
@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+import httpx
+import numpy as np
+import pytest
+
+from src import api
+from src.bench_common import compare_reports, percentiles
+from src.bench_load import parse_server_timing, replay
+
+
+def test_parse_server_timing_converts_to_seconds():
+    timings = parse_server_timing("features;dur=1.500, model;dur=20")
+    assert timings == {"features": pytest.approx(0.0015), "model": pytest.approx(0.02)}
+    assert parse_server_timing(None) == {}
+
+
+def test_predict_exposes_server_timing(client, monkeypatch):
+    class DummyModel:
+        def predict_proba(self, _):
+            return np.array([[0.2, 0.8]])
+
+    monkeypatch.setattr(api, "_model", DummyModel())
+    resp = client.post("/predict", json={"text": "WIN a prize at www.example.com"})
+    timings = parse_server_timing(resp.headers.get("server-timing"))
+    assert set(timings) == {"features", "model"}
+
+
+def test_replay_reports_every_server_timing_stage():
+    def handler(request):
+        timing = "cascade;dur=1" if b"ok" in request.content else "cascade;dur=1, features;dur=2, model;dur=3"
+        return httpx.Response(200, json={"label": "ham"}, headers={"Server-Timing": timing})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+            return await replay(client, ["ok", "win now", "ok", "ok"], concurrency=2, rate=0.0)
+
+    latency = asyncio.run(run())["latency_ms"]
+    assert set(latency) == {"total", "cascade", "features", "model", "framework"}
+    assert latency["cascade"]["p50"] == pytest.approx(1.0)
+    assert latency["model"]["p50"] == pytest.approx(0.0)
+    assert latency["framework"]["p50"] is not None
+
+
+def test_compare_reports_reports_relative_change():
+    base = {"results": {"latency_ms": {"total": {"p95": 10.0}}}}
+    cur = {"results": {"latency_ms": {"total": {"p95": 12.0}}}}
+    deltas = compare_reports(cur, base)
+    assert deltas["latency_ms.total.p95"]["change"] == pytest.approx(0.2)
+    assert percentiles([])["p50"] is None
+
+
+def test_micro_benchmark_writes_diffable_report(tmp_path):
+    from src import bench_micro
+
+    out = tmp_path / "micro.json"
+    argv = [
+        "--corpus-size", "20", "--batch-size", "8", "--min-time", "0", "--repeats", "1",
+        "--cold-samples", "1", "--filter", r"^upper_ratio\.", "--output", str(out),
+    ]
+    bench_micro.main(argv)
+    first = json.loads(out.read_text())
+    assert set(first["results"]) == {"upper_ratio.corpus"}
+    row = first["results"]["upper_ratio.corpus"]
+    assert {"warm_us_per_item", "cold_us_per_call", "peak_bytes", "retained_bytes_per_call"} <= set(row)
+
+    deltas = compare_reports(first, first)
+    assert bench_micro.regressions(deltas, 0.1) == []
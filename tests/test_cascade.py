@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+from sklearn.metrics import roc_auc_score
+
+from src import api
+from src.cascade import Cascade, build_cascade, choose_thresholds, save_cascade, short_circuit
+
+
+def _sample(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    y = (rng.random(n) < 0.15).astype(int)
+    forest = np.clip(y * 0.8 + rng.normal(0.1, 0.1, n), 0, 1)
+    # первая ступень уверена и права на «очевидных» сообщениях, в остальных — шум
+    obvious = rng.random(n) < 0.7
+    first = np.where(obvious, np.where(y == 1, 0.97, 0.01), rng.random(n))
+    return first, forest, y
+
+
+def test_thresholds_keep_auc_within_tolerance():
+    first, forest, y = _sample()
+    low, high = choose_thresholds([(first, forest, y)], tolerance=0.002)
+
+    assert low < 0.5 <= high
+    mask = short_circuit(first, low, high)
+    assert mask.mean() > 0.5
+    combined = np.where(mask, first, forest)
+    assert roc_auc_score(y, combined) >= roc_auc_score(y, forest) - 0.002
+
+
+def test_useless_first_stage_never_short_circuits():
+    _, forest, y = _sample()
+    low, high = choose_thresholds([(np.full(len(y), 0.4), forest, y)], tolerance=0.001)
+    assert (low, high) == (-np.inf, np.inf)
+
+
+def test_cascade_is_bound_to_its_forest_file(tmp_path):
+    rng = np.random.default_rng(2)
+    X = np.column_stack([rng.integers(0, 20, 600), rng.integers(0, 3, 600), rng.random(600)]).astype(np.float32)
+    y = ((X[:, 0] > 10) | (X[:, 1] > 1)).astype(int)
+    artifact, report = build_cascade(X[:500], y[:500], y[:500] * 0.9 + 0.05, X[500:], y[500:], y[500:] * 0.9 + 0.05)
+    assert report["short_circuit_rate"] > 0
+
+    forest_path = tmp_path / "random_forest.joblib"
+    forest_path.write_bytes(b"forest v1")
+    path = tmp_path / "random_forest.cascade.joblib"
+    save_cascade(artifact, path, forest_path)
+
+    cascade = Cascade.load(path, "model", forest_path)
+    assert cascade is not None and cascade.forest == "model"
+    proba, confident = cascade.screen({"num_digits": 15, "num_urls": 2, "upper_ratio": 0.1})
+    assert confident and proba >= cascade.high
+
+    forest_path.write_bytes(b"forest v2")
+    with pytest.warns(RuntimeWarning):
+        assert Cascade.load(path, "model", forest_path) is None
+
+
+class UrlFirstStage:
+    """Confident ham without links, undecided with them."""
+
+    def predict_proba(self, X):
+        p = np.where(X[:, 1] > 0, 0.5, 0.01)
+        return np.column_stack([1 - p, p])
+
+
+def test_api_answers_confident_messages_from_first_stage(client, monkeypatch, tmp_path):
+    calls = []
+
+    class CountingModel:
+        def predict_proba(self, X):
+            calls.append(len(X))
+            return np.tile([[0.2, 0.8]], (len(X), 1))
+
+    forest = CountingModel()
+    monkeypatch.setattr(api, "_model", forest)
+    monkeypatch.setattr(api, "_model_path", tmp_path / "model.joblib")
+    monkeypatch.setattr(api, "_cascade", Cascade(UrlFirstStage(), 0.05, 0.95, forest=forest))
+    monkeypatch.setattr(api, "SINGLE_FLIGHT", False)
+
+    ham = client.post("/predict", json={"text": "see you at lunch"})
+    assert ham.json()["proba_spam"] == pytest.approx(0.01)
+    assert ham.headers["server-timing"].startswith("cascade;") and "model;" not in ham.headers["server-timing"]
+    assert calls == []
+
+    link = client.post("/predict", json={"text": "claim at http://prize.example.com"})
+    assert link.json()["proba_spam"] == pytest.approx(0.8)
+    assert calls == [1]
+
+    batch = client.post("/predict/batch", json={"texts": ["ok", "go to www.win.biz", "thanks"]})
+    assert [item["proba_spam"] for item in batch.json()["predictions"]] == pytest.approx([0.01, 0.8, 0.01])
+    assert calls == [1, 1]
+    metrics = client.get("/metrics").text
+    assert 'cascade_messages_total{stage="first_stage"}' in metrics
+    assert "cascade_saved_seconds_total" in metrics
+
+    # другая модель по тому же пути — каскад, откалиброванный под старую, не используется
+    monkeypatch.setattr(api, "_model", CountingModel())
+    assert client.post("/predict", json={"text": "see you at lunch"}).json()["proba_spam"] == pytest.approx(0.8)
+
+
+def test_warmup_scoring_is_not_counted(monkeypatch):
+    from src.cascade import CASCADE_MESSAGES
+
+    forest = object()
+    cascade = Cascade(UrlFirstStage(), 0.05, 0.95, forest=forest)
+    monkeypatch.setattr(api, "_model", forest)
+    monkeypatch.setattr(api, "_cascade", cascade)
+    before = CASCADE_MESSAGES.labels("first_stage")._value.get()
+
+    assert api.score_texts(["ok", "thanks"], record=False) == pytest.approx([0.01, 0.01])
+    assert CASCADE_MESSAGES.labels("first_stage")._value.get() == before
+    assert cascade._full_cost is None
@@ -0,0 +1,105 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+
+from src import api
+from src.compact import auc_columns, compact_and_report, compact_forest, greedy_drop
+from src.scoring import Scorer
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _forest(n=600, n_estimators=30, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, len(api.FEATURE_COLUMNS))).astype(np.float32)
+    X[:, 0] = rng.integers(0, 200, n)
+    y = (X[:, 0] / 100 + X[:, 1] + rng.normal(0, 0.5, n) > 1).astype(int)
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=8, random_state=seed).fit(X, y)
+    return model, X, y
+
+
+def test_bin_codes_preserve_every_split():
+    model, X, _ = _forest()
+    compact = compact_forest(model, leaf_encoding="float16")
+    expected = model.predict_proba(X)[:, 1]
+    np.testing.assert_allclose(compact.predict_proba(X)[:, 1], expected, atol=1e-3)
+
+    uint8 = compact_forest(model)
+    np.testing.assert_allclose(uint8.predict_proba(X)[:, 1], expected, atol=1 / 255)
+    assert uint8.n_nodes < sum(e.tree_.node_count for e in model.estimators_)
+
+
+def test_float16_thresholds_stay_close():
+    model, X, _ = _forest()
+    compact = compact_forest(model, threshold_encoding="float16")
+    agreement = np.mean((compact.predict_proba(X)[:, 1] >= 0.5) == (model.predict(X) == 1))
+    assert agreement > 0.95
+
+
+def test_auc_columns_matches_sklearn():
+    from sklearn.metrics import roc_auc_score
+
+    rng = np.random.default_rng(1)
+    y = rng.integers(0, 2, 300)
+    scores = np.round(rng.random((300, 3)) + y[:, None] * 0.3, 1)
+    expected = [roc_auc_score(y, scores[:, i]) for i in range(3)]
+    np.testing.assert_allclose(auc_columns(y, scores), expected)
+
+
+def test_greedy_drop_respects_tolerance():
+    model, X, y = _forest()
+    per_tree = compact_forest(model).tree_outputs(X)
+    full = auc_columns(y, per_tree.mean(axis=1)[:, None])[0]
+    kept = greedy_drop(per_tree, y, tolerance=0.01, min_trees=3)
+    assert 3 <= len(kept) < per_tree.shape[1]
+    assert auc_columns(y, per_tree[:, kept].mean(axis=1)[:, None])[0] >= full - 0.01
+
+
+def test_report_and_scorer_without_pandas(tmp_path):
+    model, X, y = _forest(n=1000)
+    compact, report = compact_and_report(model, X, y, drop_trees=True, auc_tolerance=0.005, min_trees=5)
+    assert report["structure"]["trees_after"] == compact.n_trees
+    assert report["size"]["memory_bytes_after"] < report["size"]["memory_bytes_before"]
+    assert report["quality"]["label_agreement"] > 0.9
+
+    scorer = Scorer(compact, api.FEATURE_COLUMNS)
+    assert not scorer._needs_frame
+    assert scorer.score_rows(X[:3]) == pytest.approx(compact.predict_proba(X[:3])[:, 1])
+
+    path = tmp_path / "compact.joblib"
+    joblib.dump(compact, path)
+    code = (
+        "import sys, joblib\n"
+        f"m = joblib.load({str(path)!r})\n"
+        "print(','.join(x for x in ('sklearn', 'pandas') if x in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
+
+
+def test_api_serves_compact_model(tmp_path, monkeypatch):
+    model, X, y = _forest()
+    compact = compact_forest(model)
+    joblib.dump(compact, tmp_path / "compact.joblib")
+    text = "WIN a FREE prize now http://x.example.com"
+    monkeypatch.setattr(api, "MODEL_DIR", tmp_path)
+    monkeypatch.setattr(api, "MODEL_FILENAME", "compact.joblib")
+    try:
+        assert api.load_model()
+        with TestClient(api.app) as client:
+            assert api.wait_ready(30)
+            resp = client.post("/predict", json={"text": text})
+            assert resp.status_code == 200
+            data = resp.json()
+            assert data["model_path"] == str(tmp_path / "compact.joblib")
+            expected = compact.predict_proba(api.features_matrix([text]))[0, 1]
+            assert data["proba_spam"] == pytest.approx(expected, abs=1e-6)
+    finally:
+        monkeypatch.undo()
+        api.load_model()
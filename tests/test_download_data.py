@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from src import download_data as dd
+
+
+def _write_tsv(path, n):
+    lines = [f"{'spam' if i % 4 == 0 else 'ham'}\tmessage \"{i}\" with a quote" for i in range(n)]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def _manifest(out_dir, name):
+    return json.loads((out_dir / f"source={name}" / dd.MANIFEST).read_text())
+
+
+def test_streams_source_into_checksummed_chunks(tmp_path):
+    src = tmp_path / "SMSSpamCollection"
+    _write_tsv(src, 25)
+    out = tmp_path / "ingest"
+    dd.ingest(str(src), out, chunk_rows=10)
+
+    manifest = _manifest(out, "SMSSpamCollection")
+    assert manifest["complete"] and [c["rows"] for c in manifest["chunks"]] == [10, 10, 5]
+    df = pd.read_parquet(out, columns=["text", "label"])
+    assert len(df) == 25
+    assert df["text"].iloc[12] == 'message "12" with a quote'
+    assert set(df["label"]) == {"ham", "spam"}
+
+
+def test_rerun_skips_complete_source(tmp_path, monkeypatch):
+    src = tmp_path / "drop.tsv"
+    _write_tsv(src, 25)
+    out = tmp_path / "ingest"
+    dd.ingest(str(src), out, chunk_rows=10)
+
+    monkeypatch.setattr(dd, "iter_records", lambda *a: pytest.fail("complete source must not be parsed"))
+    with monkeypatch.context() as m:
+        m.setattr(dd, "sha256_file", lambda *a: pytest.fail("unchanged files must not be hashed"))
+        dd.ingest(str(src), out, chunk_rows=10)
+
+    # тронутый, но не изменённый файл хэшируется один раз, дальше снова хватает stat
+    os.utime(src, ns=(0, src.stat().st_mtime_ns + 10**9))
+    dd.ingest(str(src), out, chunk_rows=10)
+    monkeypatch.setattr(dd, "sha256_file", lambda *a: pytest.fail("unchanged files must not be hashed"))
+    dd.ingest(str(src), out, chunk_rows=10)
+
+
+def test_interrupted_run_resumes_after_last_complete_chunk(tmp_path, monkeypatch):
+    src = tmp_path / "drop.tsv"
+    _write_tsv(src, 45)
+    out = tmp_path / "ingest"
+    original = pd.DataFrame.to_parquet
+    written = []
+
+    def flaky_to_parquet(self, path, *args, **kwargs):
+        if len(written) == 2:
+            raise KeyboardInterrupt
+        written.append(path)
+        return original(self, path, *args, **kwargs)
+
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", flaky_to_parquet)
+    with pytest.raises(KeyboardInterrupt):
+        dd.ingest(str(src), out, chunk_rows=10)
+    assert not _manifest(out, "drop")["complete"]
+    assert len(_manifest(out, "drop")["chunks"]) == 2
+
+    def counting_to_parquet(self, path, *args, **kwargs):
+        written.append(path)
+        return original(self, path, *args, **kwargs)
+
+    written.clear()
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", counting_to_parquet)
+    dd.ingest(str(src), out, chunk_rows=10)
+    assert len(written) == 3
+    assert len(pd.read_parquet(out)) == 45
+
+
+def test_corrupted_or_changed_data_is_rewritten(tmp_path):
+    src = tmp_path / "drop.tsv"
+    _write_tsv(src, 25)
+    out = tmp_path / "ingest"
+    dd.ingest(str(src), out, chunk_rows=10)
+
+    (out / "source=drop" / "chunk-00001.parquet").write_bytes(b"garbage")
+    dd.ingest(str(src), out, chunk_rows=10)
+    assert len(pd.read_parquet(out)) == 25
+
+    _write_tsv(src, 12)
+    dd.ingest(str(src), out, chunk_rows=10)
+    assert _manifest(out, "drop")["source_bytes"] == src.stat().st_size
+    assert len(pd.read_parquet(out)) == 12
+
+
+def test_file_drop_directory_mixes_csv_and_tsv(tmp_path):
+    drop = tmp_path / "drop"
+    drop.mkdir()
+    _write_tsv(drop / "2024-01-01.tsv", 5)
+    pd.DataFrame({"v1": ["ham", "spam"], "v2": ["hi", "WIN"]}).to_csv(drop / "2024-01-02.csv", index=False)
+    (drop / ".partial.csv").write_text("ignored")
+    out = tmp_path / "ingest"
+    manifests = dd.ingest(str(drop), out, chunk_rows=10)
+
+    assert [m["source"] for m in manifests] == [str(drop / "2024-01-01.tsv"), str(drop / "2024-01-02.csv")]
+    df = pd.read_parquet(out)
+    assert len(df) == 7
+    assert sorted(df["source"].astype(str).unique()) == ["2024-01-01", "2024-01-02"]
+
+
+def test_staged_mirror_file_is_revalidated(tmp_path):
+    mirror = tmp_path / "mirror"
+    mirror.mkdir()
+    _write_tsv(mirror / "sms.tsv", 5)
+    requests = []
+
+    class Handler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            requests.append(self.headers.get("If-Modified-Since"))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(Handler, directory=str(mirror)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/sms.tsv"
+    staging = tmp_path / "staging"
+    try:
+        staged = dd.fetch(url, staging)
+        mtime = staged.stat().st_mtime_ns
+        assert dd.fetch(url, staging) == staged
+        assert staged.stat().st_mtime_ns == mtime
+        assert requests[0] is None and requests[1] is not None
+
+        _write_tsv(mirror / "sms.tsv", 8)
+        later = (mirror / "sms.tsv").stat().st_mtime + 60
+        os.utime(mirror / "sms.tsv", (later, later))
+        dd.fetch(url, staging)
+        assert staged.read_text() == (mirror / "sms.tsv").read_text()
+    finally:
+        server.shutdown()
+        server.server_close()
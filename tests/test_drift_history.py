@@ -0,0 +1,96 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+from prometheus_client import CollectorRegistry, generate_latest
+
+from src import drift_check
+from src.drift_history import DriftCollector, DriftHistory, main, parse_time
+
+DAY = 86400.0
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp()
+
+
+def _report(ts: float, psi: dict, drift: bool = False, roc_auc: float = 0.97) -> dict:
+    return {
+        "generated_at": datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(),
+        "features": {f: {"psi": v, "ks": v / 2, "drift": v >= 0.2} for f, v in psi.items()},
+        "metrics": {"baseline_roc_auc": 0.98, "current_roc_auc": roc_auc, "drop": 0.98 - roc_auc, "drift": False},
+        "drift_detected": drift,
+    }
+
+
+@pytest.fixture()
+def history(tmp_path):
+    with DriftHistory(tmp_path / "history.sqlite") as h:
+        for day in range(120):
+            h.append(_report(T0 + day * DAY, {"num_urls": day / 400, "char_len": 0.01}))
+        yield h
+
+
+def test_parse_time_accepts_iso_and_relative():
+    assert parse_time("2026-01-01") == T0
+    assert parse_time("2026-01-01T00:00:00Z") == T0
+    assert parse_time("90d", now=T0) == T0 - 90 * DAY
+
+
+def test_time_range_query_uses_primary_key(history):
+    rows = history.query(features=["num_urls"], since=T0 + 30 * DAY, until=T0 + 40 * DAY)
+    assert [r["ts"] for r in rows] == [T0 + d * DAY for d in range(30, 40)]
+    assert rows[0]["psi"] == pytest.approx(30 / 400)
+    assert {r["feature"] for r in rows} == {"num_urls"}
+    plan = " ".join(history.explain(features=["num_urls"], since=T0 + 30 * DAY))
+    assert "PRIMARY KEY (feature=? AND ts>?)" in plan
+    assert "INDEX feature_stats_ts" in " ".join(history.explain(since=T0))
+
+
+def test_bucketed_trend(history):
+    weeks = history.query(features=["num_urls"], since=T0, until=T0 + 28 * DAY, bucket="week")
+    assert sum(w["runs"] for w in weeks) == 28
+    means = [w["psi_mean"] for w in weeks]
+    assert means == sorted(means)
+    with pytest.raises(ValueError):
+        history.query(bucket="month")
+
+
+def test_latest_is_per_segment(history):
+    history.append(_report(T0 + 200 * DAY, {"num_urls": 0.5}, drift=True, roc_auc=0.9), segment="ru")
+    latest = {(r["feature"], r["segment"]): r for r in history.latest()}
+    assert latest[("num_urls", "all")]["ts"] == T0 + 119 * DAY
+    assert latest[("num_urls", "ru")]["psi"] == 0.5
+    assert latest[("num_urls", "ru")]["drift_detected"] == 1
+    assert ("char_len", "ru") not in latest
+
+
+def test_collector_exports_latest_values(history):
+    registry = CollectorRegistry()
+    registry.register(DriftCollector(history.path))
+    text = generate_latest(registry).decode()
+    assert 'drift_psi{feature="num_urls",segment="all"} 0.2975' in text
+    assert 'drift_feature_flagged{feature="num_urls",segment="all"} 1.0' in text
+    assert 'drift_current_roc_auc{segment="all"} 0.97' in text
+
+
+def test_drift_check_appends_to_history(tmp_path, capsys):
+    rng = np.random.default_rng(0)
+    cols = drift_check.FEATURE_COLUMNS
+    ref = pd.DataFrame(rng.normal(size=(500, len(cols))), columns=cols)
+    prod = pd.DataFrame(rng.normal(loc=1.0, size=(500, len(cols))), columns=cols)
+    ref.to_csv(tmp_path / "ref.csv", index=False)
+    prod.to_csv(tmp_path / "prod.csv", index=False)
+    for _ in range(2):
+        drift_check.run_drift_check(
+            reference_path=tmp_path / "ref.csv",
+            production_path=tmp_path / "prod.csv",
+            model_path=tmp_path / "missing.joblib",
+            baseline_report_path=tmp_path / "missing.json",
+            report_path=tmp_path / "drift_report.json",
+            history_path=tmp_path / "history.sqlite",
+        )
+    with DriftHistory(tmp_path / "history.sqlite") as h:
+        rows = h.query(features=["num_urls"])
+    assert len(rows) == 2 and all(r["drift"] for r in rows)
+
+    main(["--history-path", str(tmp_path / "history.sqlite"), "query", "--feature", "num_urls", "--format", "json"])
+    assert '"feature": "num_urls"' in capsys.readouterr().out
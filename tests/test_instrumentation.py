@@ -0,0 +1,59 @@
+import json
+
+import numpy as np
+
+from src import api, instrumentation
+from src.instrumentation import JsonlSpanExporter, StageTimer
+
+
+class DummyModel:
+    def predict_proba(self, _):
+        return np.array([[0.4, 0.6]])
+
+
+def test_predict_records_stage_histogram(client, monkeypatch):
+    monkeypatch.setattr(api, "_model", DummyModel())
+    monkeypatch.setattr(instrumentation, "_enabled", True)
+
+    client.post("/predict", json={"text": "Free <b>entry</b> at http://win.example.com"})
+    body = client.get("/metrics").text
+    for stage in ("validation", "clean_text", "num_domains", "predict_proba", "serialization"):
+        assert f'predict_stage_latency_seconds_count{{stage="{stage}"}}' in body
+
+
+def test_disabled_timer_is_noop():
+    timer = StageTimer(enabled=False)
+    with timer.stage("clean_text"):
+        pass
+    timer.record("validation", 0.1)
+    assert timer.durations == {}
+
+
+def test_span_exporter_writes_root_and_children(tmp_path, monkeypatch):
+    exporter = JsonlSpanExporter(tmp_path / "spans.jsonl", batch_size=1000)
+    monkeypatch.setattr(instrumentation, "span_exporter", exporter)
+
+    timer = StageTimer(enabled=True)
+    with timer.stage("clean_text"):
+        pass
+    timer.finish()
+    exporter.flush()
+
+    spans = [json.loads(line) for line in (tmp_path / "spans.jsonl").read_text().splitlines()]
+    root, child = spans
+    assert root["name"] == "predict" and root["parent_span_id"] is None
+    assert child["parent_span_id"] == root["span_id"]
+    assert child["trace_id"] == root["trace_id"]
+
+
+def test_stage_timing_admin_toggle(client, monkeypatch):
+    monkeypatch.setattr(instrumentation, "_enabled", True)
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "")
+    assert client.post("/admin/stage-timing", json={"enabled": False}).status_code == 404
+
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    assert client.post("/admin/stage-timing", json={"enabled": False}).status_code == 403
+
+    resp = client.post("/admin/stage-timing", json={"enabled": False}, headers={"X-Admin-Token": "secret"})
+    assert resp.json() == {"enabled": False}
+    assert instrumentation.is_enabled() is False
@@ -0,0 +1,137 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import materialize as mat
+
+FEATURES = ["char_len", "upper_ratio"]
+
+
+def _frame(ids, days, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "sms_id": ids,
+            "event_timestamp": pd.Timestamp("2024-01-01", tz="UTC") + pd.to_timedelta(days, unit="D"),
+            "char_len": rng.integers(1, 200, len(ids)),
+            "upper_ratio": rng.random(len(ids)),
+        }
+    )
+
+
+class Collector:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, frame):
+        self.batches.append(frame.copy())
+
+    @property
+    def rows(self):
+        return pd.concat(self.batches, ignore_index=True) if self.batches else pd.DataFrame()
+
+
+def _run(source, state, **kwargs):
+    writer = Collector()
+    report = mat.materialize(source, writer, FEATURES, state_path=state, **kwargs)
+    return report, writer
+
+
+def test_only_new_interval_is_written(tmp_path):
+    src, state = tmp_path / "src", tmp_path / "state.json"
+    src.mkdir()
+    _frame(np.arange(100), np.arange(100) % 10).to_parquet(src / "part-0.parquet", index=False)
+
+    report, writer = _run(src, state, batch_rows=32)
+    assert report["mode"] == "full" and report["rows_written"] == 100
+    assert report["batches"] == 4
+    assert json.loads(state.read_text())["sms_features"]["high_water"].startswith("2024-01-10")
+
+    report, writer = _run(src, state)
+    assert report["mode"] == "up_to_date" and writer.batches == []
+
+    _frame(np.arange(100, 130), 10 + np.arange(30) % 3).to_parquet(src / "part-1.parquet", index=False)
+    report, writer = _run(src, state)
+    assert report["mode"] == "incremental"
+    assert sorted(writer.rows["sms_id"]) == list(range(100, 130))
+    assert report["rows_per_sec"] > 0
+
+
+def test_newest_event_per_entity_wins_across_batches(tmp_path):
+    src, state = tmp_path / "src", tmp_path / "state.json"
+    src.mkdir()
+    # новое событие sms_id=1 идёт первым, старое — в следующей пачке
+    frame = _frame([1, 2, 3, 1], [5, 1, 1, 2])
+    frame.to_parquet(src / "part-0.parquet", index=False)
+
+    report, writer = _run(src, state, batch_rows=2)
+    rows = writer.rows.set_index("sms_id")
+    assert report["rows_read"] == 4 and report["rows_written"] == 3
+    assert rows.loc[1, "char_len"] == frame.loc[0, "char_len"]
+
+
+def test_rows_behind_the_mark_trigger_full_rewrite(tmp_path):
+    src, state = tmp_path / "src", tmp_path / "state.json"
+    src.mkdir()
+    _frame(np.arange(50), np.arange(50) % 5).to_parquet(src / "part-0.parquet", index=False)
+    _run(src, state)
+
+    # переобработанный источник: новые строки со старыми временами событий
+    _frame(np.arange(50, 60), np.zeros(10)).to_parquet(src / "part-1.parquet", index=False)
+    report, writer = _run(src, state)
+    assert report["mode"] == "full" and report["rows_written"] == 60
+
+    report, _ = _run(src, state, full=True)
+    assert report["mode"] == "full"
+
+
+def test_reprocessed_values_with_same_rows_trigger_full_rewrite(tmp_path):
+    src, state = tmp_path / "src", tmp_path / "state.json"
+    src.mkdir()
+    _frame(np.arange(40), np.arange(40) % 4).to_parquet(src / "part-0.parquet", index=False)
+    _run(src, state)
+
+    # preprocess перезапущен: те же sms_id и event_timestamp, другие значения фич
+    changed = _frame(np.arange(40), np.arange(40) % 4, seed=1)
+    changed.to_parquet(src / "part-0.parquet", index=False)
+    report, writer = _run(src, state)
+    assert report["mode"] == "full" and report["rows_written"] == 40
+    written = writer.rows.set_index("sms_id").sort_index()
+    assert written["char_len"].tolist() == changed.set_index("sms_id").sort_index()["char_len"].tolist()
+
+    report, _ = _run(src, state)
+    assert report["mode"] == "up_to_date"
+
+
+def test_single_file_rewritten_with_appended_rows_stays_incremental(tmp_path):
+    src, state = tmp_path / "src", tmp_path / "state.json"
+    src.mkdir()
+    # как preprocess: один файл переписывается целиком, старые строки в нём те же
+    full = _frame(np.arange(60), np.arange(60))
+    full.iloc[:40].to_parquet(src / "processed.parquet", index=False)
+    _run(src, state)
+
+    full.to_parquet(src / "processed.parquet", index=False)
+    report, writer = _run(src, state)
+    assert report["mode"] == "incremental"
+    assert sorted(writer.rows["sms_id"]) == list(range(40, 60))
+
+    report, _ = _run(src, state)
+    assert report["mode"] == "up_to_date"
+
+
+def test_failed_write_keeps_the_mark(tmp_path):
+    src, state = tmp_path / "src", tmp_path / "state.json"
+    src.mkdir()
+    _frame(np.arange(10), np.arange(10)).to_parquet(src / "part-0.parquet", index=False)
+
+    def broken(_):
+        raise RuntimeError("online store down")
+
+    with pytest.raises(RuntimeError):
+        mat.materialize(src, broken, FEATURES, state_path=state)
+    assert not state.exists()
+    report, writer = _run(src, state)
+    assert report["rows_written"] == 10
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess
+
+from src.metrics import OTHER, LabelGuard
+
+ROOT = Path(__file__).resolve().parents[1]
+
+WORKER = """
+from fastapi.testclient import TestClient
+from src.api import app
+with TestClient(app) as client:
+    assert client.post("/predict", json={"text": "hello"}).status_code == 200
+    client.get("/no/such/path/%d")
+"""
+
+
+def test_label_guard_caps_distinct_values():
+    guard = LabelGuard(2, allowed=("GET",))
+    assert [guard(v) for v in ("a", "b", "a", "c", "GET")] == ["a", "b", "a", OTHER, "GET"]
+
+
+def test_unknown_paths_do_not_become_labels(client):
+    for i in range(5):
+        assert client.get(f"/scanner/{i}").status_code == 404
+    client.get("/health")
+    body = client.get("/metrics").text
+    assert "/scanner/" not in body
+    assert 'endpoint="other"' in body
+    assert 'endpoint="/health"' in body
+
+
+def test_multiprocess_metrics_are_aggregated(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "MODEL_DIR": str(tmp_path / "models")}
+    for worker in range(2):
+        subprocess.run([sys.executable, "-c", WORKER % worker], cwd=ROOT, env=env, check=True)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=str(tmp_path))
+    body = generate_latest(registry).decode()
+    assert 'request_count_total{endpoint="/predict",http_status="200",method="POST"} 2.0' in body
+    assert 'request_count_total{endpoint="other",http_status="404",method="GET"} 2.0' in body
+    assert "/no/such/path" not in body
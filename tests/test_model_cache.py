@@ -0,0 +1,159 @@
+import threading
+import time
+
+import joblib
+import numpy as np
+import pytest
+
+from src import api
+from src.model_cache import InvalidModel, ModelCache, ModelNotFound
+
+
+class ConstModel:
+    """Picklable stand-in whose size is dominated by `ballast`."""
+
+    def __init__(self, proba: float, ballast_bytes: int = 0) -> None:
+        self.proba = proba
+        self.ballast = np.zeros(ballast_bytes, dtype=np.uint8)
+
+    def predict_proba(self, X):
+        return np.tile([1 - self.proba, self.proba], (len(X), 1))
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _store(tmp_path, **models):
+    # размер файла — оценка памяти модели в кэше
+    for name, model in models.items():
+        joblib.dump(model, tmp_path / f"{name}.joblib")
+    return dict(models)
+
+
+def _cache(tmp_path, models, **kwargs):
+    loads = []
+
+    def loader(path):
+        loads.append(path.stem)
+        return models[path.stem]
+
+    return ModelCache(tmp_path, api.FEATURE_COLUMNS, loader=loader, **kwargs), loads
+
+
+def test_model_size_is_its_file_size(tmp_path):
+    models = _store(tmp_path, a=ConstModel(0.5, 1 << 20))
+    cache, _ = _cache(tmp_path, models, max_bytes=1 << 30)
+    assert cache.get("a").nbytes == (tmp_path / "a.joblib").stat().st_size >= 1 << 20
+
+
+def test_other_artifacts_in_the_store_are_not_served(client, monkeypatch, tmp_path):
+    joblib.dump({"model": ConstModel(0.5), "low": 0.1, "high": 0.9}, tmp_path / "random_forest.cascade.joblib")
+    wide = ConstModel(0.5)
+    wide.n_features_in_ = 3
+    joblib.dump(wide, tmp_path / "wide.joblib")
+    loads = []
+    cache = ModelCache(tmp_path, api.FEATURE_COLUMNS, max_bytes=1 << 30, loader=lambda p: loads.append(p) or joblib.load(p))
+    monkeypatch.setattr(api, "_models", cache)
+
+    resp = client.post("/models/random_forest.cascade/predict", json={"text": "hello"})
+    assert resp.status_code == 422 and "predict_proba" in resp.json()["detail"]
+    assert client.post("/models/random_forest.cascade/predict/batch", json={"texts": ["a"]}).status_code == 422
+    assert len(loads) == 1
+    with pytest.raises(InvalidModel, match="features"):
+        cache.get("wide")
+
+
+def test_lru_evicts_least_recently_used_over_budget(tmp_path):
+    models = _store(tmp_path, a=ConstModel(0.1, 400_000), b=ConstModel(0.2, 400_000), c=ConstModel(0.3, 400_000))
+    cache, loads = _cache(tmp_path, models, max_bytes=1_000_000)
+
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")  # теперь b — самая давняя
+    cache.get("c")
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.total_bytes <= 1_000_000
+    assert [m["name"] for m in cache.describe()] == ["c", "a"]
+    assert loads == ["a", "b", "c"]
+
+
+def test_model_larger_than_budget_is_served_alone(tmp_path):
+    models = _store(tmp_path, small=ConstModel(0.1, 1000), huge=ConstModel(0.9, 50_000))
+    cache, _ = _cache(tmp_path, models, max_bytes=10_000)
+    cache.get("small")
+    assert cache.get("huge").scorer.model is models["huge"]
+    assert [m["name"] for m in cache.describe()] == ["huge"]
+
+
+def test_idle_models_are_dropped(tmp_path):
+    clock = FakeClock()
+    models = _store(tmp_path, a=ConstModel(0.1), b=ConstModel(0.2))
+    cache, loads = _cache(tmp_path, models, max_bytes=1 << 30, idle_seconds=60, clock=clock)
+    cache.get("a")
+    clock.now = 30
+    cache.get("b")
+    clock.now = 75
+    assert cache.evict_idle() == ["a"]
+    cache.get("b")
+    assert loads == ["a", "b"]
+
+
+def test_concurrent_first_requests_share_one_load(tmp_path):
+    models = _store(tmp_path, slow=ConstModel(0.4))
+    started = threading.Event()
+    loads = []
+
+    def loader(path):
+        loads.append(path.stem)
+        started.set()
+        time.sleep(0.2)
+        return models[path.stem]
+
+    cache = ModelCache(tmp_path, api.FEATURE_COLUMNS, max_bytes=1 << 30, loader=loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("slow"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert loads == ["slow"]
+    assert len({id(r) for r in results}) == 1
+
+
+@pytest.mark.parametrize("name", ["missing", "../random_forest", "a/b", ".hidden"])
+def test_unknown_or_unsafe_names_are_rejected(tmp_path, name):
+    cache, loads = _cache(tmp_path, {}, max_bytes=1 << 30)
+    with pytest.raises(ModelNotFound):
+        cache.get(name)
+    assert loads == []
+
+
+def test_named_model_routes_by_path_and_header(client, monkeypatch, tmp_path):
+    joblib.dump(ConstModel(0.8), tmp_path / "tenant-a.joblib")
+    joblib.dump(ConstModel(0.2), tmp_path / "tenant-b.joblib")
+    monkeypatch.setattr(api, "_models", ModelCache(tmp_path, api.FEATURE_COLUMNS, max_bytes=1 << 30))
+
+    resp = client.post("/models/tenant-a/predict", json={"text": "hello"})
+    assert resp.status_code == 200
+    assert resp.json()["proba_spam"] == pytest.approx(0.8)
+    assert resp.json()["model_path"] == str(tmp_path / "tenant-a.joblib")
+
+    resp = client.post("/predict", json={"text": "hello"}, headers={"X-Model": "tenant-b"})
+    assert resp.json()["label"] == "ham" and resp.json()["proba_spam"] == pytest.approx(0.2)
+
+    resp = client.post("/models/tenant-b/predict/batch", json={"texts": ["a", "b"]})
+    assert [p["proba_spam"] for p in resp.json()["predictions"]] == pytest.approx([0.2, 0.2])
+
+    assert client.post("/models/nope/predict", json={"text": "x"}).status_code == 404
+    listed = client.get("/models").json()
+    assert [m["name"] for m in listed["models"]] == ["tenant-b", "tenant-a"]
+
+    metrics = client.get("/metrics").text
+    assert 'model_cache_requests_total{model="tenant-b",result="hit"}' in metrics
+    assert 'model_load_seconds_count{model="tenant-a"}' in metrics
+    assert 'model_cache_bytes{model="tenant-a"}' in metrics
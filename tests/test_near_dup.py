@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import api
+from src import near_dup as nd
+from src.preprocess import near_dup_columns
+
+PROMO = "Congratulations! You won a {} prize. Call {} now or visit {}"
+
+
+def _promo(i):
+    return PROMO.format(f"${i * 100}", f"0906170{i:04d}", f"http://win{i}.example.com/claim")
+
+
+def test_templates_differing_in_numbers_and_links_collide():
+    a, b = (nd.signature(api.clean_text(_promo(i))) for i in (1, 7))
+    other = nd.signature(api.clean_text("Are we still meeting for lunch tomorrow?"))
+    assert nd.estimated_jaccard(a, b[None])[0] == 1.0
+    assert nd.estimated_jaccard(a, other[None])[0] < 0.3
+
+
+def test_batched_signatures_match_single_text():
+    texts = [api.clean_text(t) for t in ("hi", "see you at 5", _promo(3), "ok " * 200)]
+    batch = nd.signatures([nd.shingles(t) for t in texts])
+    assert all((batch[i] == nd.signature(t)).all() for i, t in enumerate(texts))
+
+
+def test_index_is_bounded_and_evicts_oldest():
+    index = nd.NearDupIndex(capacity=3, threshold=0.9)
+    sigs = nd.signatures([nd.shingles(f"message number {w} about topic {w * 3}") for w in ("one", "two", "three", "four")])
+    for i, sig in enumerate(sigs):
+        index.add(sig, float(i))
+    assert len(index) == 3
+    assert index.query(sigs[0]) is None
+    assert index.query(sigs[3]) == (3.0, 1.0)
+
+    index.bind(object())
+    assert len(index) == 0
+
+
+def test_groups_and_weights_respect_labels():
+    texts = [_promo(1), _promo(2), _promo(3), "see you at lunch", _promo(4)]
+    df = pd.DataFrame({"text_clean": [api.clean_text(t) for t in texts], "target": [1, 1, 1, 0, 0]})
+
+    weighted = near_dup_columns(df, "weight", 0.9)
+    assert weighted["dup_group"].tolist() == [0, 0, 0, 3, 0]
+    assert weighted["sample_weight"].tolist() == pytest.approx([1 / 3, 1 / 3, 1 / 3, 1.0, 1.0])
+
+    dropped = near_dup_columns(df, "drop", 0.9)
+    assert dropped.index.tolist() == [0, 3, 4]
+
+
+def test_api_returns_cached_score_for_known_template(client, monkeypatch, tmp_path):
+    calls = []
+
+    class CountingModel:
+        def predict_proba(self, X):
+            calls.append(len(X))
+            return np.array([[0.2, 0.8]])
+
+    monkeypatch.setattr(api, "_model", CountingModel())
+    monkeypatch.setattr(api, "_model_path", tmp_path / "model.joblib")
+    monkeypatch.setattr(api, "NEAR_DUP_LOOKUP", True)
+    monkeypatch.setattr(api, "SINGLE_FLIGHT", False)
+
+    first = client.post("/predict", json={"text": _promo(1)})
+    second = client.post("/predict", json={"text": _promo(2)})
+    unrelated = client.post("/predict", json={"text": "Are we still meeting for lunch tomorrow?"})
+    assert [r.status_code for r in (first, second, unrelated)] == [200, 200, 200]
+    assert second.json()["proba_spam"] == pytest.approx(0.8)
+    assert "near_dup" in second.headers["server-timing"]
+    assert len(calls) == 2
+    assert 'predict_near_dup_total{result="hit"}' in client.get("/metrics").text
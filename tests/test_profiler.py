@@ -0,0 +1,78 @@
+import threading
+import time
+
+from src import api
+from src.profiler import SamplingProfiler
+
+
+def _busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_sampling_profiler_sees_busy_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,))
+    worker.start()
+    try:
+        result = SamplingProfiler().run(0.2, interval=0.002, trace_heap=True)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert result.samples > 0
+    assert "_busy_loop" in result.collapsed()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in result.collapsed().splitlines())
+    assert any("test_profiler" in row["function"] for row in result.top_functions())
+    assert isinstance(result.heap_diff, list)
+
+
+def test_threads_parked_in_a_wait_are_skipped():
+    stop = threading.Event()
+    waiter = threading.Thread(target=stop.wait, name="idle-waiter")
+    waiter.start()
+    try:
+        result = SamplingProfiler().run(0.1, interval=0.002, trace_heap=False)
+        with_idle = SamplingProfiler(include_idle=True).run(0.1, interval=0.002, trace_heap=False)
+    finally:
+        stop.set()
+        waiter.join()
+
+    assert result.idle_stacks > 0
+    assert "threading:wait" not in result.collapsed()
+    assert "threading:wait" in with_idle.collapsed()
+
+
+def test_profiler_rejects_concurrent_sessions():
+    profiler = SamplingProfiler()
+    runner = threading.Thread(target=profiler.run, args=(0.3,), kwargs={"trace_heap": False})
+    runner.start()
+    time.sleep(0.05)
+    try:
+        assert profiler.busy
+        try:
+            profiler.run(0.01)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("second session should be rejected")
+    finally:
+        runner.join()
+
+
+def test_profile_endpoint_is_gated(client, monkeypatch):
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    headers = {"X-Admin-Token": "secret"}
+
+    monkeypatch.setattr(api, "ENABLE_PROFILER", False)
+    assert client.post("/admin/profile?seconds=0.1", headers=headers).status_code == 404
+
+    monkeypatch.setattr(api, "ENABLE_PROFILER", True)
+    assert client.post("/admin/profile?seconds=0.1").status_code == 403
+
+    resp = client.post("/admin/profile?seconds=0.1&heap=false&format=collapsed", headers=headers)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+
+    data = client.post("/admin/profile?seconds=0.1&heap=false", headers=headers).json()
+    assert {"samples", "top_functions", "heap_diff", "collapsed"} <= set(data)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from src import api
+from src.hpa_sim import hpa_desired, scrape
+from src import saturation
+from src.saturation import CAPACITY, SaturationTracker, cpu_parallelism, cpu_quota
+
+
+class DummyModel:
+    def predict_proba(self, X):
+        return np.tile([0.2, 0.8], (len(X), 1))
+
+
+def test_cpu_quota_reads_cgroup_v2_and_v1(tmp_path):
+    (tmp_path / "cpu.max").write_text("50000 100000\n")
+    assert cpu_quota(tmp_path) == pytest.approx(0.5)
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    assert cpu_quota(tmp_path) is None
+
+    v1 = tmp_path / "v1"
+    (v1 / "cpu").mkdir(parents=True)
+    (v1 / "cpu" / "cpu.cfs_quota_us").write_text("25000")
+    (v1 / "cpu" / "cpu.cfs_period_us").write_text("100000")
+    assert cpu_quota(v1) == pytest.approx(0.25)
+    assert cpu_quota(tmp_path / "missing") is None
+
+
+def test_cpu_quota_is_shared_by_worker_processes(monkeypatch):
+    monkeypatch.delenv("CPU_PARALLELISM", raising=False)
+    monkeypatch.setattr(saturation, "cpu_quota", lambda: 1.0)
+    assert cpu_parallelism(processes=4) == pytest.approx(0.25)
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    assert cpu_parallelism() == pytest.approx(0.5)
+    monkeypatch.setattr(saturation, "cpu_quota", lambda: 8.0)
+    assert cpu_parallelism() == pytest.approx(1.0)
+
+
+def test_capacity_is_bounded_by_threads_and_cpu():
+    tracker = SaturationTracker(parallelism=0.5)
+    # ожидание (I/O): 40 потоков по 0.1s
+    tracker.observe(wall=0.1, cpu=0.001, workers=40)
+    assert tracker.wall_time == pytest.approx(0.1)
+    assert CAPACITY._value.get() == pytest.approx(400)
+    # чистый CPU: пол-ядра / 10ms
+    tracker = SaturationTracker(parallelism=0.5)
+    tracker.observe(wall=0.01, cpu=0.01, workers=40)
+    assert CAPACITY._value.get() == pytest.approx(50)
+
+
+def test_saturation_metrics_exported(client, monkeypatch):
+    monkeypatch.setattr(api, "_model", DummyModel())
+    assert client.post("/predict", json={"text": "hello"}).status_code == 200
+    values = scrape(client.get("/metrics").text)
+    assert values["api_scoring_arrivals_total"] >= 1
+    assert values["api_in_flight_requests"] == 0
+    assert values["api_queue_wait_seconds_count"] >= 1
+    assert values["api_capacity_rps_estimate"] > 0
+
+
+def test_hpa_formula_respects_tolerance_and_bounds():
+    assert hpa_desired(1, 0.75, 0.7, 5) == 1
+    assert hpa_desired(1, 2.0, 0.7, 5) == 3
+    assert hpa_desired(1, 100.0, 0.7, 5) == 5
+    assert hpa_desired(2, 0.1, 0.7, 5) == 1
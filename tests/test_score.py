@@ -0,0 +1,101 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from src import score
+from src.api import FEATURE_COLUMNS
+
+
+MESSAGES = [
+    "Ok lar... Joking wif u oni...",
+    "WINNER!! Claim your prize at http://win.example.com now, call 09061701461",
+    "<b>FREE</b> ringtone www.tones.co.uk",
+    "See you at 5",
+    None,
+]
+
+
+@pytest.fixture()
+def model_path(tmp_path):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.integers(0, 30, size=(100, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    y = (X["num_digits"] > 15).astype(int)
+    path = tmp_path / "model.joblib"
+    joblib.dump(RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y), path)
+    return path
+
+
+def _read_output(output_dir):
+    return pq.read_table(output_dir).to_pandas().sort_values("id").reset_index(drop=True)
+
+
+def test_score_csv_in_batches(tmp_path, model_path):
+    src = tmp_path / "archive.csv"
+    pd.DataFrame({"sms_id": range(100, 100 + len(MESSAGES) * 3), "text": MESSAGES * 3}).to_csv(src, index=False)
+
+    out = tmp_path / "scored"
+    progress = score.score_file(src, out, model_path, id_column="sms_id", batch_size=4)
+
+    assert progress["done"] and progress["completed_batches"] == 4
+    scored = _read_output(out)
+    assert scored["id"].tolist() == list(range(100, 115))
+    assert scored["label"].isin(["ham", "spam"]).all()
+    assert scored["proba_spam"].between(0, 1).all()
+
+
+@pytest.mark.parametrize("suffix", [".jsonl", ".csv", ".parquet"])
+def test_score_resumes_from_last_completed_batch(tmp_path, model_path, monkeypatch, suffix):
+    src = tmp_path / f"archive{suffix}"
+    # текст с переводом строки и кавычками — запись CSV на несколько строк файла
+    frame = pd.DataFrame({"text": MESSAGES * 3 + ['multi\nline, "quoted"'] * 5})
+    if suffix == ".jsonl":
+        frame.to_json(src, orient="records", lines=True)
+    elif suffix == ".csv":
+        frame.to_csv(src, index=False)
+    else:
+        frame.to_parquet(src, index=False, row_group_size=7)
+    full = score.score_file(src, tmp_path / "full", model_path, batch_size=5, workers=2, chunk_size=2)
+    expected = _read_output(tmp_path / "full")
+
+    # падение на третьем батче: два первых уже записаны
+    out = tmp_path / "scored"
+    write_part = score.write_part
+
+    def crash_on_third(output_dir, index, *args):
+        if index == 2:
+            raise KeyboardInterrupt
+        return write_part(output_dir, index, *args)
+
+    monkeypatch.setattr(score, "write_part", crash_on_third)
+    with pytest.raises(KeyboardInterrupt):
+        score.score_file(src, out, model_path, batch_size=5)
+    monkeypatch.setattr(score, "write_part", write_part)
+
+    # продолжение начинает чтение с сохранённой позиции, а не с начала файла
+    read_ids = []
+    iter_batches = score.iter_batches
+
+    def spy(*args, **kwargs):
+        for ids, texts, position in iter_batches(*args, **kwargs):
+            read_ids.extend(ids)
+            yield ids, texts, position
+
+    monkeypatch.setattr(score, "iter_batches", spy)
+    resumed = score.score_file(src, out, model_path, batch_size=5)
+    assert read_ids == list(range(10, 20))
+    assert resumed["last_run"]["rows"] == 10
+    assert resumed["rows"] == full["rows"] == 20
+    pd.testing.assert_frame_equal(_read_output(out), expected)
+
+
+def test_score_refuses_to_mix_runs(tmp_path, model_path):
+    src = tmp_path / "archive.csv"
+    pd.DataFrame({"text": MESSAGES}).to_csv(src, index=False)
+    out = tmp_path / "scored"
+    score.score_file(src, out, model_path, batch_size=2)
+    with pytest.raises(ValueError):
+        score.score_file(src, out, model_path, batch_size=3)
+    assert score.score_file(src, out, model_path, batch_size=3, overwrite=True)["rows"] == len(MESSAGES)
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import AdaBoostClassifier, ExtraTreesClassifier, GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from src.api import FEATURE_COLUMNS
+from src.scoring import Scorer
+
+
+def _training_frame(columns, n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.integers(0, 50, size=(n, len(columns))).astype(float), columns=columns)
+    y = (X[columns[0]] + rng.normal(0, 5, n) > 25).astype(int)
+    return X, y
+
+
+@pytest.mark.parametrize("forest", [RandomForestClassifier, ExtraTreesClassifier])
+def test_forest_fast_path_matches_sklearn(forest):
+    X, y = _training_frame(FEATURE_COLUMNS)
+    model = forest(n_estimators=10, random_state=0).fit(X, y)
+    scorer = Scorer(model, FEATURE_COLUMNS)
+
+    assert scorer.is_fast_path
+    expected = model.predict_proba(X)[:, 1]
+    np.testing.assert_allclose(scorer.score_rows(X.to_numpy()), expected)
+    assert scorer.score_one(X.iloc[3].to_dict()) == pytest.approx(expected[3])
+
+
+def test_permuted_training_columns_are_reordered_once():
+    columns = list(reversed(FEATURE_COLUMNS))
+    X, y = _training_frame(columns)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+    scorer = Scorer(model, FEATURE_COLUMNS)
+
+    service_order = X[FEATURE_COLUMNS].to_numpy()
+    np.testing.assert_allclose(scorer.score_rows(service_order), model.predict_proba(X)[:, 1])
+
+
+def test_mismatched_features_fail_at_load():
+    X, y = _training_frame(["a", "b", "c", "d", "e", "f"])
+    model = RandomForestClassifier(n_estimators=2, random_state=0).fit(X, y)
+    with pytest.raises(ValueError):
+        Scorer(model, FEATURE_COLUMNS)
+
+
+def test_non_forest_model_uses_its_own_predict_proba():
+    X, y = _training_frame(FEATURE_COLUMNS)
+    model = LogisticRegression(max_iter=500).fit(X, y)
+    scorer = Scorer(model, FEATURE_COLUMNS)
+
+    assert not scorer.is_fast_path
+    np.testing.assert_allclose(scorer.score_rows(X.to_numpy()), model.predict_proba(X)[:, 1], rtol=1e-5)
+
+
+@pytest.mark.parametrize(
+    "model",
+    [AdaBoostClassifier(n_estimators=10, random_state=0), GradientBoostingClassifier(n_estimators=10, random_state=0)],
+)
+def test_boosted_trees_are_not_averaged(model):
+    X, y = _training_frame(FEATURE_COLUMNS)
+    model.fit(X, y)
+    scorer = Scorer(model, FEATURE_COLUMNS)
+
+    assert not scorer.is_fast_path
+    expected = model.predict_proba(X)[:, 1]
+    np.testing.assert_allclose(scorer.score_rows(X.to_numpy()), expected, rtol=1e-5)
+    assert scorer.score_one(X.iloc[3].to_dict()) == pytest.approx(expected[3])
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import numpy as np
+import pytest
+
+from src import api
+from src.singleflight import SingleFlight
+
+
+class SlowModel:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def predict_proba(self, X):
+        self.calls += 1
+        time.sleep(0.2)
+        return np.tile([0.3, 0.7], (len(X), 1))
+
+
+def test_threads_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    start = threading.Barrier(4)
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return 42
+
+    results = []
+
+    def worker():
+        start.wait()
+        results.append(flight.do("key", compute))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [42] * 4
+    assert len(calls) == 1
+    assert flight.in_flight() == 0
+
+
+def test_async_callers_share_result_and_errors():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async("k", compute) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.in_flight() == 0
+
+
+def test_identical_predict_requests_are_coalesced(monkeypatch):
+    model = SlowModel()
+    monkeypatch.setattr(api, "_model", model)
+    monkeypatch.setattr(api, "_flight", SingleFlight())
+
+    async def main():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            same = [client.post("/predict", json={"text": "FREE entry"}) for _ in range(5)]
+            other = client.post("/predict", json={"text": "free entry"})
+            return await asyncio.gather(*same, other)
+
+    responses = asyncio.run(main())
+    assert all(r.status_code == 200 for r in responses)
+    assert [r.json()["proba_spam"] for r in responses] == pytest.approx([0.7] * 6)
+    # разный регистр — разные фичи, поэтому два расчёта
+    assert model.calls == 2
+
+
+def test_batch_scores_duplicates_once(client, monkeypatch):
+    model = SlowModel()
+    monkeypatch.setattr(api, "_model", model)
+    seen = []
+    original = api.features_matrix
+    monkeypatch.setattr(api, "features_matrix", lambda texts: seen.append(list(texts)) or original(texts))
+
+    resp = client.post("/predict/batch", json={"texts": ["a", "b", "a", "a"]})
+    assert resp.status_code == 200
+    assert len(resp.json()["predictions"]) == 4
+    assert seen == [["a", "b"]]
+    assert 'predict_coalesced_total{mode="batch"}' in client.get("/metrics").text
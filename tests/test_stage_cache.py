@@ -0,0 +1,106 @@
+import sys
+import textwrap
+
+import pytest
+
+from src.stage_cache import StageCache, StageError
+
+# каждый шаг дописывает строку в runs.log — по нему видно, что реально выполнялось
+DVC_YAML = """
+stages:
+  prepare:
+    cmd: python -c "import pathlib; p = pathlib.Path('raw.txt'); pathlib.Path('prepared.txt').write_text(p.read_text().upper()); open('runs.log', 'a').write('prepare\\\\n')"
+    deps:
+    - raw.txt
+    outs:
+    - prepared.txt
+  report:
+    cmd: python -c "import pathlib; pathlib.Path('out').mkdir(exist_ok=True); pathlib.Path('out/report.txt').write_text(pathlib.Path('prepared.txt').read_text() + '${report.suffix}'); open('runs.log', 'a').write('report\\\\n')"
+    deps:
+    - prepared.txt
+    params:
+    - report.suffix
+    outs:
+    - out
+"""
+
+
+@pytest.fixture()
+def project(tmp_path):
+    (tmp_path / "dvc.yaml").write_text(DVC_YAML)
+    (tmp_path / "params.yaml").write_text("report:\n  suffix: '!'\n")
+    (tmp_path / "raw.txt").write_text("hello")
+    return tmp_path
+
+
+def _runs(project):
+    log = project / "runs.log"
+    return log.read_text().split() if log.exists() else []
+
+
+def _run_all(project, *overrides):
+    cache = StageCache(project)
+    cache.override(list(overrides))
+    return [cache.run(name) for name in ("prepare", "report")]
+
+
+def test_unchanged_inputs_skip_every_stage(project):
+    assert _run_all(project) == ["ran", "ran"]
+    assert _run_all(project) == ["cached", "cached"]
+    assert _runs(project) == ["prepare", "report"]
+    assert (project / "out" / "report.txt").read_text() == "HELLO!"
+
+
+def test_changed_data_reruns_only_affected_stages(project):
+    _run_all(project)
+    (project / "raw.txt").write_text("HeLLo")
+    # prepare даёт тот же результат, поэтому report по содержимому не меняется
+    assert _run_all(project) == ["ran", "cached"]
+    (project / "raw.txt").write_text("bye")
+    assert _run_all(project) == ["ran", "ran"]
+    assert (project / "out" / "report.txt").read_text() == "BYE!"
+
+
+def test_param_override_is_part_of_fingerprint(project):
+    _run_all(project)
+    assert _run_all(project, "report.suffix=?") == ["cached", "ran"]
+    assert (project / "out" / "report.txt").read_text() == "HELLO?"
+    # возврат к прежнему значению восстанавливает прошлый результат из кэша
+    assert _run_all(project) == ["cached", "cached"]
+    assert (project / "out" / "report.txt").read_text() == "HELLO!"
+
+
+def test_missing_outputs_are_restored_from_cache(project):
+    _run_all(project)
+    (project / "prepared.txt").unlink()
+    (project / "out" / "report.txt").write_text("tampered")
+    assert _run_all(project) == ["cached", "cached"]
+    assert (project / "prepared.txt").read_text() == "HELLO"
+    assert (project / "out" / "report.txt").read_text() == "HELLO!"
+    assert _runs(project) == ["prepare", "report"]
+
+
+def test_failing_stage_is_not_cached(project):
+    (project / "dvc.yaml").write_text(
+        textwrap.dedent(
+            f"""
+            stages:
+              broken:
+                cmd: {sys.executable} -c "raise SystemExit(3)"
+                outs:
+                - nothing.txt
+            """
+        )
+    )
+    cache = StageCache(project)
+    with pytest.raises(StageError, match="exit code 3"):
+        cache.run("broken")
+    assert not cache.is_cached("broken")
+
+
+def test_repository_declares_all_pipeline_stages():
+    from pathlib import Path
+
+    cache = StageCache(Path(__file__).resolve().parents[1])
+    assert {"download_data", "preprocess", "train", "evaluate", "register"} <= set(cache.stages)
+    assert cache.command("register").endswith("--threshold 0.9")
@@ -0,0 +1,34 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from src import api
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_health_is_not_ready_until_warmup_finishes(client):
+    api._ready.clear()
+    try:
+        resp = client.get("/health")
+        assert resp.status_code == 503
+        assert resp.json()["status"] == "warming"
+        assert client.get("/livez").status_code == 200
+    finally:
+        api.warmup()
+    resp = client.get("/health")
+    assert resp.status_code == 200
+    assert resp.json()["ready"] is True
+
+
+def test_heavy_feature_dependencies_are_imported_lazily():
+    code = (
+        "import sys, src.api\n"
+        "print(','.join(m for m in ('bs4', 'tldextract', 'regex', 'joblib', 'pandas') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
+
+
+def test_offline_tld_extractor_matches_public_suffix_rules():
+    assert api.num_domains("see http://promo.example.co.uk/a and www.shop.example.co.uk") == 1
@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+import numpy as np
+
+from src import api
+
+
+class DummyModel:
+    def predict_proba(self, X):
+        return np.tile([0.25, 0.75], (len(X), 1))
+
+
+def _lines(resp):
+    return [json.loads(line) for line in resp.text.splitlines()]
+
+
+def test_stream_scores_lines_and_reports_errors_inline(client, monkeypatch):
+    monkeypatch.setattr(api, "_model", DummyModel())
+    monkeypatch.setattr(api, "STREAM_BATCH_SIZE", 2)
+    body = "\n".join(
+        [
+            json.dumps({"text": "Call now", "id": "a"}),
+            "not json",
+            "",
+            json.dumps({"text": "hi"}),
+            json.dumps({"msg": "no text"}),
+            json.dumps({"text": "last one"}),
+        ]
+    )
+    resp = client.post("/predict/stream", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+
+    rows = sorted(_lines(resp), key=lambda r: r["line"])
+    assert [r["line"] for r in rows] == [1, 2, 4, 5, 6]
+    assert rows[0]["id"] == "a" and rows[0]["label"] == "spam"
+    assert "error" in rows[1] and "error" in rows[3]
+    assert rows[2]["proba_spam"] == 0.75
+
+    metrics = client.get("/metrics").text
+    assert 'stream_messages_total{status="error"}' in metrics
+    assert "stream_throughput_messages_per_second_count" in metrics
+
+
+def test_iter_ndjson_lines_handles_split_and_oversized_lines():
+    async def chunks():
+        for chunk in (b'{"text": "a"}\n{"te', b'xt": "b"}\n' + b"x" * 20, b"y" * 20 + b"\n", b'{"text": "c"}'):
+            yield chunk
+
+    async def collect():
+        return [item async for item in api.iter_ndjson_lines(chunks(), max_line_bytes=16)]
+
+    items = [i for i in asyncio.run(collect()) if i is not None]
+    assert items[0] == b'{"text": "a"}'
+    assert items[1] == b'{"text": "b"}'
+    assert items[2] is api.LINE_TOO_LONG
+    assert items[3] == b'{"text": "c"}'
+    assert len(items) == 4
@@ -0,0 +1,109 @@
+import json
+import threading
+
+import pytest
+
+from src import tracking
+from src.tracking import TrackedRun
+
+
+class FakeBackend:
+    def __init__(self, upload_delay=None):
+        self.calls = []
+        self.upload_delay = upload_delay
+        self.threads = set()
+
+    def create_run(self, experiment, run_name):
+        self.calls.append(("create", experiment, run_name))
+        return "run-1"
+
+    def log_batch(self, run_id, metrics, params, tags):
+        self.threads.add(threading.current_thread().name)
+        self.calls.append(("batch", len(metrics), len(params), len(tags)))
+
+    def log_artifact(self, run_id, path, artifact_path):
+        if self.upload_delay is not None:
+            self.upload_delay.wait(5)
+        self.calls.append(("artifact", path, artifact_path))
+
+    def set_terminated(self, run_id, status):
+        self.calls.append(("terminated", status))
+
+
+def _run(backend, tmp_path, **kwargs):
+    return TrackedRun("exp", run_name="unit", backend_factory=lambda: backend, timing_path=tmp_path / "tracking.json", **kwargs)
+
+
+def test_split_batch_respects_limits():
+    metrics = [("m", 1.0, 0, i) for i in range(2500)]
+    params = [(f"p{i}", "v") for i in range(150)]
+    chunks = tracking._split_batch(metrics, params, [])
+
+    assert sum(len(m) for m, _, _ in chunks) == 2500
+    assert sum(len(p) for _, p, _ in chunks) == 150
+    for m, p, t in chunks:
+        assert len(m) <= tracking.MAX_METRICS_PER_BATCH
+        assert len(p) <= tracking.MAX_PARAMS_PER_BATCH
+        assert len(m) + len(p) + len(t) <= tracking.MAX_ENTITIES_PER_BATCH
+
+
+def test_metrics_are_batched_off_the_caller_thread(tmp_path):
+    backend = FakeBackend()
+    with _run(backend, tmp_path, flush_every=100) as run:
+        run.log_params({"n_estimators": 100, "max_depth": None})
+        for step in range(250):
+            run.log_metric("loss", 1.0 / (step + 1), step=step)
+
+    batches = [c for c in backend.calls if c[0] == "batch"]
+    assert sum(c[1] for c in batches) == 250
+    assert sum(c[2] for c in batches) == 2
+    assert len(batches) == 3
+    assert backend.threads and all(name.startswith("mlflow-tracking") for name in backend.threads)
+    assert backend.calls[0][0] == "create"
+    assert backend.calls[-1] == ("terminated", "FINISHED")
+
+
+def test_artifact_upload_does_not_block_caller(tmp_path):
+    release = threading.Event()
+    backend = FakeBackend(upload_delay=release)
+    model = tmp_path / "model.joblib"
+    model.write_bytes(b"x" * 1024)
+
+    run = _run(backend, tmp_path)
+    run.log_model_file(model)
+    # загрузка ещё висит, а вызывающий поток уже свободен
+    assert not any(c[0] == "artifact" for c in backend.calls)
+    release.set()
+    summary = run.close()
+
+    assert ("artifact", str(model), "model") in backend.calls
+    assert summary["artifacts"] == 1 and summary["artifact_bytes"] == 1024
+    tags = [c for c in backend.calls if c[0] == "batch"]
+    assert tags and tags[-1][3] == 2
+    saved = json.loads((tmp_path / "tracking.json").read_text())
+    assert saved["unit"]["run_id"] == "run-1"
+    assert saved["unit"]["status"] == "closed"
+
+
+def test_exception_marks_run_failed(tmp_path):
+    backend = FakeBackend()
+    with pytest.raises(ValueError):
+        with _run(backend, tmp_path) as run:
+            run.log_metric("roc_auc", 0.9)
+            raise ValueError("boom")
+
+    assert ("batch", 1, 0, 0) in backend.calls
+    assert backend.calls[-1] == ("terminated", "FAILED")
+
+
+def test_unclosed_run_is_flushed_at_exit(tmp_path):
+    backend = FakeBackend()
+    run = _run(backend, tmp_path)
+    run.log_metric("roc_auc", 0.9)
+    run._close_at_exit()
+
+    assert ("batch", 1, 0, 0) in backend.calls
+    assert backend.calls[-1] == ("terminated", "KILLED")
+    # повторный close ничего не отправляет
+    run.close()
+    assert backend.calls.count(("terminated", "KILLED")) == 1
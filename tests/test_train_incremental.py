@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import train_incremental as ti
+from src.api import FEATURE_COLUMNS
+from src.scoring import Scorer
+
+
+def _write_partitions(root, parts=3, rows=400, seed=0):
+    rng = np.random.default_rng(seed)
+    for part in range(parts):
+        X = rng.normal(size=(rows, len(FEATURE_COLUMNS))) * [100, 20, 5, 1, 1, 0.1]
+        df = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+        df["target"] = (df["char_len"] / 100 + df["num_digits"] / 5 + rng.normal(0, 0.5, rows) > 0).astype(int)
+        df["sms_id"] = np.arange(rows) + part * rows
+        path = root / f"day={part:02d}"
+        path.mkdir(parents=True)
+        df.to_parquet(path / "part-0.parquet", index=False)
+
+
+def test_streaming_auc_matches_sklearn():
+    from sklearn.metrics import roc_auc_score
+
+    rng = np.random.default_rng(0)
+    y = rng.integers(0, 2, 2000)
+    proba = np.clip(rng.random(2000) * 0.7 + y * 0.3, 0, 1)
+    auc = ti.StreamingAUC()
+    for chunk in np.array_split(np.arange(2000), 7):
+        auc.update(proba[chunk], y[chunk])
+    assert auc.rows == 2000
+    assert auc.roc_auc() == pytest.approx(roc_auc_score(y, proba), abs=1e-3)
+
+
+def test_trains_servable_model_from_partitions(tmp_path):
+    _write_partitions(tmp_path / "src")
+    state = ti.train_incremental(tmp_path / "src", tmp_path / "ck.joblib", batch_rows=100, epochs=2)
+    assert state["phase"] == "done"
+    assert state["metrics"].rows == 240
+    assert state["metrics"].roc_auc() > 0.8
+
+    scorer = Scorer(ti.serving_model(state), FEATURE_COLUMNS)
+    proba = scorer.score_rows(np.zeros((2, len(FEATURE_COLUMNS))))
+    assert proba.shape == (2,) and np.all((proba >= 0) & (proba <= 1))
+
+
+def test_interrupted_run_resumes_to_same_model(tmp_path, monkeypatch):
+    _write_partitions(tmp_path / "src")
+    full = ti.train_incremental(tmp_path / "src", tmp_path / "full.joblib", batch_rows=100, epochs=2)
+
+    original = ti.SGDClassifier.partial_fit
+    calls = {"n": 0}
+
+    def flaky_partial_fit(self, *args, **kwargs):
+        calls["n"] += 1
+        if calls["n"] == 10:
+            raise KeyboardInterrupt
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(ti.SGDClassifier, "partial_fit", flaky_partial_fit)
+    with pytest.raises(KeyboardInterrupt):
+        ti.train_incremental(tmp_path / "src", tmp_path / "ck.joblib", batch_rows=100, epochs=2)
+    monkeypatch.undo()
+
+    resumed = ti.train_incremental(tmp_path / "src", tmp_path / "ck.joblib", batch_rows=100, epochs=2)
+    assert resumed["rows_seen"] == full["rows_seen"]
+    np.testing.assert_allclose(resumed["classifier"].coef_, full["classifier"].coef_)
+    assert resumed["metrics"].roc_auc() == full["metrics"].roc_auc()
+
+
+def test_changed_source_invalidates_checkpoint(tmp_path):
+    _write_partitions(tmp_path / "src", parts=1)
+    ti.train_incremental(tmp_path / "src", tmp_path / "ck.joblib", batch_rows=100, epochs=1)
+    _write_partitions(tmp_path / "src2", parts=2)
+    (tmp_path / "src" / "day=01").mkdir()
+    (tmp_path / "src2" / "day=01" / "part-0.parquet").rename(tmp_path / "src" / "day=01" / "part-0.parquet")
+    state = ti.train_incremental(tmp_path / "src", tmp_path / "ck.joblib", batch_rows=100, epochs=1)
+    assert state["rows_seen"] > 400
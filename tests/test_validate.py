@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import validate as val
+
+
+@pytest.fixture()
+def contract():
+    return val.load_contract()
+
+
+def _frame(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    urls = rng.integers(0, 3, n)
+    chars = rng.integers(10, 200, n)
+    return pd.DataFrame(
+        {
+            "sms_id": np.arange(n),
+            "event_timestamp": pd.Timestamp("2020-01-01", tz="UTC") + pd.to_timedelta(np.arange(n), unit="D"),
+            "char_len": chars,
+            "word_len": chars // 5,
+            "num_digits": rng.integers(0, 20, n),
+            "num_urls": urls,
+            "num_domains": urls,
+            "upper_ratio": rng.random(n).astype(np.float32),
+            "target": (np.arange(n) % 5 == 0).astype(int),
+        }
+    )
+
+
+def test_contract_types_come_from_feature_view(contract):
+    assert contract["columns"]["char_len"]["type"] == "Int64"
+    assert contract["columns"]["upper_ratio"]["type"] == "Float32"
+    assert contract["columns"]["upper_ratio"]["max"] == 1
+
+
+def test_clean_data_passes_across_batches(tmp_path, contract):
+    _frame().to_parquet(tmp_path / "ok.parquet", index=False)
+    report = val.validate(tmp_path / "ok.parquet", contract, batch_rows=32)
+    assert report["passed"]
+    assert report["rows"] == 200 and report["violations"] == []
+    assert report["dataset"]["target_rate"]["value"] == pytest.approx(0.2)
+
+
+def test_violations_are_counted_with_examples(tmp_path, contract):
+    df = _frame()
+    df["char_len"] = df["char_len"].astype(float)
+    df.loc[[3, 40], "upper_ratio"] = 1.5
+    df.loc[5, "num_digits"] = -1
+    df.loc[7, "char_len"] = np.nan
+    df.loc[8, "char_len"] = 12.5
+    df.loc[9, "num_domains"] = df.loc[9, "num_urls"] + 2
+    df.loc[11, "target"] = 2
+    df.to_parquet(tmp_path / "bad.parquet", index=False)
+
+    report = val.validate(tmp_path / "bad.parquet", contract, batch_rows=16)
+    found = {(v["column"], v["rule"]): v for v in report["violations"]}
+    assert not report["passed"]
+    assert found[("upper_ratio", "max=1")]["count"] == 2
+    assert found[("upper_ratio", "max=1")]["examples"] == [3, 40]
+    assert found[("num_digits", "min=0")]["examples"] == [5]
+    assert found[("char_len", "null")]["examples"] == [7]
+    assert found[("char_len", "not_integer")]["examples"] == [8]
+    assert found[("num_domains", "<= num_urls")]["examples"] == [9]
+    assert found[("target", "in [0, 1]")]["examples"] == [11]
+
+
+def test_label_skew_and_tolerance(tmp_path, contract):
+    df = _frame()
+    df["target"] = 0
+    df.loc[0, "upper_ratio"] = 2.0
+    df.to_parquet(tmp_path / "skew.parquet", index=False)
+
+    report = val.validate(tmp_path / "skew.parquet", {**contract, "max_violation_fraction": 0.01})
+    assert report["dataset"]["target_rate"]["failed"]
+    assert not report["violations"][0]["failed"]
+    assert not report["passed"]
+
+
+def test_missing_column_fails_before_reading(tmp_path, contract):
+    _frame().drop(columns=["upper_ratio"]).to_parquet(tmp_path / "partial.parquet", index=False)
+    with pytest.raises(ValueError, match="upper_ratio"):
+        val.validate(tmp_path / "partial.parquet", contract)
@@ -0,0 +1,65 @@
+import msgpack
+import numpy as np
+import pytest
+
+from src import api, wire
+
+
+class DummyModel:
+    def predict_proba(self, X):
+        return np.tile([0.2, 0.8], (len(X), 1))
+
+
+@pytest.fixture()
+def dummy_model(monkeypatch):
+    monkeypatch.setattr(api, "_model", DummyModel())
+
+
+def test_predict_msgpack_roundtrip(client, dummy_model):
+    resp = client.post(
+        "/predict",
+        content=msgpack.packb({"text": "WIN cash now"}),
+        headers={"Content-Type": wire.MSGPACK},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == wire.MSGPACK
+    data = msgpack.unpackb(resp.content)
+    assert data["label"] == "spam"
+    assert data["proba_spam"] == pytest.approx(0.8)
+
+
+def test_accept_header_overrides_request_format(client, dummy_model):
+    resp = client.post("/predict", json={"text": "hi"}, headers={"Accept": wire.MSGPACK})
+    assert resp.headers["content-type"] == wire.MSGPACK
+    assert msgpack.unpackb(resp.content)["label"] == "spam"
+
+
+def test_batch_endpoint_json_and_msgpack(client, dummy_model):
+    resp = client.post("/predict/batch", json={"texts": ["a", "b", "c"]})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert [p["label"] for p in data["predictions"]] == ["spam"] * 3
+
+    resp = client.post(
+        "/predict/batch",
+        content=msgpack.packb({"texts": ["x"]}),
+        headers={"Content-Type": "application/x-msgpack"},
+    )
+    assert msgpack.unpackb(resp.content)["predictions"][0]["proba_spam"] == pytest.approx(0.8)
+
+
+def test_invalid_bodies_are_rejected(client, dummy_model, monkeypatch):
+    assert client.post("/predict", json={"msg": "no text"}).status_code == 422
+    assert client.post("/predict", content=b"{oops", headers={"Content-Type": "application/json"}).status_code == 400
+    assert client.post("/predict", content=b"text=hi", headers={"Content-Type": "text/plain"}).status_code == 415
+    assert client.post("/predict/batch", json={"texts": [1, 2]}).status_code == 422
+
+    monkeypatch.setattr(api, "MAX_BATCH_SIZE", 2)
+    assert client.post("/predict/batch", json={"texts": ["a", "b", "c"]}).status_code == 413
+
+
+def test_negotiate_defaults_to_request_format():
+    assert wire.negotiate(None, "application/json") == wire.JSON
+    assert wire.negotiate(None, "application/msgpack; charset=binary") == wire.MSGPACK
+    assert wire.negotiate("application/json", wire.MSGPACK) == wire.JSON
+    assert wire.negotiate("*/*", None) == wire.JSON